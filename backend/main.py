@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 from utils.config import get_config
@@ -65,8 +66,24 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Startup error: {e}")
     
+    # Start the face extraction worker processes (loads the dlib models once per worker)
+    from services.face_service import get_face_service
+    await run_in_threadpool(get_face_service().start_engine)
+
+    # Periodic bulk write of smart glass heartbeats
+    from services.device_state import get_device_state_store
+    get_device_state_store().start()
+
     logger.info("MedLens API started successfully")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers."""
+    from services.device_state import get_device_state_store
+    from services.face_service import get_face_service
+    await get_device_state_store().stop()
+    get_face_service().stop_engine()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -107,6 +124,11 @@ async def health_check():
             "status": "operational",
             "details": {
                 "encodings_stored": encoding_count,
+                "gallery_size": len(face_service.gallery),
+                "gallery_users": face_service.gallery.user_count,
+                "index": face_service.index.describe(),
+                "engine": face_service.engine.describe() if face_service.engine else {"running": False},
+                "cache": face_service.result_cache.describe(),
                 "tolerance": face_service.tolerance
             }
         }
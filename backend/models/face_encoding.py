@@ -42,9 +42,69 @@ class FaceMatch(BaseModel):
     distance: Optional[float] = Field(None, ge=0.0, description="Face distance metric (lower is better)")
 
 
+class FaceCandidate(BaseModel):
+    """One ranked identity from a top-k gallery search."""
+    user_id: str
+    distance: float = Field(..., ge=0.0, description="Face distance metric (lower is better)")
+    confidence: float = Field(..., ge=0.0, le=1.0)
+
+
+class FaceTopKResult(BaseModel):
+    """Model for top-k face matching result."""
+    matched: bool = Field(False, description="Whether the best candidate is within tolerance")
+    candidates: List[FaceCandidate] = Field(default_factory=list, description="Nearest identities, best first")
+    margin: Optional[float] = Field(
+        None, ge=0.0, description="Distance gap between the best and second-best candidate"
+    )
+
+    def best_match(self) -> FaceMatch:
+        """Collapse to the single-match model used by find_match."""
+        if not self.candidates:
+            return FaceMatch(matched=False, user_id=None, confidence=None, distance=None)
+        best = self.candidates[0]
+        return FaceMatch(
+            matched=self.matched,
+            user_id=best.user_id,
+            confidence=best.confidence,
+            distance=best.distance
+        )
+
+
 class FaceExtractionResult(BaseModel):
     """Model for face extraction result."""
     success: bool
     encoding: Optional[List[float]] = None
     error: Optional[str] = None
     face_count: int = Field(0, description="Number of faces detected in image")
+    detect_ms: Optional[float] = Field(None, description="Time spent on face detection")
+    encode_ms: Optional[float] = Field(None, description="Time spent on quality checks and encoding")
+
+
+class BatchRecognitionItem(BaseModel):
+    """Outcome for one image of a batch recognition request."""
+    index: int = Field(..., description="Position of the image in the request")
+    match: Optional[FaceMatch] = None
+    error: Optional[str] = Field(None, description="Why no encoding could be extracted, if it failed")
+
+
+class FaceBox(BaseModel):
+    """Face bounding box in pixel coordinates of the processed image."""
+    top: int
+    right: int
+    bottom: int
+    left: int
+
+
+class DetectedFace(BaseModel):
+    """One face found in a multi-face image, with its match if it could be encoded."""
+    box: FaceBox
+    match: Optional[FaceMatch] = None
+    error: Optional[str] = Field(None, description="Why this face was not matched (e.g. quality check)")
+
+
+class MultiFaceRecognitionResult(BaseModel):
+    """Model for multi-face recognition result."""
+    face_count: int = Field(0, description="Number of faces detected in image")
+    faces: List[DetectedFace] = Field(default_factory=list)
+    image_width: Optional[int] = None
+    image_height: Optional[int] = None
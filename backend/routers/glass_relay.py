@@ -1,22 +1,66 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Body
-from typing import Optional, Dict, List
+from fastapi import (
+    APIRouter, HTTPException, UploadFile, File, Form, Body, Depends, BackgroundTasks, Query, Request,
+    WebSocket, WebSocketDisconnect
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Optional, Dict
+import asyncio
+import json
+import logging
 from datetime import datetime, timezone, timedelta
 from services.storage_service import get_supabase_service
+from services.device_state import get_device_state_store
+from services.command_queue import CommandQueue
+from services.frame_store import get_frame_store
+from services.frame_broadcast import FrameBroadcaster, MEDIA_TYPE as MJPEG_MEDIA_TYPE
+from services.frame_change import FrameChangeDetector
+from services.face_tracker import get_face_tracker
+from services.user_service import get_complete_user_profile, get_user_profiles_batch
+from routers.recognition import recognize_image
+from utils.config import get_config
+from utils.image_processor import ImageProcessor, ImageProcessingError
+from dependencies import get_current_user
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/glass", tags=["Smart Glass Relay"])
 
-# In-memory buffer for latest frames (DB is too slow for 10fps streaming)
-# Map: device_id -> bytes
-frame_buffer: Dict[str, bytes] = {}
+settings = get_config()
+
+# In-memory command queue (DB is safer but for speed we use memory for now).
+# Commands carry ids and stay queued until the device acknowledges them.
+command_queue = CommandQueue(max_pending=settings.GLASS_MAX_PENDING_COMMANDS)
 
-# In-memory command queue (DB is safer but for speed we use memory for now)
-# Map: device_id -> List[dict]
-command_queue: Dict[str, List[dict]] = {}
+# Devices connected over the WebSocket channel get commands pushed as they are queued
+# Map: device_id -> WebSocket
+device_sockets: Dict[str, WebSocket] = {}
 
-in_memory_devices: Dict[str, dict] = {}
+# Face tracking job in flight per streaming device; at most one is queued on the executor
+# Map: device_id -> Future
+tracking_jobs: Dict[str, asyncio.Future] = {}
 
 scanning_state: Dict[str, dict] = {}
 
+# Last analysed frame per device, so static scenes skip recognition
+frame_changes = FrameChangeDetector(
+    threshold=settings.GLASS_FRAME_CHANGE_THRESHOLD,
+    max_reuse_seconds=settings.GLASS_FRAME_REUSE_MAX_SECONDS
+)
+
+
+# Live MJPEG viewers, woken whenever their device stores a frame
+frame_broadcaster = FrameBroadcaster(get_frame_store().latest)
+
+
+def _forget_device(device_id: str) -> None:
+    """Drop a device's recognition and tracking state once its frames are gone."""
+    frame_changes.forget(device_id)
+    get_face_tracker().reset(device_id)
+
+
+get_frame_store().add_eviction_listener(_forget_device)
+
 
 def get_scanning_state(device_id: str) -> dict:
     state = scanning_state.get(device_id)
@@ -27,56 +71,36 @@ def get_scanning_state(device_id: str) -> dict:
 
 @router.post("/sync")
 async def sync_device(
+    background_tasks: BackgroundTasks,
     device_id: str = Form(...),
     battery: int = Form(0),
+    ack: Optional[int] = Form(None),
     image: Optional[UploadFile] = File(None)
 ):
     """
     Heartbeat from Glass.
-    1. Updates 'Last Seen' in DB.
-    2. Accepts incoming image frame.
-    3. Returns pending commands for this device.
+    1. Records 'Last Seen' in memory (written to the DB in periodic bulk flushes).
+    2. Accepts incoming image frame (and tracks faces in it while scanning).
+    3. Returns pending commands for this device. A device that sends 'ack'
+       (the id of the last command it executed) gets unacknowledged commands
+       until it acks them; without 'ack' commands are delivered once.
     """
-    supabase = get_supabase_service()
-    
-    # 1. Update DB Status
-    try:
-        res = supabase.client.table("devices").select("user_id").eq("device_id", device_id).execute()
-        if not res.data:
-            # Auto-register new device
-            supabase.client.table("devices").insert({
-                "device_id": device_id,
-                "status": "online",
-                "battery_level": battery,
-                "last_seen": datetime.utcnow().isoformat()
-            }).execute()
-        else:
-            # Update existing
-            supabase.client.table("devices").update({
-                "status": "online",
-                "battery_level": battery,
-                "last_seen": datetime.utcnow().isoformat()
-            }).eq("device_id", device_id).execute()
-    except Exception as e:
-        print(f"DB Error (using in-memory fallback): {e}")
-        # Fallback to in-memory if DB fails (e.g. table missing)
-        in_memory_devices[device_id] = {
-            "device_id": device_id,
-            "status": "online",
-            "battery_level": battery,
-            "last_seen": datetime.utcnow().isoformat(),
-            "user_id": None # No pairing in memory mode yet
-        }
+    # 1. Record status; the device state store upserts all dirty devices every few seconds
+    get_device_state_store().heartbeat(device_id, battery)
 
     # 2. Handle Image
     if image:
         content = await image.read()
-        frame_buffer[device_id] = content
+        if _store_frame(device_id, content):
+            # After the response; frames arriving while one is processed are dropped
+            background_tasks.add_task(get_face_tracker().process, device_id, content)
 
     # 3. Get Commands
-    commands = command_queue.get(device_id, [])
-    if commands:
-        command_queue[device_id] = [] # Clear queue
+    if ack is None:
+        commands = command_queue.take(device_id)
+    else:
+        command_queue.ack(device_id, ack)
+        commands = command_queue.pending(device_id)
         
     return {
         "status": "ok", 
@@ -85,6 +109,125 @@ async def sync_device(
     }
 
 
+def _store_frame(device_id: str, content: bytes) -> bool:
+    """
+    Keep a device's newest frame.
+
+    Returns:
+        True if the frame should also go through face tracking (the device is scanning)
+    """
+    # Latest frames live in a memory-capped store (DB is too slow for 10fps streaming)
+    if get_frame_store().put(device_id, content) is None:
+        logger.warning(f"Dropping empty or oversized frame from {device_id} ({len(content)} bytes)")
+        return False
+    frame_broadcaster.publish(device_id)
+    return bool(get_scanning_state(device_id).get("active"))
+
+
+def _track_frame(device_id: str, content: bytes) -> None:
+    """
+    Hand a streamed frame to the face tracker without waiting for it.
+    A frame arriving while the device's previous one is still tracked is skipped
+    (the tracker would drop it anyway), so work never piles up on the executor.
+    """
+    job = tracking_jobs.get(device_id)
+    if job is not None and not job.done():
+        return
+
+    job = asyncio.get_running_loop().run_in_executor(None, get_face_tracker().process, device_id, content)
+    tracking_jobs[device_id] = job
+
+    def _finished(future: asyncio.Future) -> None:
+        if tracking_jobs.get(device_id) is future:
+            del tracking_jobs[device_id]
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Face tracking failed for {device_id}: {future.exception()}")
+
+    job.add_done_callback(_finished)
+
+
+async def _push_commands(websocket: WebSocket, device_id: str) -> None:
+    """Send a connected device its unacknowledged commands, then each new one as it is queued."""
+    last_sent = 0
+    while True:
+        commands = await command_queue.wait(device_id, after=last_sent, timeout=settings.GLASS_COMMAND_POLL_SECONDS)
+        if commands:
+            await websocket.send_json({"type": "commands", "commands": commands})
+            last_sent = commands[-1]["id"]
+
+
+@router.websocket("/ws/{device_id}")
+async def device_channel(websocket: WebSocket, device_id: str):
+    """
+    Persistent channel for a Glass device, replacing /sync polling.
+    Up: binary messages are JPEG frames; text messages are JSON heartbeats
+    such as {"battery": 80}, optionally acknowledging executed commands with
+    {"ack": <last command id>}. Every message counts as a heartbeat.
+    Down: {"type": "commands", "commands": [...]} as soon as commands are queued.
+    Commands not acknowledged are sent again when the device reconnects.
+    """
+    await websocket.accept()
+    previous = device_sockets.get(device_id)
+    device_sockets[device_id] = websocket
+    if previous is not None:
+        # Only one channel per device; the newest connection wins
+        try:
+            await previous.close()
+        except Exception:
+            pass
+
+    receiver = asyncio.create_task(_receive_messages(websocket, device_id))
+    sender = asyncio.create_task(_push_commands(websocket, device_id))
+    try:
+        # Whichever side ends first ends the channel; a failed sender must not leave
+        # a device that still sends heartbeats but never gets commands
+        done, _ = await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+        for task, side in ((receiver, "receive"), (sender, "send")):
+            if task in done and task.exception() is not None:
+                logger.error(f"Glass channel {device_id} failed to {side}: {task.exception()!r}")
+        if sender in done:
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+    finally:
+        for task in (receiver, sender):
+            task.cancel()
+        await asyncio.gather(receiver, sender, return_exceptions=True)
+        if device_sockets.get(device_id) is websocket:
+            del device_sockets[device_id]
+            get_face_tracker().reset(device_id)
+
+
+async def _receive_messages(websocket: WebSocket, device_id: str) -> None:
+    """Handle a device's frames, heartbeats and acks until it disconnects."""
+    store = get_device_state_store()
+    store.heartbeat(device_id)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            content = message.get("bytes")
+            if content is not None:
+                store.heartbeat(device_id)
+                if _store_frame(device_id, content):
+                    _track_frame(device_id, content)
+                continue
+            try:
+                payload = json.loads(message.get("text") or "{}")
+            except ValueError:
+                payload = {}
+            if not isinstance(payload, dict):
+                payload = {}
+            battery = payload.get("battery")
+            store.heartbeat(device_id, battery if isinstance(battery, int) else None)
+            if isinstance(payload.get("ack"), int):
+                command_queue.ack(device_id, payload["ack"])
+    except WebSocketDisconnect:
+        pass
+
+
 @router.get("/scanning/{device_id}")
 async def get_scanning(device_id: str):
     state = get_scanning_state(device_id)
@@ -108,6 +251,7 @@ async def set_scanning(
         state["active"] = False
         state["last_stop"] = now.isoformat()
         scanning_state[device_id] = state
+        get_face_tracker().reset(device_id)
         return {"active": False, "source": source}
     last_stop_raw = state.get("last_stop")
     if last_stop_raw and cooldown_ms > 0:
@@ -126,85 +270,224 @@ async def set_scanning(
 async def get_device_status(device_id: str):
     """Frontend polls this to check if Glass is online."""
     supabase = get_supabase_service()
+    # Heartbeats reach the DB only on the next flush, so the in-memory record is fresher
+    latest = get_device_state_store().get(device_id)
     
     # Check DB for ownership/status
     try:
-        res = supabase.client.table("devices").select("*").eq("device_id", device_id).execute()
-        if not res.data:
-            # Check in-memory fallback before 404
-            if device_id in in_memory_devices:
-                device = in_memory_devices[device_id]
-            else:
-                # If not in DB and not in memory, it's truly not found
-                raise HTTPException(status_code=404, detail="Device not found in registry")
+        res = await run_in_threadpool(
+            lambda: supabase.client.table("devices").select("*").eq("device_id", device_id).execute()
+        )
+        device = res.data[0] if res.data else None
+    except Exception as e:
+        if latest is None:
+            logger.error(f"Error checking status for {device_id}: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        # If DB query failed (e.g. table missing), answer from memory
+        device = None
+
+    if device is None and latest is None:
+        # If not in DB and not in memory, it's truly not found
+        raise HTTPException(status_code=404, detail="Device not found in registry")
+    device = {**(device or {"user_id": None}), **(latest or {})}
+
+    last_seen = device.get("last_seen")
+    is_connected = False
+    heartbeat_window_seconds = 15
+    try:
+        if isinstance(last_seen, str):
+            dt = datetime.fromisoformat(last_seen.replace("Z", "+00:00"))
+        elif isinstance(last_seen, datetime):
+            dt = last_seen
         else:
-            device = res.data[0]
-        
-        last_seen = device.get("last_seen")
-        is_connected = False
-        heartbeat_window_seconds = 15
-        try:
-            if isinstance(last_seen, str):
-                dt = datetime.fromisoformat(last_seen.replace("Z", "+00:00"))
-            elif isinstance(last_seen, datetime):
-                dt = last_seen
-            else:
-                dt = None
-            if dt:
-                if dt.tzinfo is not None:
-                    dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
-                now = datetime.utcnow()
-                if (now - dt).total_seconds() <= heartbeat_window_seconds:
-                    is_connected = True
-        except Exception:
-            pass
+            dt = None
+        if dt:
+            if dt.tzinfo is not None:
+                dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+            now = datetime.utcnow()
+            if (now - dt).total_seconds() <= heartbeat_window_seconds:
+                is_connected = True
+    except Exception:
+        pass
 
-        return {
-            "connected": is_connected,
-            "battery": device.get("battery_level", 0),
-            "user_id": device.get("user_id") 
-        }
-    except Exception as e:
-        # If DB query failed (e.g. table missing), check memory (use heartbeat window)
-        if device_id in in_memory_devices:
-            device = in_memory_devices[device_id]
-            last_seen = device.get("last_seen")
-            is_connected = False
-            try:
-                dt = datetime.fromisoformat(str(last_seen).replace("Z", "+00:00"))
-                if dt.tzinfo is not None:
-                    dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
-                now = datetime.utcnow()
-                if (now - dt).total_seconds() <= 15:
-                    is_connected = True
-            except Exception:
-                pass
-            return {
-                "connected": is_connected,
-                "battery": device.get("battery_level", 0),
-                "user_id": device.get("user_id")
-            }
-            
-        print(f"Error checking status for {device_id}: {e}")
-        # Only raise 500 if it's not a 404 we just raised
-        if isinstance(e, HTTPException):
-            raise e
-        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "connected": is_connected,
+        "battery": device.get("battery_level", 0),
+        "user_id": device.get("user_id") 
+    }
 
 @router.get("/frame/{device_id}")
 async def get_frame(device_id: str):
     """Get the latest frame from the device."""
-    if device_id not in frame_buffer:
+    frame = get_frame_store().latest(device_id)
+    if frame is None:
         raise HTTPException(status_code=404, detail="No frame available")
     
     from fastapi.responses import Response
-    return Response(content=frame_buffer[device_id], media_type="image/jpeg")
+    return Response(content=frame.data, media_type="image/jpeg")
+
+@router.get("/stream/{device_id}")
+async def stream_frames(device_id: str, request: Request):
+    """
+    Live MJPEG stream of the device's frames (usable directly as an <img> src).
+    Each frame is pushed once as it arrives; a viewer that reads slowly skips
+    to the newest frame instead of queueing.
+    """
+    return StreamingResponse(
+        frame_broadcaster.stream(device_id, request.is_disconnected),
+        media_type=MJPEG_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache, no-store", "X-Accel-Buffering": "no"}
+    )
+
 
 @router.post("/command/{device_id}")
 async def send_command(device_id: str, command: dict):
-    """Frontend sends a command (e.g., 'SHOW_TEXT') to Glass."""
-    if device_id not in command_queue:
-        command_queue[device_id] = []
-    
-    command_queue[device_id].append(command)
-    return {"status": "queued"}
+    """
+    Frontend sends a command (e.g., 'SHOW_TEXT') to Glass.
+    Devices waiting on the WebSocket channel or a long poll get it immediately.
+    """
+    queued = command_queue.enqueue(device_id, command)
+    return {"status": "queued", "id": queued["id"]}
+
+
+@router.get("/commands/{device_id}")
+async def poll_commands(
+    device_id: str,
+    ack: Optional[int] = Query(None, description="Id of the last command the device executed"),
+    timeout: Optional[float] = Query(None, ge=0, le=60, description="Seconds to wait for a command")
+):
+    """
+    Long poll for a device's commands.
+    Acknowledges commands up to 'ack', then returns the unacknowledged ones as
+    soon as there are any, or an empty list after the timeout. Commands stay
+    queued until acknowledged, so a response lost with a dropped connection is
+    delivered again on the next poll.
+    """
+    if ack is not None:
+        command_queue.ack(device_id, ack)
+    wait = settings.GLASS_COMMAND_POLL_SECONDS if timeout is None else timeout
+    commands = await command_queue.wait(device_id, timeout=wait)
+    return {
+        "status": "ok",
+        "commands": commands,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@router.post("/recognize/{device_id}")
+async def recognize_frame(device_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Recognize the person in the device's latest frame.
+    While the device is scanning, the answer comes from the face tracker's
+    largest track (marked 'tracked'), whose identity was recognized once.
+    Otherwise a frame that has not changed materially since the last analysed
+    one reuses that result (marked 'reused') instead of running recognition again.
+    A latest frame that cannot be decoded (e.g. a truncated upload) falls back
+    to the device's previous frames.
+    """
+    frames = get_frame_store().recent(device_id)
+    if not frames:
+        raise HTTPException(status_code=404, detail="No frame available")
+
+    if get_scanning_state(device_id).get("active"):
+        tracked = await _tracked_recognition(device_id, current_user)
+        if tracked is not None:
+            return tracked
+
+    frame = frame_hash = None
+    for candidate in frames:
+        try:
+            frame_hash = await run_in_threadpool(ImageProcessor.difference_hash, candidate.data)
+        except ImageProcessingError as e:
+            error = e
+            continue
+        frame = candidate.data
+        break
+    if frame is None:
+        raise HTTPException(status_code=400, detail=str(error))
+
+    viewer = (current_user or {}).get("sub")
+    previous = frame_changes.lookup(device_id, frame_hash, viewer)
+    if previous is not None:
+        return {**previous, "reused": True}
+
+    result = await recognize_image(frame, current_user)
+    frame_changes.record(device_id, frame_hash, result, viewer)
+    return {**result, "reused": False}
+
+
+async def _tracked_recognition(device_id: str, current_user: Optional[dict]) -> Optional[dict]:
+    """/recognize-style response for the device's largest track, or None without tracking state."""
+    tracks = get_face_tracker().tracks(device_id)
+    if tracks is None:
+        return None
+    if not tracks:
+        return {"success": True, "match": False, "message": "No face detected in image", "confidence": 0.0, "tracked": True}
+
+    primary = max(tracks, key=lambda track: track.area)
+    match = primary.match
+    if match is None or not match.matched or not match.user_id:
+        return {
+            "success": True,
+            "match": False,
+            "message": primary.error if match is None else "Face not recognized",
+            "confidence": (match.confidence if match else 0.0) or 0.0,
+            "tracked": True
+        }
+
+    current_user_id = (current_user or {}).get("sub")
+    role = (current_user or {}).get("role") or "user"
+    profile = await get_complete_user_profile(match.user_id, current_user_id, role)
+    return {"success": True, "match": True, "confidence": match.confidence, **profile, "tracked": True}
+
+
+@router.get("/tracks/{device_id}")
+async def get_tracks(device_id: str, current_user: dict = Depends(get_current_user)):
+    """Faces currently tracked on a scanning device, with their identities."""
+    tracker = get_face_tracker()
+    tracks = tracker.tracks(device_id) or []
+    width, height = tracker.image_size(device_id)
+
+    current_user_id = (current_user or {}).get("sub")
+    role = (current_user or {}).get("role") or "user"
+    matched_ids = [t.match.user_id for t in tracks if t.match and t.match.matched]
+    profiles = await get_user_profiles_batch(matched_ids, current_user_id, role)
+
+    faces = []
+    for track in tracks:
+        top, right, bottom, left = track.box
+        entry = {
+            "track_id": track.track_id,
+            "box": {"top": top, "right": right, "bottom": bottom, "left": left},
+            "match": False,
+            "confidence": 0.0
+        }
+        if track.match is None:
+            entry["message"] = track.error
+        elif track.match.matched and track.match.user_id in profiles:
+            entry.update({"match": True, "confidence": track.match.confidence, **profiles[track.match.user_id]})
+        else:
+            entry.update({"message": "Face not recognized", "confidence": track.match.confidence or 0.0})
+        faces.append(entry)
+
+    return {
+        "success": True,
+        "face_count": len(faces),
+        "image_width": width,
+        "image_height": height,
+        "faces": faces
+    }
+
+
+@router.get("/metrics")
+async def get_relay_metrics():
+    """Relay statistics, e.g. how many frames skipped recognition."""
+    return {
+        "frame_change": frame_changes.describe(),
+        "tracking": get_face_tracker().describe(),
+        "heartbeats": get_device_state_store().describe(),
+        "frames": get_frame_store().describe(),
+        "connected_devices": len(device_sockets),
+        "commands": command_queue.describe(),
+        "streams": frame_broadcaster.describe()
+    }
@@ -4,6 +4,7 @@ from typing import Dict, Any
 from services.storage_service import get_supabase_service
 from services.profile_picture_service import save_profile_picture
 from services.face_service import collect_face_images, get_face_service, FaceRecognitionError
+from utils.image_processor import ImageProcessingError
 from services.user_service import (
     get_complete_user_profile,
     update_user_privacy,
@@ -215,8 +216,8 @@ async def update_profile_picture(
 
         # Extra safety: verify that the face in the new picture matches this account
         try:
-            match_result = face_service.identify_user(image_bytes)
-        except FaceRecognitionError as e:
+            match_result = await face_service.identify_user_async(image_bytes)
+        except (FaceRecognitionError, ImageProcessingError) as e:
             raise HTTPException(status_code=400, detail=str(e))
 
         if not match_result.matched or not match_result.user_id:
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
 from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 # import base64
 import logging
-from services.user_service import get_complete_user_profile
+from services.user_service import get_complete_user_profile, get_user_profiles_batch
 from utils.config import get_config
 from utils.image_processor import ImageProcessor, ImageProcessingError
 from services.face_service import get_face_service, FaceRecognitionError
@@ -13,16 +14,38 @@ router = APIRouter(prefix="/api", tags=["recognition"])
 settings = get_config()
 logger = logging.getLogger(__name__)
 
+MAX_TOP_K = 20
+
 @router.post("/recognize")
-async def recognize_face(image: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+async def recognize_face(
+    image: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user),
+    top_k: Optional[int] = Query(None, ge=1, le=MAX_TOP_K)
+):
     """
     Recognize a person from their face image.
     Uses background worker (Celery) with local fallback for reliability.
+    With top_k, the response also includes the distance margin between the
+    first and second nearest identities, so callers can judge an ambiguous
+    match without a second recognition round trip. Doctors and admins also get
+    the k nearest identities themselves; other users would otherwise learn who
+    is enrolled.
+    """
+    image_bytes = await image.read()
+    return await recognize_image(image_bytes, current_user, top_k)
+
+
+async def recognize_image(
+    image_bytes: bytes,
+    current_user: Optional[dict],
+    top_k: Optional[int] = None
+) -> dict:
+    """
+    Recognition pipeline behind /api/recognize, shared with endpoints that
+    already hold the image bytes (e.g. the smart-glass relay's latest frame).
     """
     try:
-        image_bytes = await image.read()
-        
-        # 1. Fail Fast: Synchronous validation
+        # 1. Fail Fast: Synchronous header checks (size and file signature, no decode)
         try:
             ImageProcessor.validate_image_format(image_bytes)
             ImageProcessor.validate_image_size(image_bytes)
@@ -38,11 +61,16 @@ async def recognize_face(image: UploadFile = File(...), current_user: dict = Dep
         # 1. Comment out the "Direct Execution" block below.
         # 2. Uncomment the "Async Worker" block at the bottom.
         
-        def local_recognize():
-            face_service = get_face_service()
-            return face_service.identify_user(image_bytes)
-        
-        match_result = await run_in_threadpool(local_recognize)
+        # Decode and extraction run in the face engine's worker processes
+        face_service = get_face_service()
+        try:
+            if top_k:
+                recognition = await face_service.identify_candidates_async(image_bytes, top_k)
+            else:
+                recognition = await face_service.identify_user_async(image_bytes)
+        except ImageProcessingError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        match_result = recognition.best_match() if top_k else recognition
         
         task_result = {
             "success": True,
@@ -50,6 +78,11 @@ async def recognize_face(image: UploadFile = File(...), current_user: dict = Dep
             "user_id": match_result.user_id,
             "confidence": match_result.confidence or 0.0
         }
+        ranking = {}
+        if top_k:
+            ranking = {"margin": recognition.margin}
+            if (current_user or {}).get("role") in ["doctor", "admin"]:
+                ranking["candidates"] = [c.model_dump() for c in recognition.candidates]
 
         # --- ASYNC WORKER BLOCK (DISABLED FOR NOW) ---
         # # OPTIMIZATION: Resize image BEFORE sending to Redis.
@@ -77,7 +110,8 @@ async def recognize_face(image: UploadFile = File(...), current_user: dict = Dep
                 "success": True,
                 "match": False,
                 "message": "Face not recognized",
-                "confidence": task_result.get("confidence", 0.0)
+                "confidence": task_result.get("confidence", 0.0),
+                **ranking
             }
             
         # Fetch Full Profile
@@ -91,6 +125,7 @@ async def recognize_face(image: UploadFile = File(...), current_user: dict = Dep
             "success": True,
             "match": True,
             "confidence": task_result.get("confidence"),
+            **ranking,
             **profile
         }
     
@@ -111,3 +146,139 @@ async def recognize_face(image: UploadFile = File(...), current_user: dict = Dep
     except Exception as e:
         logger.error(f"Unexpected error in recognize_face: {e}")
         raise HTTPException(status_code=500, detail=f"Recognition failed: {str(e)}")
+
+
+@router.post("/recognize/multi")
+async def recognize_faces_multi(
+    image: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Recognize every person visible in one image (e.g. a smart-glass frame with
+    several people). Returns one entry per detected face with its bounding box
+    and, when matched, the profile. Registration keeps the single-face rule.
+    """
+    try:
+        image_bytes = await image.read()
+
+        try:
+            ImageProcessor.validate_image_format(image_bytes)
+            ImageProcessor.validate_image_size(image_bytes)
+        except ImageProcessingError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        def local_identify():
+            # Single decode; detection and encoding reuse the same pixels
+            decoded = ImageProcessor.decode_image(image_bytes)
+            return get_face_service().identify_faces(decoded)
+
+        try:
+            result = await run_in_threadpool(local_identify)
+        except ImageProcessingError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        current_user_id = (current_user or {}).get("sub")
+        role = (current_user or {}).get("role") or "user"
+        matched_ids = [f.match.user_id for f in result.faces if f.match and f.match.matched]
+        profiles = await get_user_profiles_batch(matched_ids, current_user_id, role)
+
+        faces = []
+        for face in result.faces:
+            entry = {"box": face.box.model_dump(), "match": False, "confidence": 0.0}
+            if face.match is None:
+                entry["message"] = face.error
+            elif face.match.matched and face.match.user_id in profiles:
+                entry.update({"match": True, "confidence": face.match.confidence, **profiles[face.match.user_id]})
+            else:
+                entry.update({"message": "Face not recognized", "confidence": face.match.confidence or 0.0})
+            faces.append(entry)
+
+        return {
+            "success": True,
+            "face_count": result.face_count,
+            "image_width": result.image_width,
+            "image_height": result.image_height,
+            "faces": faces
+        }
+
+    except HTTPException:
+        raise
+    except FaceRecognitionError as e:
+        logger.info(f"Multi-face scan result: {e}")
+        return {"success": True, "face_count": 0, "faces": [], "message": str(e)}
+    except Exception as e:
+        logger.error(f"Unexpected error in recognize_faces_multi: {e}")
+        raise HTTPException(status_code=500, detail=f"Recognition failed: {str(e)}")
+
+@router.post("/recognize/batch")
+async def recognize_faces_batch(
+    images: List[UploadFile] = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Recognize the person in each of several images in one request.
+    Images are decoded and encoded in parallel, all encodings are matched
+    against the gallery in a single matrix product, and matched profiles are
+    fetched with batched queries. Results are returned in request order; an
+    image that fails validation or has no usable face gets its own error
+    entry without failing the rest of the batch.
+    """
+    if len(images) > settings.RECOGNITION_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many images ({len(images)}). Maximum is {settings.RECOGNITION_BATCH_MAX_IMAGES} per request."
+        )
+
+    try:
+        results: List[Optional[dict]] = [None] * len(images)
+        pending = []  # (position, bytes) of images that passed validation
+
+        # 1. Fail Fast per image: cheap header/size checks (each image is decoded once, in step 2)
+        for i, upload in enumerate(images):
+            image_bytes = await upload.read()
+            try:
+                ImageProcessor.validate_image_format(image_bytes)
+                ImageProcessor.validate_image_size(image_bytes)
+            except ImageProcessingError as e:
+                results[i] = {"index": i, "success": False, "match": False, "message": str(e), "confidence": 0.0}
+                continue
+            pending.append((i, image_bytes))
+
+        # 2. Parallel extraction + one batched gallery match
+        face_service = get_face_service()
+        items = await face_service.identify_users_async([b for _, b in pending])
+
+        # 3. Batched profile fetch for every matched identity
+        current_user_id = (current_user or {}).get("sub")
+        role = (current_user or {}).get("role") or "user"
+        matched_ids = [item.match.user_id for item in items if item.match and item.match.matched]
+        profiles = await get_user_profiles_batch(matched_ids, current_user_id, role)
+
+        for (position, _), item in zip(pending, items):
+            if item.match is None:
+                results[position] = {
+                    "index": position, "success": True, "match": False,
+                    "message": item.error, "confidence": 0.0
+                }
+            elif not item.match.matched or item.match.user_id not in profiles:
+                results[position] = {
+                    "index": position, "success": True, "match": False,
+                    "message": "Face not recognized", "confidence": item.match.confidence or 0.0
+                }
+            else:
+                results[position] = {
+                    "index": position, "success": True, "match": True,
+                    "confidence": item.match.confidence,
+                    **profiles[item.match.user_id]
+                }
+
+        return {"success": True, "count": len(results), "results": results}
+
+    except HTTPException:
+        raise
+    except FaceRecognitionError as e:
+        logger.info(f"Batch scan failed: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error in recognize_faces_batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch recognition failed: {str(e)}")
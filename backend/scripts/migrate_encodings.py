@@ -1,60 +1,85 @@
 """
-Migration script to load existing face encodings from Supabase into local storage.
-Run this once to sync existing users.
+Migration script to convert stored face encodings to the compact binary format.
+Rewrites every legacy JSON users.face_encoding value as 'v2:' + base64 float32.
+Rows already in the binary format are left untouched, so it is safe to re-run.
+
+Usage:
+    python scripts/migrate_encodings.py [--dry-run]
 """
 
-import json
 import sys
 import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from services.storage_service import get_supabase_service
-from services.face_service import get_face_service
+from utils.encoding_codec import (
+    FORMAT_BINARY,
+    EncodingFormatError,
+    decode_face_encoding,
+    encode_face_encoding,
+    is_binary_encoding,
+)
 
-def migrate_encodings():
-    """Load all face encodings from Supabase and save to local storage"""
+def migrate_encodings(dry_run: bool = False):
+    """Convert all legacy JSON face encodings in Supabase to the binary v2 format"""
     supabase = get_supabase_service()
-    face_service = get_face_service()
-    
-    print("Starting encoding migration...")
-    
-    # Get all users with face encodings
-    users = supabase.get_users_with_encodings()
-    
-    if not users:
-        print("No users with face encodings found.")
-        return
-    
+
+    print("Starting encoding migration (JSON -> binary v2)...")
+
+    # Stream users with face encodings page by page (keyset on id, unaffected by our updates)
+    users = (
+        user
+        for page in supabase.iter_users_with_encodings(columns='id, name, email, face_encoding')
+        for user in page
+    )
+
     success_count = 0
+    skipped_count = 0
     error_count = 0
-    
+    bytes_before = 0
+    bytes_after = 0
+
     for user in users:
+        raw = user['face_encoding']
+        if is_binary_encoding(raw):
+            skipped_count += 1
+            continue
+
         try:
-            # Parse the face encoding JSON
-            encoding = json.loads(user['face_encoding'])
-            
-            # Save to local storage
-            face_service.save_encoding(
-                user_id=user['id'],
-                encoding=encoding,
-                user_data={
-                    'name': user['name'],
-                    'email': user['email']
-                }
-            )
-            
-            print(f"✓ Migrated encoding for {user['name']} ({user['email']})")
+            encoding = decode_face_encoding(raw)
+            converted = encode_face_encoding(encoding, FORMAT_BINARY)
+
+            if not dry_run:
+                # Write the column directly: face_updated_at is left as-is because
+                # the biometric itself has not changed, only its representation.
+                supabase.client.table('users').update(
+                    {'face_encoding': converted}
+                ).eq('id', user['id']).execute()
+
+            bytes_before += len(raw)
+            bytes_after += len(converted)
+            print(f"✓ Converted encoding for {user['name']} ({user['email']})")
             success_count += 1
-            
+
+        except EncodingFormatError as e:
+            print(f"✗ Invalid encoding for {user['name']}: {str(e)}")
+            error_count += 1
         except Exception as e:
             print(f"✗ Failed to migrate {user['name']}: {str(e)}")
             error_count += 1
-    
-    print(f"\nMigration complete!")
-    print(f"Success: {success_count}")
+
+    if not (success_count or skipped_count or error_count):
+        print("No users with face encodings found.")
+        return
+
+    print(f"\nMigration complete!{' (dry run, nothing written)' if dry_run else ''}")
+    print(f"Converted: {success_count}")
+    print(f"Already binary: {skipped_count}")
     print(f"Errors: {error_count}")
-    print(f"Total encodings in local storage: {face_service.get_encoding_count()}")
+    if success_count:
+        print(f"Payload size: {bytes_before} -> {bytes_after} bytes "
+              f"({bytes_before / max(bytes_after, 1):.1f}x smaller)")
 
 if __name__ == "__main__":
-    migrate_encodings()
+    migrate_encodings(dry_run="--dry-run" in sys.argv[1:])
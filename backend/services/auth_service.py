@@ -102,7 +102,7 @@ class AuthService:
 
     async def login_with_face(self, image_data: bytes) -> Dict[str, Any]:
         try:
-            match_result = self.face_service.identify_user(image_data)
+            match_result = await self.face_service.identify_user_async(image_data)
         except Exception as e:
             # Handle specific face recognition errors (e.g., image processing issues)
             raise HTTPException(status_code=400, detail=str(e))
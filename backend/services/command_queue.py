@@ -0,0 +1,118 @@
+"""
+Acknowledged command queue for smart glass devices.
+
+Commands used to sit in a plain list that was drained on the device's next
+/sync, so a command took up to a heartbeat to arrive and was lost if the
+response never reached the device. Every command now gets an id and stays
+queued until the device acknowledges it (by id, cumulatively). Devices wait
+for commands with a long poll (or the WebSocket channel), which returns as
+soon as a command is queued, so they can heartbeat slowly and still get
+commands at once. A delivery whose connection drops is simply delivered
+again on the next poll.
+
+Ids increase per device and start from the current time in milliseconds,
+so an ack from before a server restart never covers commands queued after it.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CommandQueue:
+    """Per-device pending commands with ids, cumulative acks and long-poll wake-ups."""
+
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._pending: Dict[str, "OrderedDict[int, dict]"] = {}
+        self._last_id: Dict[str, int] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self.queued = 0
+        self.acked = 0
+        self.dropped = 0
+
+    def enqueue(self, device_id: str, command: dict) -> dict:
+        """
+        Queue a command for a device and wake its waiting pollers.
+
+        Returns:
+            The queued command, with its id
+        """
+        command_id = max(self._last_id.get(device_id, 0) + 1, int(time.time() * 1000))
+        self._last_id[device_id] = command_id
+        queued = {**command, "id": command_id}
+
+        pending = self._pending.setdefault(device_id, OrderedDict())
+        pending[command_id] = queued
+        self.queued += 1
+        while len(pending) > self.max_pending:
+            dropped_id, _ = pending.popitem(last=False)
+            self.dropped += 1
+            logger.warning(f"Command queue for {device_id} is full; dropped command {dropped_id}")
+
+        event = self._events.pop(device_id, None)
+        if event is not None:
+            event.set()
+        return queued
+
+    def ack(self, device_id: str, up_to: int) -> int:
+        """
+        Acknowledge all of a device's commands with an id up to and including up_to.
+
+        Returns:
+            Number of commands removed
+        """
+        pending = self._pending.get(device_id)
+        if not pending:
+            return 0
+        removed = 0
+        while pending and next(iter(pending)) <= up_to:
+            pending.popitem(last=False)
+            removed += 1
+        if not pending:
+            del self._pending[device_id]
+        self.acked += removed
+        return removed
+
+    def pending(self, device_id: str, after: int = 0) -> List[dict]:
+        """A device's unacknowledged commands with an id greater than after, oldest first."""
+        pending = self._pending.get(device_id)
+        if not pending:
+            return []
+        return [command for command_id, command in pending.items() if command_id > after]
+
+    def take(self, device_id: str) -> List[dict]:
+        """Deliver and drop all pending commands (for devices that do not acknowledge)."""
+        pending = self._pending.pop(device_id, None)
+        return list(pending.values()) if pending else []
+
+    async def wait(self, device_id: str, after: int = 0, timeout: float = 25.0) -> List[dict]:
+        """
+        Long-poll for commands: return pending commands with an id greater than
+        after as soon as there are any, or an empty list after timeout seconds.
+        """
+        while True:
+            commands = self.pending(device_id, after)
+            if commands:
+                return commands
+            event = self._events.get(device_id)
+            if event is None:
+                event = self._events[device_id] = asyncio.Event()
+            try:
+                await asyncio.wait_for(event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return self.pending(device_id, after)
+
+    def describe(self) -> Dict[str, Any]:
+        """Queue statistics for health reporting."""
+        return {
+            "devices": len(self._pending),
+            "pending": sum(len(pending) for pending in self._pending.values()),
+            "queued": self.queued,
+            "acked": self.acked,
+            "dropped": self.dropped,
+        }
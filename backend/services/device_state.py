@@ -0,0 +1,149 @@
+"""
+Write-behind store for smart glass device heartbeats.
+
+Every device sends a heartbeat every couple of seconds. Writing each one to
+the database costs two blocking round trips per heartbeat. Instead,
+heartbeats update an in-memory record and mark the device dirty; a
+background task flushes the status, battery level and last-seen time of
+all dirty devices in one bulk upsert every flush_interval seconds. The
+heartbeat itself is memory-only, and database writes scale with the flush
+interval rather than with device count times heartbeat rate.
+
+The in-memory records are also the freshest source of a device's
+last-seen time, so status checks read them before the database.
+"""
+
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import logging
+import threading
+
+from fastapi.concurrency import run_in_threadpool
+
+from utils.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceStateStore:
+    """In-memory device records with periodic bulk flushes to the database."""
+
+    def __init__(self, upsert: Callable[[List[Dict[str, Any]]], None], flush_interval: float = 5.0):
+        """
+        Args:
+            upsert: Writes a list of device rows in one request (insert or update by device_id)
+            flush_interval: Seconds between flushes
+        """
+        self._upsert = upsert
+        self.flush_interval = flush_interval
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.heartbeats = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+
+    def heartbeat(self, device_id: str, battery: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Record a heartbeat in memory; the database is updated on the next flush.
+        Without a battery level the last reported one is kept.
+        """
+        with self._lock:
+            if battery is None:
+                battery = (self._records.get(device_id) or {}).get("battery_level", 0)
+            record = {
+                "device_id": device_id,
+                "status": "online",
+                "battery_level": battery,
+                "last_seen": datetime.utcnow().isoformat(),
+            }
+            self._records[device_id] = record
+            self._dirty.add(device_id)
+            self.heartbeats += 1
+        return record
+
+    def get(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Latest heartbeat of a device seen by this process."""
+        record = self._records.get(device_id)
+        return dict(record) if record else None
+
+    def flush(self) -> int:
+        """
+        Write all dirty devices in one bulk upsert.
+        On failure the devices stay dirty and are retried on the next flush.
+
+        Returns:
+            Number of rows written
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = [dict(self._records[device_id]) for device_id in dirty]
+        if not rows:
+            return 0
+        try:
+            self._upsert(rows)
+        except Exception as e:
+            logger.error(f"Device heartbeat flush failed ({len(rows)} devices): {e}")
+            with self._lock:
+                self._dirty |= dirty
+                self.failures += 1
+            return 0
+        self.flushes += 1
+        self.rows_written += len(rows)
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await run_in_threadpool(self.flush)
+
+    def start(self) -> None:
+        """Start the periodic flush task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write whatever is still pending."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await run_in_threadpool(self.flush)
+
+    def describe(self) -> Dict[str, Any]:
+        """Store statistics for health reporting."""
+        return {
+            "devices": len(self._records),
+            "pending": len(self._dirty),
+            "heartbeats": self.heartbeats,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failures": self.failures,
+        }
+
+
+# Singleton instance
+_device_state_store: Optional[DeviceStateStore] = None
+
+
+def get_device_state_store() -> DeviceStateStore:
+    """
+    Get or create the device state store singleton instance.
+
+    Returns:
+        DeviceStateStore instance
+    """
+    global _device_state_store
+    if _device_state_store is None:
+        from services.storage_service import get_supabase_service
+        _device_state_store = DeviceStateStore(
+            lambda rows: get_supabase_service().upsert_device_states(rows),
+            flush_interval=config.GLASS_HEARTBEAT_FLUSH_SECONDS
+        )
+    return _device_state_store
@@ -0,0 +1,115 @@
+"""
+Content-addressed cache of face extraction results.
+
+The same image bytes are often analyzed more than once: the profile picture
+flow identifies the face and then crops it, clients retry uploads, and glass
+devices re-send unchanged frames. Results are cached under a fast hash of the
+raw bytes, so a repeat costs one hash and a dictionary lookup instead of a
+decode and a dlib pass.
+
+Only the extraction result and the face location are kept; decoded pixels
+are far too large to cache. Entries are evicted least-recently-used once
+max_entries is reached and expire after ttl_seconds.
+
+xxhash is used when installed; otherwise hashlib's blake2b, which is still
+fast enough that hashing a 5 MB upload is a few milliseconds.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+import hashlib
+import threading
+import time
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def content_hash(data: bytes) -> str:
+    """128-bit hex digest of the bytes (xxh3 when available, blake2b otherwise)."""
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class FaceResultCache:
+    """Thread-safe LRU cache with a TTL, keyed by image content."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(image_bytes: bytes, variant: str) -> str:
+        """
+        Cache key for image bytes analyzed with a given variant (e.g. detector spec),
+        since different detectors can find different faces in the same image.
+        """
+        return f"{variant}:{content_hash(image_bytes)}"
+
+    def get(self, key: str) -> Optional[Tuple[Any, Any]]:
+        """
+        Look up a cached entry.
+
+        Returns:
+            Tuple of (result, face location) or None on a miss
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() - entry[0] > self.ttl_seconds > 0:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key: str, result: Any, location: Any = None) -> None:
+        """Store a result, evicting the least recently used entries beyond max_entries."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock(), result, location)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def describe(self) -> Dict[str, Any]:
+        """Cache statistics for health reporting."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "hash": "xxh3" if xxhash is not None else "blake2b",
+        }
@@ -0,0 +1,142 @@
+"""
+Face detector backends for Smart Glass AI system.
+
+Detection is the most expensive step of a recognition call, so the detector
+is a strategy chosen per endpoint through Config:
+
+- 'hog':  dlib HOG (face_recognition default), CPU, good accuracy/latency balance
+- 'cnn':  dlib CNN (mmod), most accurate, only practical with a GPU build of dlib
+- 'haar': OpenCV Haar cascade, CPU, fastest and least accurate
+
+dlib detectors take an upsample count: each upsample doubles the image
+before detection, finding smaller faces at roughly 4x the cost.
+
+A detector spec is written as 'model' or 'model:upsample', e.g. 'hog:0'.
+The pre-detection frame quality gate is tuned per profile the same way.
+"""
+
+from typing import Any, List, Optional, Tuple
+import logging
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+logger = logging.getLogger(__name__)
+
+DETECTOR_HOG = "hog"
+DETECTOR_CNN = "cnn"
+DETECTOR_HAAR = "haar"
+DETECTOR_MODELS = (DETECTOR_HOG, DETECTOR_CNN, DETECTOR_HAAR)
+
+LANDMARK_MODELS = ("small", "large")
+
+# Endpoint profiles that can select their own detector
+PROFILE_RECOGNITION = "recognition"
+PROFILE_ENROLLMENT = "enrollment"
+PROFILE_MULTI = "multi"
+
+FaceLocation = Tuple[int, int, int, int]  # (top, right, bottom, left)
+
+
+class FaceDetectorError(Exception):
+    """Raised when a detector cannot be configured or run."""
+    pass
+
+
+def parse_detector_spec(spec: str) -> Tuple[str, int]:
+    """
+    Parse a 'model[:upsample]' detector spec.
+
+    Returns:
+        Tuple of (model, upsample)
+
+    Raises:
+        FaceDetectorError: If the model or upsample count is invalid
+    """
+    model, _, upsample = (spec or DETECTOR_HOG).strip().lower().partition(":")
+    if model not in DETECTOR_MODELS:
+        raise FaceDetectorError(
+            f"Unknown face detector '{model}'. Supported: {', '.join(DETECTOR_MODELS)}"
+        )
+    try:
+        upsample_count = int(upsample) if upsample else 1
+    except ValueError:
+        raise FaceDetectorError(f"Invalid upsample count in detector spec '{spec}'")
+    if upsample_count < 0:
+        raise FaceDetectorError(f"Upsample count must be 0 or greater in '{spec}'")
+    return model, upsample_count
+
+
+class DlibDetector:
+    """dlib HOG or CNN detector via face_recognition.face_locations."""
+
+    def __init__(self, model: str = DETECTOR_HOG, upsample: int = 1):
+        self.name = model
+        self.model = model
+        self.upsample = upsample
+
+    def detect(self, image, fr_module) -> List[FaceLocation]:
+        return fr_module.face_locations(
+            image, number_of_times_to_upsample=self.upsample, model=self.model
+        )
+
+
+class HaarDetector:
+    """OpenCV frontal-face Haar cascade (bundled with opencv-python)."""
+
+    name = DETECTOR_HAAR
+
+    def __init__(self, scale_factor: float = 1.1, min_neighbors: int = 5, min_size: int = 40):
+        if cv2 is None:
+            raise FaceDetectorError("Haar face detector requires opencv")
+        path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        self._cascade = cv2.CascadeClassifier(path)
+        if self._cascade.empty():
+            raise FaceDetectorError(f"Failed to load Haar cascade from {path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, image, fr_module=None) -> List[FaceLocation]:
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        boxes = self._cascade.detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=(self.min_size, self.min_size)
+        )
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in boxes]
+
+
+def create_detector(spec: str) -> Any:
+    """
+    Build a detector from a 'model[:upsample]' spec.
+
+    Raises:
+        FaceDetectorError: If the spec is invalid or the backend is unavailable
+    """
+    model, upsample = parse_detector_spec(spec)
+    if model == DETECTOR_HAAR:
+        return HaarDetector()
+    return DlibDetector(model, upsample)
+
+
+def profile_detector_spec(config: Any, profile: str) -> str:
+    """Detector spec for an endpoint profile, falling back to FACE_DETECTOR."""
+    override: Optional[str] = {
+        PROFILE_RECOGNITION: config.FACE_DETECTOR_RECOGNITION,
+        PROFILE_ENROLLMENT: config.FACE_DETECTOR_ENROLLMENT,
+        PROFILE_MULTI: config.FACE_DETECTOR_MULTI,
+    }.get(profile)
+    return override or config.FACE_DETECTOR
+
+
+def profile_quality_gate_spec(config: Any, profile: str) -> str:
+    """Quality gate overrides for an endpoint profile ('' keeps FACE_QUALITY_GATE)."""
+    return {
+        PROFILE_RECOGNITION: config.FACE_QUALITY_GATE_RECOGNITION,
+        PROFILE_ENROLLMENT: config.FACE_QUALITY_GATE_ENROLLMENT,
+        PROFILE_MULTI: config.FACE_QUALITY_GATE_MULTI,
+    }.get(profile, "")
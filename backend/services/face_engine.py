@@ -0,0 +1,155 @@
+"""
+Process-pool execution engine for face extraction.
+
+dlib detection/encoding holds the GIL for most of its run time, so threads
+cannot use more than one core for it. The engine runs extraction in a pool
+of worker processes instead: each worker loads the dlib models once when it
+starts, receives raw image bytes and sends back the extraction result with
+the encoding as a float32 array. Gallery matching stays in the API process,
+where the resident gallery lives.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import logging
+import multiprocessing
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Per-process service used inside workers (set by the initializer)
+_worker_service = None
+
+
+def _init_worker() -> None:
+    """Worker initializer: import face_recognition (loads the dlib models) and warm up."""
+    global _worker_service
+    from services.face_service import get_face_service, fr, np
+
+    _worker_service = get_face_service()
+    if fr is not None and np is not None:
+        # One tiny detection pages in the detector so the first request is not slower
+        fr.face_locations(np.zeros((64, 64, 3), dtype=np.uint8))
+
+
+def _ping() -> bool:
+    return _worker_service is not None
+
+
+def _analyze_in_worker(image_bytes: bytes, profile: str) -> Tuple[Any, Any, Any]:
+    """
+    Decode, detect and encode one image inside a worker.
+
+    Returns:
+        Tuple of (FaceExtractionResult without the encoding, float32 encoding or None,
+        face location in the decoded image or None)
+
+    Raises:
+        ImageProcessingError: If the image cannot be decoded
+    """
+    from services.face_service import np
+    from utils.image_processor import ImageProcessor
+
+    decoded = ImageProcessor.decode_image(image_bytes)
+    analysis = _worker_service.analyze_image(decoded, profile)
+    result = analysis.result
+    encoding = None
+    if result.encoding is not None:
+        encoding = np.asarray(result.encoding, dtype=np.float32)
+    location = tuple(int(v) for v in analysis.location) if analysis.location is not None else None
+    return result.model_copy(update={"encoding": None}), encoding, location
+
+
+class FaceEngine:
+    """
+    Pool of worker processes for face extraction.
+
+    Workers use the 'spawn' start method so they never inherit the API
+    process's threads or open connections.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._pool is not None
+
+    def start(self) -> None:
+        """Start the worker processes and wait until each has loaded the models."""
+        with self._lock:
+            if self._pool is not None:
+                return
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+            pool = self._pool
+        for future in [pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+        logger.info(f"Face engine started with {self.workers} worker processes")
+
+    def stop(self) -> None:
+        """Shut the worker processes down."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+            logger.info("Face engine stopped")
+
+    async def extract(self, image_bytes: bytes, profile: str):
+        """
+        Run extraction for one image in a worker process.
+
+        Returns:
+            FaceExtractionResult
+
+        Raises:
+            ImageProcessingError: If the image cannot be decoded
+            BrokenProcessPool: If a worker died; the pool is discarded and must be started again
+        """
+        result, _ = await self.analyze(image_bytes, profile)
+        return result
+
+    async def analyze(self, image_bytes: bytes, profile: str) -> Tuple[Any, Any]:
+        """
+        Run extraction for one image in a worker process, also returning where the face is.
+        The decoded pixels stay in the worker; the location refers to
+        ImageProcessor.decode_image of the same bytes.
+
+        Returns:
+            Tuple of (FaceExtractionResult, face location or None)
+
+        Raises:
+            ImageProcessingError: If the image cannot be decoded
+            BrokenProcessPool: If a worker died; the pool is discarded and must be started again
+        """
+        pool = self._pool
+        if pool is None:
+            raise RuntimeError("Face engine is not running")
+
+        loop = asyncio.get_running_loop()
+        try:
+            result, encoding, location = await loop.run_in_executor(
+                pool, _analyze_in_worker, image_bytes, profile
+            )
+        except BrokenProcessPool:
+            logger.error("Face engine worker died; discarding the pool")
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+        if encoding is not None:
+            result.encoding = encoding.tolist()
+        return result, location
+
+    def describe(self) -> Dict[str, Any]:
+        """Engine status for health reporting."""
+        return {"workers": self.workers, "running": self.is_running}
@@ -0,0 +1,421 @@
+"""
+Resident face gallery for Smart Glass AI system.
+Keeps every stored face encoding in one contiguous matrix so matching
+is a single in-process NumPy operation instead of a database round trip.
+
+A user can own several rows (templates): the averaged enrollment encoding
+plus one per captured angle. A user's rows are always contiguous, so the
+per-user distance is a segment minimum (np.minimum.reduceat) over the
+row distances of a single matrix product.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import logging
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from utils.encoding_codec import ENCODING_DIMENSION, EncodingFormatError, decode_face_encoding
+
+logger = logging.getLogger(__name__)
+
+# Delta syncs re-read this much history before the watermark so rows committed
+# slightly out of timestamp order are not missed. Re-applied rows are no-ops.
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+
+class GallerySnapshot(NamedTuple):
+    """Immutable view of the gallery at one point in time."""
+    ids: Any            # np.ndarray[object] of owning user ids, parallel to matrix rows
+    matrix: Any         # np.ndarray[float32] of shape (N, 128)
+    sq_norms: Any       # np.ndarray[float32] of squared row norms
+    version: int
+    user_ids: Any = None    # np.ndarray[object] of distinct user ids, in row order
+    starts: Any = None      # np.ndarray[int64] first row of each user; None means one row per user
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def has_templates(self) -> bool:
+        """True when at least one user owns more than one row."""
+        return self.starts is not None and len(self.starts) < len(self.ids)
+
+    @property
+    def user_count(self) -> int:
+        return len(self.starts) if self.starts is not None else len(self.ids)
+
+    def distances(self, encoding) -> Any:
+        """
+        Euclidean distance from one encoding to every gallery row.
+        Uses ||a - b||^2 = ||a||^2 - 2ab + ||b||^2 so the work is one matrix-vector product.
+        """
+        query = np.asarray(encoding, dtype=np.float32)
+        sq = self.sq_norms - 2.0 * (self.matrix @ query) + float(query @ query)
+        return np.sqrt(np.maximum(sq, 0.0))
+
+    def distances_batch(self, encodings) -> Any:
+        """
+        Distances from several encodings at once: one (Q x 128) . (128 x N) matrix product.
+        Returns an array of shape (Q, N).
+        """
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIMENSION)
+        query_sq = np.einsum('ij,ij->i', queries, queries)
+        sq = self.sq_norms[None, :] - 2.0 * (queries @ self.matrix.T) + query_sq[:, None]
+        return np.sqrt(np.maximum(sq, 0.0))
+
+    def user_distances(self, distances) -> Any:
+        """
+        Reduce row distances (last axis) to one distance per user: the minimum over that user's templates.
+        Columns of the result follow user_rows().
+        """
+        if not self.has_templates:
+            return distances
+        return np.minimum.reduceat(distances, self.starts, axis=-1)
+
+    def user_rows(self, users, distances) -> Any:
+        """
+        Map user positions (as indexed by user_distances) to their closest row.
+
+        Args:
+            users: Positions into the per-user axis
+            distances: Row distances for the same query (1-d)
+        """
+        users = np.asarray(users, dtype=np.int64)
+        if not self.has_templates:
+            return users
+        ends = np.append(self.starts[1:], len(self.ids))
+        return np.array([
+            self.starts[u] + int(np.argmin(distances[self.starts[u]:ends[u]])) for u in users
+        ], dtype=np.int64)
+
+
+class FaceGallery:
+    """
+    Thread-safe in-memory gallery of face encodings.
+
+    The gallery is loaded lazily on first use through the supplied loader,
+    which yields pages of user rows, and patched in place by upsert/remove.
+    Rows flagged 'template' add extra encodings to a user and are only kept
+    for users that also have a primary (non-template) row. Every refresh_seconds it is brought up
+    to date through delta_loader, which returns only rows changed since the
+    last watermark (rows with a NULL encoding are tombstones). A full reload
+    still happens every full_resync_seconds to pick up hard-deleted users.
+    A zero interval disables that refresh; without a delta_loader every
+    refresh is a full reload.
+
+    Only the first load runs on the caller's thread. Later syncs and reloads
+    run in a background thread while readers keep matching against the
+    current snapshot; a failed refresh is logged and retried after another
+    refresh_seconds.
+
+    Readers always work on an immutable snapshot; writers build new arrays
+    (copy-on-write) so matching never sees a half-applied update.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Iterable[List[Dict[str, Any]]]],
+        refresh_seconds: float = 0.0,
+        delta_loader: Optional[Callable[[str], List[Dict[str, Any]]]] = None,
+        full_resync_seconds: float = 0.0
+    ):
+        self._loader = loader
+        self._delta_loader = delta_loader
+        self._refresh_seconds = refresh_seconds
+        self._full_resync_seconds = full_resync_seconds
+        self._lock = threading.RLock()
+        self._snapshot: Optional[GallerySnapshot] = None
+        self._positions: Dict[str, Tuple[int, int]] = {}
+        self._loaded_at: Optional[float] = None
+        self._synced_at: Optional[float] = None
+        self._watermark: Optional[datetime] = None
+        self._version = 0
+        self._refreshing = False
+
+    def __len__(self) -> int:
+        snapshot = self._snapshot
+        return len(snapshot) if snapshot is not None else 0
+
+    @property
+    def user_count(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.user_count if snapshot is not None else 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        return self._watermark
+
+    @staticmethod
+    def _elapsed(since: Optional[float], interval: float) -> bool:
+        if since is None:
+            return True
+        return interval > 0 and time.monotonic() - since >= interval
+
+    def _needs_reload(self) -> bool:
+        if self._snapshot is None:
+            return True
+        if self._delta_loader is None or self._watermark is None:
+            interval = self._refresh_seconds
+        else:
+            interval = self._full_resync_seconds
+        # A failed reload backs off through _synced_at like a failed sync
+        return self._elapsed(self._loaded_at, interval) and self._elapsed(self._synced_at, self._refresh_seconds)
+
+    def _needs_sync(self) -> bool:
+        return self._elapsed(self._synced_at, self._refresh_seconds)
+
+    def snapshot(self) -> GallerySnapshot:
+        """
+        Return the current gallery. The first call loads it; afterwards a due
+        sync or reload is started in the background and the current snapshot
+        is returned without waiting for it.
+
+        Raises:
+            Whatever the loader raises, on the first load only
+        """
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self.reload()
+        elif (self._needs_reload() or self._needs_sync()) and not self._refreshing:
+            with self._lock:
+                if self._refreshing:
+                    return self._snapshot
+                self._refreshing = True
+            threading.Thread(target=self._refresh, name="face-gallery-refresh", daemon=True).start()
+        return self._snapshot
+
+    def _refresh(self) -> None:
+        """Background sync or reload; on failure keep serving the current snapshot."""
+        try:
+            with self._lock:
+                needs_reload = self._needs_reload()
+                needs_sync = not needs_reload and self._needs_sync()
+            # The fetch runs without the lock so writers and readers never wait on it
+            if needs_reload:
+                self.reload()
+            elif needs_sync:
+                self.sync()
+        except Exception as e:
+            logger.error(f"Face gallery refresh failed, serving the loaded gallery: {e}")
+            with self._lock:
+                self._synced_at = time.monotonic()
+        finally:
+            self._refreshing = False
+
+    def reload(self) -> None:
+        """
+        Replace the gallery contents with a fresh load from the loader.
+        Pages are decoded to float32 vectors as they arrive, so only one page of
+        raw rows is held in memory at a time.
+        """
+        started = datetime.now(timezone.utc)
+        primaries: Dict[str, Any] = {}
+        templates: Dict[str, List[Any]] = {}
+        watermark: Optional[datetime] = None
+        for page in self._loader():
+            _collect_rows(page, primaries, templates)
+            page_latest = latest_timestamp(page)
+            if page_latest and (watermark is None or page_latest > watermark):
+                watermark = page_latest
+
+        ids, matrix = _group_templates(primaries, templates)
+        with self._lock:
+            self._publish(ids, matrix)
+            self._loaded_at = self._synced_at = time.monotonic()
+            self._watermark = watermark or started
+        logger.info(f"Face gallery loaded with {len(primaries)} users ({len(ids)} templates)")
+
+    def sync(self) -> None:
+        """
+        Bring the gallery up to date with rows changed since the watermark.
+        Falls back to a full reload when no delta loader is configured.
+        """
+        with self._lock:
+            watermark = self._watermark
+        if self._delta_loader is None or watermark is None:
+            self.reload()
+            return
+
+        since = (watermark - WATERMARK_OVERLAP).isoformat()
+        rows = self._delta_loader(since)
+        upserts, removals = split_delta_rows(rows)
+        with self._lock:
+            self.apply(upserts, removals)
+            self._synced_at = time.monotonic()
+            if self._watermark is not None:
+                self._watermark = max(self._watermark, latest_timestamp(rows) or self._watermark)
+        if rows:
+            logger.debug(
+                f"Face gallery delta sync: {len(upserts)} upserts, {len(removals)} removals"
+            )
+
+    def invalidate(self) -> None:
+        """Drop the cached gallery so the next snapshot reloads it."""
+        with self._lock:
+            self._snapshot = None
+            self._positions = {}
+            self._loaded_at = None
+            self._synced_at = None
+            self._watermark = None
+
+    def upsert(self, user_id: str, encodings) -> None:
+        """
+        Insert or replace a user's templates.
+
+        Args:
+            user_id: User identifier
+            encodings: One encoding, or a list of encodings with the primary one first
+        """
+        self.apply({str(user_id): encodings}, ())
+
+    def remove(self, user_id: str) -> None:
+        """Remove all of a user's templates from the gallery if present."""
+        self.apply({}, (str(user_id),))
+
+    def apply(self, upserts: Dict[str, Any], removals: Iterable[str]) -> None:
+        """
+        Patch the gallery with a batch of changes in one copy.
+        Each upsert replaces all of that user's templates.
+        A no-op while the gallery is not loaded: the next load picks the changes up.
+        """
+        with self._lock:
+            if self._snapshot is None:
+                return
+
+            ids = list(self._snapshot.ids)
+            matrix = self._snapshot.matrix
+            upserts = {uid: _as_matrix(vectors) for uid, vectors in upserts.items()}
+            # Users that are already up to date are skipped, so replayed deltas cost nothing
+            upserts = {
+                uid: vectors for uid, vectors in upserts.items()
+                if uid not in self._positions
+                or not np.array_equal(matrix[slice(*self._positions[uid])], vectors)
+            }
+            drop = {uid for uid in removals if uid in self._positions}
+            drop.update(uid for uid in upserts if uid in self._positions)
+
+            if drop:
+                keep = np.array([uid not in drop for uid in ids], dtype=bool)
+                ids = [uid for uid, kept in zip(ids, keep) if kept]
+                matrix = matrix[keep]
+
+            if upserts:
+                for uid, vectors in upserts.items():
+                    ids.extend([uid] * len(vectors))
+                matrix = np.concatenate([matrix, *upserts.values()], axis=0)
+
+            if drop or upserts:
+                self._publish(ids, matrix)
+
+    def _publish(self, ids: List[str], matrix) -> None:
+        # Callers keep each user's rows contiguous, so users start wherever the id changes
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32).reshape(-1, ENCODING_DIMENSION)
+        row_ids = np.array(ids, dtype=object)
+        if len(row_ids):
+            starts = np.flatnonzero(np.concatenate([[True], row_ids[1:] != row_ids[:-1]]))
+        else:
+            starts = np.empty(0, dtype=np.int64)
+        ends = np.append(starts[1:], len(row_ids))
+
+        self._version += 1
+        self._snapshot = GallerySnapshot(
+            ids=row_ids,
+            matrix=matrix,
+            sq_norms=np.einsum('ij,ij->i', matrix, matrix),
+            version=self._version,
+            user_ids=row_ids[starts],
+            starts=starts.astype(np.int64),
+        )
+        self._positions = {
+            row_ids[start]: (int(start), int(end)) for start, end in zip(starts, ends)
+        }
+
+
+def _as_matrix(vectors) -> Any:
+    return np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_DIMENSION)
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    # Naive timestamps are written by the backend in UTC
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def latest_timestamp(rows: Iterable[Dict[str, Any]]) -> Optional[datetime]:
+    """Newest updated_at/face_updated_at across rows, used as the sync watermark."""
+    latest = None
+    for row in rows:
+        for key in ('updated_at', 'face_updated_at'):
+            ts = _parse_timestamp(row.get(key))
+            if ts and (latest is None or ts > latest):
+                latest = ts
+    return latest
+
+
+def split_delta_rows(rows: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Split changed rows into per-user templates to upsert and tombstoned ids to remove.
+    A user is a tombstone when its primary row has no encoding.
+    """
+    rows = list(rows)
+    removals = [
+        str(row['id']) for row in rows
+        if not row.get('template') and not row.get('face_encoding')
+    ]
+    primaries: Dict[str, Any] = {}
+    templates: Dict[str, List[Any]] = {}
+    _collect_rows(rows, primaries, templates)
+    return {
+        uid: [primary, *templates.get(uid, [])] for uid, primary in primaries.items()
+    }, removals
+
+
+def _collect_rows(
+    rows: Iterable[Dict[str, Any]],
+    primaries: Dict[str, Any],
+    templates: Dict[str, List[Any]]
+) -> None:
+    """Decode rows into primary encodings and per-user template lists."""
+    for row in rows:
+        raw = row.get('face_encoding')
+        if not raw:
+            continue
+        try:
+            vector = np.asarray(decode_face_encoding(raw), dtype=np.float32)
+        except EncodingFormatError as e:
+            logger.warning(f"Skipping invalid encoding for user {row.get('id')}: {e}")
+            continue
+        uid = str(row['id'])
+        if row.get('template'):
+            templates.setdefault(uid, []).append(vector)
+        else:
+            primaries[uid] = vector
+
+
+def _group_templates(primaries: Dict[str, Any], templates: Dict[str, List[Any]]) -> Tuple[List[str], Any]:
+    """Lay out each user's rows contiguously: primary encoding first, then its templates."""
+    ids: List[str] = []
+    vectors: List[Any] = []
+    for uid, primary in primaries.items():
+        user_vectors = [primary, *templates.get(uid, [])]
+        ids.extend([uid] * len(user_vectors))
+        vectors.extend(user_vectors)
+    if not vectors:
+        return ids, np.empty((0, ENCODING_DIMENSION), dtype=np.float32)
+    return ids, np.stack(vectors).astype(np.float32, copy=False)
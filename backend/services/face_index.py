@@ -0,0 +1,336 @@
+"""
+Nearest-neighbour indexes over the resident face gallery.
+
+Small galleries are searched exactly by brute force. Large galleries use an
+IVF (inverted file) index built in NumPy: encodings are clustered with
+k-means, a query only scans the nprobe closest clusters, and candidates are
+ranked on a low-dimensional PCA projection before the best ones are
+re-ranked exactly in the full 128-d space.
+
+Both indexes return the k nearest distinct users: when a user owns several
+template rows only the closest of them is reported.
+
+Distances in the projected space are lower bounds of the true distances
+(orthonormal projection never increases length), which gives the recall
+guard: re-ranking keeps expanding until no unranked candidate's lower bound
+can beat the current k-th exact distance, so results are exact within the
+probed clusters.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+import logging
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from services.face_gallery import GallerySnapshot
+
+logger = logging.getLogger(__name__)
+
+INDEX_BRUTE = "brute"
+INDEX_IVF = "ivf"
+INDEX_AUTO = "auto"
+
+# Rows per block when assigning encodings to centroids, bounds the temporary distance matrix
+_ASSIGN_BLOCK_ROWS = 8192
+
+
+def _smallest(values, k: int):
+    """Indices of the k smallest values, sorted ascending (partial sort)."""
+    k = min(k, len(values))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(values):
+        part = np.argpartition(values, k - 1)[:k]
+    else:
+        part = np.arange(len(values))
+    return part[np.argsort(values[part], kind='stable')]
+
+
+def _distinct_owners(snapshot: GallerySnapshot, rows, distances, k: int):
+    """Positions of the k nearest rows with distinct owners, sorted ascending."""
+    if not snapshot.has_templates:
+        return _smallest(distances, k)
+    order = np.argsort(distances, kind='stable')
+    # np.unique keeps the first (nearest) occurrence of each owner
+    _, first = np.unique(snapshot.ids[rows[order]].astype(str), return_index=True)
+    return order[np.sort(first)[:k]]
+
+
+class BruteForceIndex:
+    """Exact search: one matrix-vector product against every gallery row."""
+
+    name = INDEX_BRUTE
+
+    def search(self, snapshot: GallerySnapshot, encoding, k: int = 1) -> Tuple[Any, Any]:
+        """
+        Find the k nearest users, each represented by their closest gallery row.
+
+        Returns:
+            Tuple of (row indices into the snapshot, exact distances), nearest first
+        """
+        distances = snapshot.distances(encoding)
+        user_distances = snapshot.user_distances(distances)
+        users = _smallest(user_distances, k)
+        return snapshot.user_rows(users, distances), user_distances[users]
+
+
+class IVFIndex:
+    """Inverted-file index with PCA-projected candidate ranking and exact re-ranking."""
+
+    name = INDEX_IVF
+
+    def __init__(
+        self,
+        nlist: int = 0,
+        nprobe: int = 8,
+        projection_dim: int = 32,
+        rerank: int = 32,
+        train_iterations: int = 10,
+        seed: int = 0
+    ):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.projection_dim = projection_dim
+        self.rerank = rerank
+        self.train_iterations = train_iterations
+        self.seed = seed
+
+        self.version: Optional[int] = None
+        self.trained_size = 0
+        self.centroids = None       # (nlist, 128)
+        self.centroid_sq = None     # (nlist,)
+        self.projection = None      # (128, projection_dim), orthonormal columns
+        self.list_offsets = None    # (nlist + 1,) start of each list in list order
+        self.list_rows = None       # gallery row index for each list-ordered position
+        self.projected = None       # (N, projection_dim) list-ordered projected encodings
+        self.projected_sq = None    # (N,)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def build(self, snapshot: GallerySnapshot, retrain: bool = True) -> None:
+        """
+        Build the index for a gallery snapshot.
+        With retrain=False the existing centroids and projection are reused and
+        rows are only reassigned, which is much cheaper than k-means.
+        """
+        started = time.perf_counter()
+        matrix = snapshot.matrix
+        rng = np.random.default_rng(self.seed)
+
+        if retrain or not self.is_trained:
+            self._train(matrix, rng)
+
+        assignments = self._assign(matrix)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.list_rows = order
+        self.projected = np.ascontiguousarray(matrix[order] @ self.projection)
+        self.projected_sq = np.einsum('ij,ij->i', self.projected, self.projected)
+        self.version = snapshot.version
+
+        logger.info(
+            f"Built IVF face index: {len(matrix)} rows, {len(self.centroids)} lists, "
+            f"{'trained' if retrain else 'reassigned'} in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+
+    def _train(self, matrix, rng) -> None:
+        n = len(matrix)
+        nlist = self.nlist or int(np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+
+        # Train on a bounded sample; 64 points per list is plenty for k-means
+        sample_size = min(n, max(nlist * 64, 1))
+        sample = matrix[rng.choice(n, sample_size, replace=False)] if sample_size < n else matrix
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            assignments = self._nearest(sample, centroids)
+            onehot = np.zeros((nlist, len(sample)), dtype=np.float32)
+            onehot[assignments, np.arange(len(sample))] = 1.0
+            counts = onehot.sum(axis=1)
+            sums = onehot @ sample
+            empty = counts == 0
+            centroids = sums / np.maximum(counts, 1.0)[:, None]
+            if empty.any():
+                # Re-seed empty lists from random sample points
+                centroids[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_sq = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+        # Principal axes of the centred sample for the candidate-ranking projection
+        dim = min(self.projection_dim, matrix.shape[1])
+        centred = sample - sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(centred, full_matrices=False)
+        self.projection = np.ascontiguousarray(vt[:dim].T, dtype=np.float32)
+        self.trained_size = n
+
+    @staticmethod
+    def _nearest(data, centroids):
+        centroid_sq = np.einsum('ij,ij->i', centroids, centroids)
+        return np.argmin(centroid_sq - 2.0 * (data @ centroids.T), axis=1)
+
+    def _assign(self, matrix):
+        assignments = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), _ASSIGN_BLOCK_ROWS):
+            block = matrix[start:start + _ASSIGN_BLOCK_ROWS]
+            assignments[start:start + len(block)] = np.argmin(
+                self.centroid_sq - 2.0 * (block @ self.centroids.T), axis=1
+            )
+        return assignments
+
+    def search(self, snapshot: GallerySnapshot, encoding, k: int = 1) -> Tuple[Any, Any]:
+        """
+        Find the (approximately) k nearest gallery rows.
+        The snapshot must be the one the index was built from.
+
+        Returns:
+            Tuple of (row indices into the snapshot, exact distances), nearest first
+        """
+        query = np.asarray(encoding, dtype=np.float32)
+        coarse = self.centroid_sq - 2.0 * (self.centroids @ query)
+        list_order = np.argsort(coarse)
+
+        # Probe the closest lists, taking more if they hold too few rows for k
+        wanted = max(k, self.rerank)
+        probes = min(self.nprobe, len(list_order))
+        starts = self.list_offsets[list_order]
+        ends = self.list_offsets[list_order + 1]
+        while probes < len(list_order) and int((ends[:probes] - starts[:probes]).sum()) < wanted:
+            probes += 1
+        positions = np.concatenate([
+            np.arange(s, e) for s, e in zip(starts[:probes], ends[:probes])
+        ])
+        if len(positions) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Lower-bound distances in the projected space
+        projected_query = query @ self.projection
+        lower = self.projected_sq[positions] - 2.0 * (self.projected[positions] @ projected_query)
+        lower = np.sqrt(np.maximum(lower + float(projected_query @ projected_query), 0.0))
+        ranked = np.argsort(lower)
+
+        # Recall guard: re-rank exactly until no remaining lower bound can beat the k-th result
+        size = min(len(ranked), max(self.rerank, k))
+        while True:
+            rows = self.list_rows[positions[ranked[:size]]]
+            exact = np.linalg.norm(snapshot.matrix[rows] - query, axis=1)
+            top = _distinct_owners(snapshot, rows, exact, k)
+            # Template rows can share an owner, so also expand until k distinct users are found
+            if size >= len(ranked) or (len(top) == k and lower[ranked[size]] >= exact[top[-1]]):
+                return rows[top], exact[top]
+            size = min(len(ranked), size * 2)
+
+
+class GalleryIndex:
+    """
+    Chooses and maintains the search index for the face gallery.
+
+    'brute' always searches exactly, 'ivf' always uses the IVF index and
+    'auto' switches to IVF once the gallery reaches ivf_min_size rows.
+    The IVF index is rebuilt whenever the gallery snapshot changes; centroids
+    are only retrained when the gallery has grown by retrain_growth since the
+    last training. While a rebuild is pending, searches fall back to exact
+    brute force so results are never stale.
+    """
+
+    def __init__(
+        self,
+        index_type: str = INDEX_AUTO,
+        ivf_min_size: int = 20000,
+        ivf_params: Optional[Dict[str, Any]] = None,
+        retrain_growth: float = 2.0,
+        background_rebuild: bool = True
+    ):
+        self.index_type = index_type
+        self.ivf_min_size = ivf_min_size
+        self.ivf_params = ivf_params or {}
+        self.retrain_growth = retrain_growth
+        self.background_rebuild = background_rebuild
+
+        self._brute = BruteForceIndex()
+        self._ivf: Optional[IVFIndex] = None
+        self._lock = threading.Lock()
+        self._building = False
+
+    def _wants_ivf(self, snapshot: GallerySnapshot) -> bool:
+        if self.index_type == INDEX_BRUTE:
+            return False
+        if self.index_type == INDEX_IVF:
+            return len(snapshot) > 0
+        return len(snapshot) >= self.ivf_min_size
+
+    def search(self, snapshot: GallerySnapshot, encoding, k: int = 1) -> Tuple[Any, Any]:
+        """Search the gallery snapshot with the best available index."""
+        if not len(snapshot):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        index = self._index_for(snapshot)
+        return index.search(snapshot, encoding, k)
+
+    def describe(self) -> Dict[str, Any]:
+        """Index status for health reporting."""
+        ivf = self._ivf
+        return {
+            "type": self.index_type,
+            "ivf_built": bool(ivf and ivf.version is not None),
+            "ivf_lists": int(len(ivf.centroids)) if ivf and ivf.is_trained else 0,
+        }
+
+    def _index_for(self, snapshot: GallerySnapshot):
+        if not self._wants_ivf(snapshot):
+            return self._brute
+
+        ivf = self._ivf
+        if ivf is not None and ivf.version == snapshot.version:
+            return ivf
+
+        if not self.background_rebuild:
+            with self._lock:
+                self._rebuild(snapshot)
+            return self._ivf
+
+        with self._lock:
+            if not self._building:
+                self._building = True
+                threading.Thread(
+                    target=self._rebuild_in_background, args=(snapshot,), daemon=True
+                ).start()
+        return self._brute
+
+    def _rebuild_in_background(self, snapshot: GallerySnapshot) -> None:
+        try:
+            self._rebuild(snapshot)
+        except Exception as e:
+            logger.error(f"Face index rebuild failed: {e}")
+        finally:
+            with self._lock:
+                self._building = False
+
+    def _rebuild(self, snapshot: GallerySnapshot) -> None:
+        current = self._ivf
+        if current is not None and current.version == snapshot.version:
+            return
+        retrain = (
+            current is None
+            or not current.is_trained
+            or len(snapshot) >= current.trained_size * self.retrain_growth
+            or len(snapshot) < len(current.centroids)
+        )
+        # Build into a fresh object so concurrent searches keep using a consistent index
+        index = IVFIndex(**self.ivf_params)
+        if not retrain:
+            index.centroids = current.centroids
+            index.centroid_sq = current.centroid_sq
+            index.projection = current.projection
+            index.trained_size = current.trained_size
+        index.build(snapshot, retrain=retrain)
+        self._ivf = index
@@ -3,19 +3,28 @@ Face recognition service for Smart Glass AI system.
 Handles face encoding extraction, storage, and matching.
 """
 
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Iterator, Union
+from dataclasses import dataclass
 from datetime import datetime
-import json
+import asyncio
 import io
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 import logging
 
 try:
     import face_recognition as fr
-    import numpy as np
 except ImportError:
     fr = None
+
+try:
+    import numpy as np
+except ImportError:
     np = None
 
 try:
@@ -24,13 +33,32 @@ except ImportError:
     Image = None
 
 from models.face_encoding import (
+    BatchRecognitionItem,
+    DetectedFace,
+    FaceBox,
+    FaceCandidate,
     FaceExtractionResult,
     FaceMatch,
-    FaceEncodingWithMetadata
+    FaceTopKResult,
+    FaceEncodingWithMetadata,
+    MultiFaceRecognitionResult
 )
 from utils.config import config
-from utils.image_processor import ImageProcessor, ImageProcessingError
+from utils.encoding_codec import encode_face_encoding, decode_face_encoding
+from utils.image_processor import DecodedImage, ImageProcessor, ImageProcessingError, QualityGate
 from services.storage_service import get_supabase_service
+from services.face_gallery import FaceGallery
+from services.face_index import GalleryIndex
+from services.face_engine import FaceEngine
+from services.face_cache import FaceResultCache
+from services.face_detectors import (
+    PROFILE_ENROLLMENT,
+    PROFILE_MULTI,
+    PROFILE_RECOGNITION,
+    create_detector,
+    profile_detector_spec,
+    profile_quality_gate_spec,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +68,17 @@ class FaceRecognitionError(Exception):
     pass
 
 
+@dataclass
+class FaceAnalysis:
+    """
+    Decode, detection and encoding of one image, kept so later enrollment
+    stages (cropping, template storage) reuse them instead of starting over.
+    """
+    result: FaceExtractionResult
+    image: Any = None                                    # RGB pixels at processing resolution
+    location: Optional[Tuple[int, int, int, int]] = None  # (top, right, bottom, left) of the single face
+
+
 class FaceRecognitionService:
     """Service for face recognition operations."""
     
@@ -47,6 +86,115 @@ class FaceRecognitionService:
         """Initialize the face recognition service."""
         self.tolerance = config.FACE_RECOGNITION_TOLERANCE
         self._lock = threading.Lock()  # For thread-safe operations
+        self.gallery = FaceGallery(
+            self._fetch_gallery_rows,
+            refresh_seconds=config.FACE_GALLERY_REFRESH_SECONDS,
+            delta_loader=self._fetch_gallery_changes,
+            full_resync_seconds=config.FACE_GALLERY_FULL_RESYNC_SECONDS
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._detectors: Dict[str, Any] = {}
+        self._quality_gates: Dict[str, QualityGate] = {}
+        self.engine: Optional[FaceEngine] = None
+        self._engine_restarting = False
+        self.result_cache = FaceResultCache(
+            max_entries=config.FACE_CACHE_SIZE,
+            ttl_seconds=config.FACE_CACHE_TTL_SECONDS
+        )
+        self.index = GalleryIndex(
+            index_type=config.FACE_INDEX_TYPE,
+            ivf_min_size=config.FACE_INDEX_IVF_MIN_SIZE,
+            ivf_params={
+                "nlist": config.FACE_INDEX_NLIST,
+                "nprobe": config.FACE_INDEX_NPROBE,
+                "projection_dim": config.FACE_INDEX_PROJECTION_DIM,
+                "rerank": config.FACE_INDEX_RERANK,
+            },
+            retrain_growth=config.FACE_INDEX_RETRAIN_GROWTH,
+            background_rebuild=config.FACE_INDEX_BACKGROUND_REBUILD
+        )
+
+    @staticmethod
+    def _fetch_gallery_rows() -> Iterator[List[Dict[str, Any]]]:
+        """
+        Loader used by the resident gallery: streams encoding pages from Supabase,
+        users first and then their per-angle templates.
+        """
+        supabase = get_supabase_service()
+        yield from supabase.iter_users_with_encodings()
+        if config.FACE_GALLERY_ANGLE_TEMPLATES:
+            for page in supabase.iter_face_templates():
+                yield _as_template_rows(page)
+
+    @staticmethod
+    def _fetch_gallery_changes(since: str) -> List[Dict[str, Any]]:
+        """
+        Delta loader used by the resident gallery: rows changed since the watermark,
+        plus the current per-angle templates of every changed user.
+        """
+        supabase = get_supabase_service()
+        rows = supabase.get_encoding_changes_since(since)
+        if config.FACE_GALLERY_ANGLE_TEMPLATES:
+            changed = [row['id'] for row in rows if row.get('face_encoding')]
+            rows = rows + _as_template_rows(supabase.get_face_templates(changed))
+        return rows
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Shared bounded pool for parallel image work (created on first use)."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=config.FACE_PARALLEL_WORKERS,
+                        thread_name_prefix="face-worker"
+                    )
+        return self._executor
+
+    def start_engine(self) -> None:
+        """
+        Start the process-pool extraction engine (FACE_PROCESS_WORKERS workers).
+        Without face_recognition or with 0 workers, extraction stays on threads.
+        """
+        if config.FACE_PROCESS_WORKERS <= 0 or fr is None:
+            logger.info("Face engine disabled; extraction runs on the thread pool")
+            return
+        if self.engine is None:
+            self.engine = FaceEngine(config.FACE_PROCESS_WORKERS)
+        try:
+            self.engine.start()
+        except Exception as e:
+            logger.error(f"Failed to start face engine, using threads instead: {e}")
+            self.engine.stop()
+
+    def stop_engine(self) -> None:
+        """Stop the extraction engine and the shared thread pool."""
+        if self.engine is not None:
+            self.engine.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _restart_engine_in_background(self) -> None:
+        """Restart a broken engine once, however many requests saw it break."""
+        engine = self.engine
+        if engine is None:
+            return
+        with self._lock:
+            if self._engine_restarting:
+                return
+            self._engine_restarting = True
+        threading.Thread(
+            target=self._restart_engine, args=(engine,), name="face-engine-restart", daemon=True
+        ).start()
+
+    def _restart_engine(self, engine: FaceEngine) -> None:
+        try:
+            engine.start()
+        except Exception:
+            logger.exception("Failed to restart face engine, using threads instead")
+            engine.stop()
+        finally:
+            self._engine_restarting = False
 
     @property
     def _are_dependencies_available(self) -> bool:
@@ -89,68 +237,215 @@ class FaceRecognitionService:
             
         return True, "Quality checks passed"
     
-    def extract_encoding(self, image_bytes: bytes) -> FaceExtractionResult:
+    def get_detector(self, profile: str = PROFILE_RECOGNITION):
         """
-        Extract face encoding from image bytes.
+        Face detector configured for an endpoint profile (created on first use).
+        
+        Raises:
+            FaceDetectorError: If the configured detector spec is invalid
+        """
+        detector = self._detectors.get(profile)
+        if detector is None:
+            detector = create_detector(profile_detector_spec(config, profile))
+            self._detectors[profile] = detector
+        return detector
+
+    def get_quality_gate(self, profile: str = PROFILE_RECOGNITION) -> QualityGate:
+        """
+        Pre-detection frame quality gate for an endpoint profile: FACE_QUALITY_GATE,
+        with the profile's FACE_QUALITY_GATE_<PROFILE> settings applied on top.
+        """
+        gate = self._quality_gates.get(profile)
+        if gate is None:
+            gate = QualityGate.from_spec(
+                profile_quality_gate_spec(config, profile),
+                base=QualityGate.from_spec(config.FACE_QUALITY_GATE)
+            )
+            self._quality_gates[profile] = gate
+        return gate
+
+    def extract_encoding(
+        self,
+        image_bytes: Union[bytes, DecodedImage],
+        profile: str = PROFILE_RECOGNITION
+    ) -> FaceExtractionResult:
+        """
+        Extract face encoding from image bytes or an already decoded image.
+        The profile selects the detector configured for the calling endpoint.
+        """
+        return self.analyze_image(image_bytes, profile).result
+
+    def analyze_image(
+        self,
+        image_bytes: Union[bytes, DecodedImage],
+        profile: str = PROFILE_RECOGNITION
+    ) -> FaceAnalysis:
+        """
+        Decode, detect and encode one image, keeping the decoded pixels and the
+        face location alongside the extraction result.
         """
         if fr is None:
-            return FaceExtractionResult(
+            return FaceAnalysis(FaceExtractionResult(
                 success=False, encoding=None, 
                 error="Missing dependencies: face_recognition", face_count=0
-            )
+            ))
+
+        cache_key = self._cache_key(image_bytes, profile)
+        cached = self._cached_analysis(cache_key)
+        if cached is not None:
+            return cached
 
         try:
-            image = ImageProcessor.preprocess_image(image_bytes)
-            return self._detect_and_encode(image, fr)
+            decoded = ImageProcessor.decode_image(image_bytes)
+            usable, reason = ImageProcessor.check_frame_quality(decoded, self.get_quality_gate(profile))
+            if not usable:
+                # Rejected before any dlib call
+                return FaceAnalysis(FaceExtractionResult(
+                    success=False, encoding=None, error=f"Quality check failed: {reason}", face_count=0
+                ), decoded.pixels)
+            analysis = self._analyze(decoded.pixels, fr, profile)
+            self._remember(cache_key, analysis)
+            return analysis
         except ImageProcessingError as e:
-            return FaceExtractionResult(
+            return FaceAnalysis(FaceExtractionResult(
                 success=False, encoding=None, error=str(e), face_count=0
-            )
+            ))
         except Exception as e:
             logger.error(f"Encoding extraction failed: {e}")
-            return FaceExtractionResult(
+            return FaceAnalysis(FaceExtractionResult(
                 success=False, encoding=None, error="Internal processing error", face_count=0
+            ))
+
+    def _cache_key(self, image_bytes: Union[bytes, DecodedImage], profile: str) -> Optional[str]:
+        """Result cache key for raw upload bytes; decoded images are not cached."""
+        if not self.result_cache.enabled or not isinstance(image_bytes, bytes):
+            return None
+        # Keyed on the detector and quality gate rather than the profile, so endpoints sharing
+        # both share entries while a stricter gate never gets a result that passed a looser one
+        variant = f"{profile_detector_spec(config, profile)}|{self.get_quality_gate(profile)}"
+        return self.result_cache.key(image_bytes, variant)
+
+    def _cached_analysis(self, cache_key: Optional[str]) -> Optional[FaceAnalysis]:
+        if cache_key is None:
+            return None
+        entry = self.result_cache.get(cache_key)
+        if entry is None:
+            return None
+        result, location = entry
+        return FaceAnalysis(result.model_copy(deep=True), location=location)
+
+    def _remember(self, cache_key: Optional[str], analysis: FaceAnalysis) -> None:
+        # Only results of a completed detection pass are deterministic enough to reuse
+        if cache_key is not None and analysis.result.detect_ms is not None:
+            self.result_cache.put(cache_key, analysis.result, analysis.location)
+
+    def locate_faces(self, image, profile: str = PROFILE_RECOGNITION) -> List[Tuple[int, int, int, int]]:
+        """
+        Detect faces in an RGB image with the profile's detector, without encoding them.
+
+        Args:
+            image: RGB numpy array at processing resolution
+            profile: Endpoint profile selecting the detector
+
+        Returns:
+            Face locations as (top, right, bottom, left) in image coordinates
+        """
+        return self._locate_faces(image, profile=profile)
+
+    def _locate_faces(
+        self,
+        image,
+        fr_module=None,
+        profile: str = PROFILE_RECOGNITION
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Detect faces, on a low-resolution copy when FACE_DETECTION_MAX_DIMENSION is set.
+        HOG cost grows with pixel count, so detection runs on the small copy and the
+        boxes are scaled back to the input image, where quality checks and encoding
+        keep working at full resolution.
+        
+        Args:
+            image: RGB numpy array at processing resolution
+            fr_module: face_recognition module (defaults to the imported one)
+            profile: Endpoint profile selecting the detector
+            
+        Returns:
+            Face locations as (top, right, bottom, left) in input image coordinates
+        """
+        fr_module = fr_module or fr
+        detector = self.get_detector(profile)
+        detection_size = config.FACE_DETECTION_MAX_DIMENSION
+        height, width = image.shape[:2]
+        if not detection_size or max(height, width) <= detection_size:
+            return detector.detect(image, fr_module)
+
+        small = ImageProcessor.resize_image(image, detection_size)
+        scale_y = height / small.shape[0]
+        scale_x = width / small.shape[1]
+        return [
+            (
+                max(0, int(round(top * scale_y))),
+                min(width, int(round(right * scale_x))),
+                min(height, int(round(bottom * scale_y))),
+                max(0, int(round(left * scale_x))),
             )
+            for top, right, bottom, left in detector.detect(small, fr_module)
+        ]
+
+    def _detect_and_encode(self, image, fr_module, profile: str = PROFILE_RECOGNITION) -> FaceExtractionResult:
+        return self._analyze(image, fr_module, profile).result
 
-    def _detect_and_encode(self, image, fr_module) -> FaceExtractionResult:
-        face_locations = fr_module.face_locations(image)
+    def _analyze(self, image, fr_module, profile: str = PROFILE_RECOGNITION) -> FaceAnalysis:
+        started = time.perf_counter()
+        face_locations = self._locate_faces(image, fr_module, profile)
         face_count = len(face_locations)
+        detect_ms = (time.perf_counter() - started) * 1000
         
         if face_count == 0:
-            return FaceExtractionResult(
-                success=False, encoding=None, error="No face detected in image", face_count=0
-            )
+            return FaceAnalysis(FaceExtractionResult(
+                success=False, encoding=None, error="No face detected in image", face_count=0,
+                detect_ms=detect_ms
+            ), image)
         if face_count > 1:
-            return FaceExtractionResult(
+            return FaceAnalysis(FaceExtractionResult(
                 success=False, encoding=None, 
-                error=f"Multiple faces detected ({face_count})", face_count=face_count
-            )
+                error=f"Multiple faces detected ({face_count})", face_count=face_count,
+                detect_ms=detect_ms
+            ), image)
+
+        location = face_locations[0]
             
         # Quality Check
-        is_valid, quality_reason = self.validate_face_quality(image, face_locations[0])
+        started = time.perf_counter()
+        is_valid, quality_reason = self.validate_face_quality(image, location)
         if not is_valid:
-            return FaceExtractionResult(
+            return FaceAnalysis(FaceExtractionResult(
                 success=False, encoding=None, 
-                error=f"Quality check failed: {quality_reason}", face_count=face_count
-            )
+                error=f"Quality check failed: {quality_reason}", face_count=face_count,
+                detect_ms=detect_ms
+            ), image, location)
 
-        face_encodings = fr_module.face_encodings(image, face_locations)
+        face_encodings = fr_module.face_encodings(image, face_locations, model=config.FACE_LANDMARK_MODEL)
+        encode_ms = (time.perf_counter() - started) * 1000
         if not face_encodings:
-            return FaceExtractionResult(
-                success=False, encoding=None, error="Failed to extract face encoding", face_count=face_count
-            )
-             
-        return FaceExtractionResult(
+            return FaceAnalysis(FaceExtractionResult(
+                success=False, encoding=None, error="Failed to extract face encoding", face_count=face_count,
+                detect_ms=detect_ms, encode_ms=encode_ms
+            ), image, location)
+
+        logger.debug(f"Face extraction: detect {detect_ms:.1f}ms, encode {encode_ms:.1f}ms")
+        return FaceAnalysis(FaceExtractionResult(
             success=True, encoding=face_encodings[0].tolist(), 
-            error=None, face_count=1
-        )
+            error=None, face_count=1, detect_ms=detect_ms, encode_ms=encode_ms
+        ), image, location)
 
     def save_encoding(
         self,
         user_id: str,
         encoding: List[float],
         user_data: Dict[str, Any],
-        supabase_service: Optional[Any] = None
+        supabase_service: Optional[Any] = None,
+        angle_encodings: Optional[Dict[str, List[float]]] = None
     ) -> bool:
         """
         Save face encoding to Supabase database.
@@ -160,6 +455,8 @@ class FaceRecognitionService:
             encoding: Face encoding vector
             user_data: Dictionary containing name and email
             supabase_service: Optional SupabaseService instance to reuse
+            angle_encodings: Optional per-angle encodings (already stored in face_images)
+                to keep as extra gallery templates
             
         Returns:
             True if save successful
@@ -170,20 +467,30 @@ class FaceRecognitionService:
         try:
             supabase = supabase_service or get_supabase_service()
             
-            # Serialize encoding to JSON string
-            encoding_json = json.dumps(encoding)
+            # Serialize encoding in the configured storage format (binary v2 by default)
+            encoding_value = encode_face_encoding(encoding, config.FACE_ENCODING_STORAGE_FORMAT)
             
             # Update user record in Supabase
             supabase.update_user(user_id, {
-                'face_encoding': encoding_json,
+                'face_encoding': encoding_value,
                 'face_updated_at': datetime.utcnow().isoformat()
             })
+
+            # Keep the resident gallery in sync without a reload
+            self.gallery.upsert(user_id, self._gallery_templates(encoding, angle_encodings))
             
             return True
                 
         except Exception as e:
             raise FaceRecognitionError(f"Failed to save encoding: {str(e)}")
     
+    @staticmethod
+    def _gallery_templates(encoding: List[float], angle_encodings: Optional[Dict[str, List[float]]]) -> List[List[float]]:
+        """Gallery rows for a user: the averaged encoding first, then the per-angle templates."""
+        if not angle_encodings or not config.FACE_GALLERY_ANGLE_TEMPLATES:
+            return [encoding]
+        return [encoding, *angle_encodings.values()]
+
     def load_encodings(self) -> List[FaceEncodingWithMetadata]:
         """
         Load all face encodings from Supabase database.
@@ -204,21 +511,21 @@ class FaceRecognitionService:
             encodings = []
             for user in users:
                 try:
-                    # Parse JSON encoding
+                    # Parse stored encoding (binary v2 or legacy JSON)
                     if not user.get('face_encoding'):
                         continue
                         
-                    encoding_vector = json.loads(user['face_encoding'])
+                    encoding_vector = decode_face_encoding(user['face_encoding'])
                     
                     # Create metadata object
                     encodings.append(FaceEncodingWithMetadata(
                         user_id=user['id'],
-                        encoding=encoding_vector,
+                        encoding=[float(x) for x in encoding_vector],
                         name=user.get('name', 'Unknown'),
                         email=user.get('email', ''),
                         timestamp=datetime.fromisoformat(user['face_updated_at'].replace('Z', '+00:00')) if user.get('face_updated_at') else datetime.utcnow()
                     ))
-                except (json.JSONDecodeError, ValueError) as e:
+                except ValueError as e:
                     logger.warning(f"Skipping invalid encoding for user {user.get('id')}: {e}")
                     continue
             
@@ -227,47 +534,86 @@ class FaceRecognitionService:
         except Exception as e:
             raise FaceRecognitionError(f"Failed to load encodings: {str(e)}")
     
+    def _search_gallery(self, encoding: List[float], k: int):
+        """Search the resident gallery; returns (snapshot, rows, distances) nearest first."""
+        try:
+            gallery = self.gallery.snapshot()
+        except Exception as e:
+            raise FaceRecognitionError(f"Failed to load encodings: {str(e)}")
+
+        try:
+            rows, distances = self.index.search(gallery, encoding, k=k)
+            return gallery, rows, distances
+        except Exception as e:
+            logger.error(f"Face matching calculation failed: {e}")
+            raise FaceRecognitionError(f"Face matching failed: {str(e)}")
+
     def find_match(self, encoding: List[float]) -> FaceMatch:
         """
-        Find matching face in stored encodings.
+        Find matching face in the resident encoding gallery.
         """
-        if fr is None or np is None:
+        if np is None:
             return FaceMatch(matched=False, user_id=None, confidence=None, distance=None)
 
-        stored_encodings = self.load_encodings()
-        if not stored_encodings:
+        # Nearest neighbour via the gallery index (exact below the IVF threshold)
+        gallery, rows, distances = self._search_gallery(encoding, k=1)
+        if not len(rows):
             return FaceMatch(matched=False, user_id=None, confidence=None, distance=None)
 
-        # Prepare data
-        try:
-            encoding_array = np.array(encoding)
-            known_encodings = [np.array(enc.encoding) for enc in stored_encodings]
+        best_distance = float(distances[0])
 
-            # Calculate distances (vectorized operation is faster)
-            face_distances = fr.face_distance(known_encodings, encoding_array)
+        # Determine if it's a match
+        is_match = best_distance <= self.tolerance
+        confidence = max(0.0, min(1.0, 1.0 - best_distance))
+
+        return FaceMatch(
+            matched=bool(is_match),
+            user_id=gallery.ids[int(rows[0])],
+            confidence=float(confidence),
+            distance=best_distance
+        )
+
+    def find_top_k(self, encoding: List[float], k: int = 5) -> FaceTopKResult:
+        """
+        Find the k nearest identities in the resident gallery.
+        Uses a partial sort (argpartition) rather than ordering the whole gallery.
+        
+        Args:
+            encoding: Query face encoding
+            k: Number of candidates to return
             
-            # Find best match
-            best_match_index = np.argmin(face_distances)
-            best_distance = face_distances[best_match_index]
+        Returns:
+            FaceTopKResult with candidates (best first) and the first/second distance margin
+        """
+        if np is None:
+            return FaceTopKResult(matched=False)
 
-            # Determine if it's a match
-            is_match = best_distance <= self.tolerance
-            confidence = max(0.0, min(1.0, 1.0 - best_distance))
+        # Always look at least two deep so the decision margin is available
+        gallery, rows, distances = self._search_gallery(encoding, k=max(k, 2))
+        if not len(rows):
+            return FaceTopKResult(matched=False)
 
-            return FaceMatch(
-                matched=bool(is_match),
-                user_id=stored_encodings[best_match_index].user_id,
-                confidence=float(confidence),
-                distance=float(best_distance)
+        candidates = [
+            FaceCandidate(
+                user_id=gallery.ids[int(row)],
+                distance=float(distance),
+                confidence=float(max(0.0, min(1.0, 1.0 - distance)))
             )
-        except Exception as e:
-            logger.error(f"Face matching calculation failed: {e}")
-            raise FaceRecognitionError(f"Face matching failed: {str(e)}")
+            for row, distance in zip(rows, distances)
+        ]
+        margin = float(distances[1] - distances[0]) if len(distances) > 1 else None
+
+        return FaceTopKResult(
+            matched=bool(distances[0] <= self.tolerance),
+            candidates=candidates[:k],
+            margin=margin
+        )
 
-    def identify_user(self, image_bytes: bytes) -> FaceMatch:
+    def identify_user(self, image_bytes: Union[bytes, DecodedImage]) -> FaceMatch:
         """
         High-level method to process an image and identify the user.
-        Combines extraction and matching.
+        Combines extraction and matching. Accepts raw bytes or a DecodedImage
+        so callers that already decoded the upload do not decode it again.
         """
         extraction_result = self.extract_encoding(image_bytes)
         
@@ -278,19 +624,290 @@ class FaceRecognitionService:
 
         return self.find_match(extraction_result.encoding)
 
-    async def enroll_user(self, user_id: str, images: Dict[str, bytes], supabase) -> None:
+    def _decode_and_analyze(self, image_bytes: bytes, profile: str) -> FaceAnalysis:
+        return self.analyze_image(ImageProcessor.decode_image(image_bytes), profile)
+
+    async def analyze_image_async(
+        self,
+        image_bytes: bytes,
+        profile: str = PROFILE_RECOGNITION
+    ) -> FaceAnalysis:
+        """
+        Analyze an image without blocking the event loop.
+        Repeated bytes are answered from the result cache; otherwise the work runs in
+        the process-pool engine when it is running, or on a worker thread.
+        The returned analysis carries the face location but not the decoded pixels.
+        
+        Raises:
+            ImageProcessingError: If the image cannot be decoded (unlike analyze_image,
+                so callers can reject the upload)
+        """
+        cache_key = self._cache_key(image_bytes, profile)
+        cached = self._cached_analysis(cache_key)
+        if cached is not None:
+            return cached
+
+        analysis = None
+        engine = self.engine
+        if engine is not None and engine.is_running:
+            try:
+                result, location = await engine.analyze(image_bytes, profile)
+                analysis = FaceAnalysis(result, location=location)
+            except BrokenProcessPool:
+                self._restart_engine_in_background()
+        if analysis is None:
+            analysis = await run_in_threadpool(self._decode_and_analyze, image_bytes, profile)
+            analysis.image = None
+
+        self._remember(cache_key, analysis)
+        return analysis
+
+    async def extract_encoding_async(
+        self,
+        image_bytes: bytes,
+        profile: str = PROFILE_RECOGNITION
+    ) -> FaceExtractionResult:
+        """
+        Extract a face encoding without blocking the event loop (see analyze_image_async).
+        
+        Raises:
+            ImageProcessingError: If the image cannot be decoded (unlike extract_encoding,
+                so callers can reject the upload)
+        """
+        return (await self.analyze_image_async(image_bytes, profile)).result
+
+    async def identify_user_async(self, image_bytes: bytes, profile: str = PROFILE_RECOGNITION) -> FaceMatch:
+        """
+        Async identify_user: extraction in the engine, matching against the resident gallery.
+        
+        Raises:
+            ImageProcessingError: If the image cannot be decoded
+            FaceRecognitionError: If no usable face is found
+        """
+        extraction_result = await self.extract_encoding_async(image_bytes, profile)
+
+        if not extraction_result.success or extraction_result.encoding is None:
+            if extraction_result.error:
+                raise FaceRecognitionError(extraction_result.error)
+            return FaceMatch(matched=False, user_id=None, confidence=0.0, distance=None)
+
+        # The gallery snapshot may sync from the database, so keep it off the event loop
+        return await run_in_threadpool(self.find_match, extraction_result.encoding)
+
+    async def identify_candidates_async(self, image_bytes: bytes, k: int) -> FaceTopKResult:
+        """
+        Async identify_candidates: the k nearest identities with the decision margin.
+        
+        Raises:
+            ImageProcessingError: If the image cannot be decoded
+            FaceRecognitionError: If no usable face is found
+        """
+        extraction_result = await self.extract_encoding_async(image_bytes)
+
+        if not extraction_result.success or extraction_result.encoding is None:
+            if extraction_result.error:
+                raise FaceRecognitionError(extraction_result.error)
+            return FaceTopKResult(matched=False)
+
+        return await run_in_threadpool(self.find_top_k, extraction_result.encoding, k)
+
+    async def identify_users_async(self, images: List[bytes]) -> List[BatchRecognitionItem]:
+        """
+        Async identify_users: images are extracted concurrently in the engine and
+        all successful encodings are matched together.
+        """
+        async def extract(image_bytes: bytes) -> FaceExtractionResult:
+            try:
+                return await self.extract_encoding_async(image_bytes)
+            except ImageProcessingError as e:
+                return FaceExtractionResult(success=False, encoding=None, error=str(e), face_count=0)
+
+        extractions = await asyncio.gather(*(extract(image_bytes) for image_bytes in images))
+        return await run_in_threadpool(self._match_extractions, list(extractions))
+
+    def extract_encodings(self, images: List[bytes]) -> List[FaceExtractionResult]:
+        """
+        Extract encodings for several images, decoding and encoding them in parallel.
+        Results are returned in input order.
+        """
+        if len(images) <= 1:
+            return [self.extract_encoding(image_bytes) for image_bytes in images]
+        return list(self._get_executor().map(self.extract_encoding, images))
+
+    def find_matches(self, encodings: List[List[float]]) -> List[FaceMatch]:
+        """
+        Match several encodings against the gallery with a single matrix product.
+        Always exact: one (Q x 128) . (128 x N) product is cheaper than Q index lookups
+        for the batch sizes the API accepts.
+        """
+        no_match = FaceMatch(matched=False, user_id=None, confidence=None, distance=None)
+        if np is None or not encodings:
+            return [no_match for _ in encodings]
+
+        try:
+            gallery = self.gallery.snapshot()
+        except Exception as e:
+            raise FaceRecognitionError(f"Failed to load encodings: {str(e)}")
+
+        if not len(gallery):
+            return [no_match for _ in encodings]
+
+        try:
+            # Segment-min over each user's templates, then the nearest user per query
+            distances = gallery.user_distances(gallery.distances_batch(encodings))
+            best_users = np.argmin(distances, axis=1)
+            best_distances = distances[np.arange(len(best_users)), best_users]
+            user_ids = gallery.user_ids if gallery.user_ids is not None else gallery.ids
+        except Exception as e:
+            logger.error(f"Batch face matching failed: {e}")
+            raise FaceRecognitionError(f"Face matching failed: {str(e)}")
+
+        return [
+            FaceMatch(
+                matched=bool(distance <= self.tolerance),
+                user_id=user_ids[int(user)],
+                confidence=float(max(0.0, min(1.0, 1.0 - distance))),
+                distance=float(distance)
+            )
+            for user, distance in zip(best_users, best_distances)
+        ]
+
+    def identify_users(self, images: List[bytes]) -> List[BatchRecognitionItem]:
+        """
+        Identify the person in each of several images.
+        Extraction runs in parallel; all successful encodings are matched together.
+        """
+        return self._match_extractions(self.extract_encodings(images))
+
+    def _match_extractions(self, extractions: List[FaceExtractionResult]) -> List[BatchRecognitionItem]:
+        """Match every successful extraction in one batch; failures keep their error."""
+        encoded = [
+            (i, result.encoding) for i, result in enumerate(extractions)
+            if result.success and result.encoding is not None
+        ]
+        matches = self.find_matches([encoding for _, encoding in encoded])
+
+        items = [
+            BatchRecognitionItem(index=i, error=result.error or "No face detected in image")
+            for i, result in enumerate(extractions)
+        ]
+        for (i, _), match in zip(encoded, matches):
+            items[i] = BatchRecognitionItem(index=i, match=match)
+        return items
+
+    def identify_faces(self, image_bytes: Union[bytes, DecodedImage]) -> MultiFaceRecognitionResult:
+        """
+        Identify every face in an image (multi-face mode for crowded frames).
+        All faces passing the quality check are encoded in one face_encodings call
+        and matched against the gallery in one vectorized pass.
+        
+        Raises:
+            FaceRecognitionError: If the image cannot be processed
+        """
+        if fr is None:
+            raise FaceRecognitionError("Missing dependencies: face_recognition")
+
+        try:
+            decoded = ImageProcessor.decode_image(image_bytes)
+        except ImageProcessingError as e:
+            raise FaceRecognitionError(str(e))
+
+        usable_frame, reason = ImageProcessor.check_frame_quality(decoded, self.get_quality_gate(PROFILE_MULTI))
+        if not usable_frame:
+            raise FaceRecognitionError(f"Quality check failed: {reason}")
+
+        image = decoded.pixels
+        height, width = image.shape[:2]
+        faces = self.identify_located_faces(image, self._locate_faces(image, profile=PROFILE_MULTI))
+
+        return MultiFaceRecognitionResult(
+            face_count=len(faces), faces=faces, image_width=width, image_height=height
+        )
+
+    def identify_located_faces(self, image, face_locations) -> List[DetectedFace]:
+        """
+        Quality-check, encode and match faces that were already located in a decoded image.
+        Usable faces are encoded in one face_encodings call and matched in one pass.
+        
+        Raises:
+            FaceRecognitionError: If face_recognition is not available
+        """
+        if fr is None:
+            raise FaceRecognitionError("Missing dependencies: face_recognition")
+
+        faces = [
+            DetectedFace(box=FaceBox(top=top, right=right, bottom=bottom, left=left))
+            for top, right, bottom, left in face_locations
+        ]
+
+        usable = []
+        for face, location in zip(faces, face_locations):
+            is_valid, quality_reason = self.validate_face_quality(image, location)
+            if is_valid:
+                usable.append((face, location))
+            else:
+                face.error = f"Quality check failed: {quality_reason}"
+
+        if usable:
+            encodings = fr.face_encodings(
+                image, [location for _, location in usable], model=config.FACE_LANDMARK_MODEL
+            )
+            matches = self.find_matches([encoding.tolist() for encoding in encodings])
+            for (face, _), match in zip(usable, matches):
+                face.match = match
+
+        return faces
+
+    def identify_candidates(self, image_bytes: Union[bytes, DecodedImage], k: int) -> FaceTopKResult:
+        """
+        Process an image and return the k nearest identities with the decision margin.
+        """
+        extraction_result = self.extract_encoding(image_bytes)
+
+        if not extraction_result.success or extraction_result.encoding is None:
+            if extraction_result.error:
+                raise FaceRecognitionError(extraction_result.error)
+            return FaceTopKResult(matched=False)
+
+        return self.find_top_k(extraction_result.encoding, k)
+
+    async def enroll_user(
+        self,
+        user_id: str,
+        images: Dict[str, bytes],
+        supabase,
+        analyses: Optional[Dict[str, FaceAnalysis]] = None
+    ) -> None:
         """
         Full enrollment process: process images, save encoding, and upload images.
+        Pass analyses from analyze_face_images to skip decoding and detecting again.
+        The work runs on a worker thread so the event loop is not blocked.
         """
-        # 1. Process images to get average encoding
-        avg_encoding = self.process_face_images(images)
+        await run_in_threadpool(self._enroll, user_id, images, supabase, analyses)
 
-        # 2. Save encoding to DB
-        # This updates the users table with the new encoding
-        self.save_encoding(user_id, avg_encoding, {}, supabase_service=supabase)
+    def _enroll(
+        self,
+        user_id: str,
+        images: Dict[str, bytes],
+        supabase,
+        analyses: Optional[Dict[str, FaceAnalysis]]
+    ) -> None:
+        # 1. Process images to get per-angle and average encodings
+        if analyses is None:
+            analyses = self.analyze_face_images(images)
+        angle_encodings = self.encodings_from_analyses(analyses)
+        avg_encoding = self.average_encodings(angle_encodings)
 
-        # 3. Upload images to storage
-        self.upload_face_images(supabase, user_id, images)
+        # 2. Upload images to storage along with their per-angle templates,
+        # cropping from the already decoded images
+        self.upload_face_images(supabase, user_id, images, analyses)
+
+        # 3. Save encoding to DB
+        # Done last so face_updated_at only moves once the templates are in place,
+        # which is what other workers' delta sync keys on
+        self.save_encoding(
+            user_id, avg_encoding, {}, supabase_service=supabase, angle_encodings=angle_encodings
+        )
 
 
     def compare_faces(self, encoding1: List[float], encoding2: List[float]) -> float:
@@ -332,51 +949,102 @@ class FaceRecognitionService:
         except Exception:
             return 0
     
-    def _process_single_image(self, image_data: bytes) -> Tuple[Optional[List[float]], Optional[str]]:
+    def analyze_face_images(self, images: Dict[str, bytes]) -> Dict[str, FaceAnalysis]:
         """
-        Helper to process a single image.
-        Returns: (encoding, error_message)
+        Decode, detect and encode every enrollment angle once.
+        Angles are analyzed in parallel on the shared bounded pool, so a multi-angle
+        enrollment takes about as long as its slowest image on a multi-core host.
+        
+        Raises:
+            FaceRecognitionError: If no images are provided
         """
-        result = self.extract_encoding(image_data)
-        if result.success and result.encoding is not None:
-            return result.encoding, None
-        return None, result.error
+        if not images:
+            raise FaceRecognitionError("No images provided")
+        if len(images) == 1:
+            return {angle: self.analyze_image(data, PROFILE_ENROLLMENT) for angle, data in images.items()}
+        analyses = self._get_executor().map(
+            self.analyze_image, images.values(), repeat(PROFILE_ENROLLMENT)
+        )
+        return dict(zip(images.keys(), analyses))
 
-    def process_face_images(self, images: Dict[str, bytes]) -> List[float]:
+    async def analyze_face_images_async(self, images: Dict[str, bytes]) -> Dict[str, FaceAnalysis]:
         """
-        Process multiple face images, extract encodings, and calculate average.
+        analyze_face_images without blocking the event loop. With the face engine
+        running, every angle is analyzed in its own worker process; the decoded
+        pixels stay in the worker, so the analyses carry only the face location.
+        
+        Raises:
+            FaceRecognitionError: If no images are provided
         """
         if not images:
             raise FaceRecognitionError("No images provided")
 
-        encodings = []
+        engine = self.engine
+        if engine is None or not engine.is_running:
+            return await run_in_threadpool(self.analyze_face_images, images)
+
+        async def analyze(image_data: bytes) -> FaceAnalysis:
+            try:
+                return await self.analyze_image_async(image_data, PROFILE_ENROLLMENT)
+            except ImageProcessingError as e:
+                return FaceAnalysis(FaceExtractionResult(
+                    success=False, encoding=None, error=str(e), face_count=0
+                ))
+
+        analyses = await asyncio.gather(*(analyze(data) for data in images.values()))
+        return dict(zip(images.keys(), analyses))
+
+    @staticmethod
+    def encodings_from_analyses(analyses: Dict[str, FaceAnalysis]) -> Dict[str, List[float]]:
+        """
+        One encoding per captured angle; angles without a usable face are left out.
+        
+        Raises:
+            FaceRecognitionError: If no image yielded an encoding
+        """
+        encodings: Dict[str, List[float]] = {}
         errors = []
+        for angle, analysis in analyses.items():
+            result = analysis.result
+            if result.success and result.encoding is not None:
+                encodings[angle] = result.encoding
+            elif result.error:
+                errors.append(f"{angle}: {result.error}")
+
+        if not encodings:
+            error_msg = "; ".join(errors) if errors else "No face detected in any of the images"
+            raise FaceRecognitionError(f"Face processing failed: {error_msg}")
+        return encodings
+
+    def extract_angle_encodings(self, images: Dict[str, bytes]) -> Dict[str, List[float]]:
+        """
+        Extract one encoding per captured angle.
+        Angles without a usable face are left out.
         
+        Raises:
+            FaceRecognitionError: If no image yields an encoding
+        """
         try:
-            for angle, image_data in images.items():
-                encoding, error = self._process_single_image(image_data)
-                if encoding:
-                    encodings.append(encoding)
-                elif error:
-                    errors.append(f"{angle}: {error}")
-            
-            if not encodings:
-                error_msg = "; ".join(errors) if errors else "No face detected in any of the images"
-                raise FaceRecognitionError(f"Face processing failed: {error_msg}")
-            
-            # Average the encodings
-            if np is None:
-                raise FaceRecognitionError("Numpy not available for encoding averaging")
-
-            avg_encoding = np.mean(encodings, axis=0)
-            return avg_encoding.tolist()
-            
+            return self.encodings_from_analyses(self.analyze_face_images(images))
         except FaceRecognitionError:
             raise
         except Exception as e:
-            logger.error(f"Unexpected error in process_face_images: {e}", exc_info=True)
+            logger.error(f"Unexpected error in extract_angle_encodings: {e}", exc_info=True)
             raise FaceRecognitionError(f"Failed to process face images: {str(e)}")
 
+    @staticmethod
+    def average_encodings(angle_encodings: Dict[str, List[float]]) -> List[float]:
+        """Average per-angle encodings into the primary encoding stored on the user."""
+        if np is None:
+            raise FaceRecognitionError("Numpy not available for encoding averaging")
+        return np.mean(list(angle_encodings.values()), axis=0).tolist()
+
+    def process_face_images(self, images: Dict[str, bytes]) -> List[float]:
+        """
+        Process multiple face images, extract encodings, and calculate average.
+        """
+        return self.average_encodings(self.extract_angle_encodings(images))
+
     def delete_encoding(self, user_id: str) -> bool:
         """
         Delete encoding for a specific user from Supabase.
@@ -394,6 +1062,10 @@ class FaceRecognitionService:
             supabase.update_user(user_id, {
                 'face_encoding': None
             })
+            # Per-angle templates are biometric data too
+            supabase.clear_face_templates(user_id)
+
+            self.gallery.remove(user_id)
             
             return True
                 
@@ -417,6 +1089,13 @@ class FaceRecognitionService:
         try:
             if not self._are_dependencies_available:
                 return None
+
+            # A recent analysis of the same bytes (e.g. the identity check before a
+            # profile picture upload) already knows where the face is
+            cached = self._cached_analysis(self._cache_key(image_bytes, PROFILE_ENROLLMENT))
+            if cached is not None and cached.result.face_count != 1:
+                return None
+
             try:
                 image = ImageProcessor.preprocess_image(image_bytes)
             except ImageProcessingError as e:
@@ -424,14 +1103,45 @@ class FaceRecognitionService:
                 # Fallback to direct load if preprocessing fails (though unlikely)
                 image = fr.load_image_file(io.BytesIO(image_bytes))
 
-            face_locations = fr.face_locations(image)
+            if cached is not None and cached.location is not None:
+                face_locations = [cached.location]
+            else:
+                face_locations = self._locate_faces(image, profile=PROFILE_ENROLLMENT)
             
             # strictly 1 face for the profile image
             if len(face_locations) != 1:
                 return None
             
+            return self.crop_face_region(image, face_locations[0], padding_top, padding_bottom, padding_side)
+            
+        except Exception as e:
+            logger.error(f"Error cropping face: {e}")
+            return None
+
+    def crop_face_region(
+        self,
+        image,
+        face_location: Tuple[int, int, int, int],
+        padding_top: float = 0.8,
+        padding_bottom: float = 0.4,
+        padding_side: float = 0.5
+    ) -> Optional[bytes]:
+        """
+        Crop an already detected face from a decoded image (see crop_face for the padding).
+        
+        Args:
+            image: RGB numpy array
+            face_location: (top, right, bottom, left) of the face in image
+            
+        Returns:
+            Optional[bytes]: Cropped JPEG bytes or None
+        """
+        try:
+            if Image is None:
+                return None
+
             # face_locations gives (top, right, bottom, left)
-            top, right, bottom, left = face_locations[0]
+            top, right, bottom, left = face_location
             
             height = bottom - top
             width = right - left
@@ -440,7 +1150,7 @@ class FaceRecognitionService:
             pad_bottom_px = int(height * padding_bottom)
             pad_side_px = int(width * padding_side)
             
-            img_h, img_w, _ = image.shape
+            img_h, img_w = image.shape[:2]
             
             # Expand box within image boundaries
             new_top = max(0, top - pad_top_px)
@@ -459,8 +1169,13 @@ class FaceRecognitionService:
             logger.error(f"Error cropping face: {e}")
             return None
 
-
-    def upload_face_images(self, supabase, user_id: str, images: Dict[str, bytes]) -> None:
+    def upload_face_images(
+        self,
+        supabase,
+        user_id: str,
+        images: Dict[str, bytes],
+        analyses: Optional[Dict[str, FaceAnalysis]] = None
+    ) -> None:
         """
         Upload face images to Supabase storage and update database records.
         Automatically crops faces before uploading to ensure only face data is stored.
@@ -469,11 +1184,25 @@ class FaceRecognitionService:
             supabase: Supabase service/client
             user_id: User identifier
             images: Dictionary of angle -> image bytes
+            analyses: Optional angle -> FaceAnalysis from analyze_face_images. Faces are then
+                cropped from the decoded image without detecting again, and each angle's
+                encoding is stored with its image as a matching template.
         """
         for angle, image_data in images.items():
             try:
                 # Attempt to crop the face to store only the face region
-                cropped_data = self.crop_face(image_data)
+                analysis = (analyses or {}).get(angle)
+                if analysis is None:
+                    cropped_data = self.crop_face(image_data)
+                elif analysis.location is not None:
+                    # Analyses from the face engine carry no pixels; decode here to crop
+                    image = analysis.image
+                    if image is None:
+                        image = ImageProcessor.preprocess_image(image_data)
+                    cropped_data = self.crop_face_region(image, analysis.location)
+                else:
+                    # Analysis already found no single face; nothing to crop
+                    cropped_data = None
                 
                 # cropped data if successful, otherwise fallback to original
                 data_to_upload = cropped_data if cropped_data else image_data
@@ -490,7 +1219,10 @@ class FaceRecognitionService:
                 )
                 
                 # Upsert image record
-                supabase.update_face_image_metadata(user_id, angle, file_path)
+                template = None
+                if analysis is not None and analysis.result.success and config.FACE_GALLERY_ANGLE_TEMPLATES:
+                    template = encode_face_encoding(analysis.result.encoding, config.FACE_ENCODING_STORAGE_FORMAT)
+                supabase.update_face_image_metadata(user_id, angle, file_path, face_encoding=template)
 
             except Exception as e:
                 logger.warning(f"Failed to upload {angle} image: {str(e)}")
@@ -523,6 +1255,14 @@ class FaceRecognitionService:
                 
         return face_images
 
+def _as_template_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Shape face_images rows as gallery template rows owned by their user."""
+    return [
+        {'id': row['user_id'], 'face_encoding': row['face_encoding'], 'template': True}
+        for row in rows
+    ]
+
+
 # Singleton instance
 _face_service_instance: Optional[FaceRecognitionService] = None
 
@@ -0,0 +1,335 @@
+"""
+Face tracking across consecutive smart glass frames.
+
+While a device is scanning, running detection, encoding and matching on
+every frame repeats the same work for the same people. The tracker detects
+faces only every redetect_interval frames (a third of that while nobody is
+in view, and immediately when a track is lost) and follows the boxes in
+between with normalized cross-correlation template matching on a small
+grayscale copy, which costs about a millisecond. On detection frames,
+detections are associated with existing tracks by IoU, so a face keeps its
+track and its identity.
+
+An identity is recognized once per track: only new tracks (and tracks whose
+face was not yet usable, e.g. too blurry) are encoded and matched.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+
+try:
+    import numpy as np
+    import cv2
+except ImportError:
+    np = None
+    cv2 = None
+
+from models.face_encoding import FaceMatch
+from services.face_detectors import PROFILE_MULTI
+from utils.config import config
+from utils.image_processor import DecodedImage, ImageProcessor, ImageProcessingError
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]  # (top, right, bottom, left) in processing-image pixels
+
+# Longest side of the grayscale copy that templates are matched on
+TRACKING_DIMENSION = 320
+# Search window around the previous box, relative to the box size
+SEARCH_MARGIN = 0.5
+
+
+def box_iou(a: Box, b: Box) -> float:
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    intersection = max(0, right - left) * max(0, bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    union = area_a + area_b - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+@dataclass
+class FaceTrack:
+    """One face followed across frames."""
+    track_id: int
+    box: Box
+    template: Any = None
+    confidence: float = 1.0
+    match: Optional[FaceMatch] = None
+    error: Optional[str] = None
+    frames: int = 1
+
+    @property
+    def recognized(self) -> bool:
+        return self.match is not None
+
+    @property
+    def area(self) -> int:
+        return (self.box[1] - self.box[3]) * (self.box[2] - self.box[0])
+
+
+@dataclass
+class _DeviceTracks:
+    tracks: List[FaceTrack] = field(default_factory=list)
+    next_id: int = 1
+    frame_index: int = 0
+    frames_since_detection: int = 0
+    updated_at: float = 0.0
+    image_size: Tuple[int, int] = (0, 0)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class FaceTracker:
+    """Per-device face tracks with periodic re-detection and once-per-track recognition."""
+
+    def __init__(
+        self,
+        face_service: Any,
+        redetect_interval: int = 10,
+        min_confidence: float = 0.5,
+        iou_threshold: float = 0.3,
+        max_idle_seconds: float = 5.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.face_service = face_service
+        self.redetect_interval = redetect_interval
+        self.min_confidence = min_confidence
+        self.iou_threshold = iou_threshold
+        self.max_idle_seconds = max_idle_seconds
+        self._clock = clock
+        self._devices: Dict[str, _DeviceTracks] = {}
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.dropped = 0
+        self.detections = 0
+        self.recognitions = 0
+
+    def _state(self, device_id: str) -> _DeviceTracks:
+        with self._lock:
+            self._remove_idle()
+            state = self._devices.get(device_id)
+            if state is None:
+                state = _DeviceTracks(updated_at=self._clock())
+                self._devices[device_id] = state
+            return state
+
+    def _remove_idle(self) -> None:
+        """Forget devices that sent no frame for max_idle_seconds (called with the lock held)."""
+        now = self._clock()
+        idle = [
+            device_id for device_id, state in self._devices.items()
+            if now - state.updated_at > self.max_idle_seconds and not state.lock.locked()
+        ]
+        for device_id in idle:
+            del self._devices[device_id]
+
+    def reset(self, device_id: str) -> None:
+        """Drop a device's tracks (e.g. when it stops scanning)."""
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+    def tracks(self, device_id: str) -> Optional[List[FaceTrack]]:
+        """
+        Current tracks of a device, or None when it has no recent tracking state.
+        The tracks are only replaced, never mutated, once returned.
+        """
+        state = self._devices.get(device_id)
+        if state is None or self._clock() - state.updated_at > self.max_idle_seconds:
+            return None
+        return list(state.tracks)
+
+    def primary_track(self, device_id: str) -> Optional[FaceTrack]:
+        """Largest current track of a device (the person closest to the wearer)."""
+        tracks = self.tracks(device_id)
+        if not tracks:
+            return None
+        return max(tracks, key=lambda track: track.area)
+
+    def image_size(self, device_id: str) -> Tuple[int, int]:
+        state = self._devices.get(device_id)
+        return state.image_size if state else (0, 0)
+
+    def process(self, device_id: str, image: Any) -> Optional[List[FaceTrack]]:
+        """
+        Advance a device's tracks by one frame.
+        A frame arriving while the previous one is still being processed is dropped.
+
+        Args:
+            device_id: Device the frame came from
+            image: Raw frame bytes or a DecodedImage
+
+        Returns:
+            The device's tracks after this frame, or None if the frame was dropped
+        """
+        state = self._state(device_id)
+        if not state.lock.acquire(blocking=False):
+            self.dropped += 1
+            return None
+        try:
+            try:
+                decoded = ImageProcessor.decode_image(image)
+            except ImageProcessingError as e:
+                logger.info(f"Dropping undecodable frame from {device_id}: {e}")
+                self.dropped += 1
+                return None
+
+            if state.frame_index == 0 or self._clock() - state.updated_at > self.max_idle_seconds:
+                # New or stale device: start over with a detection on this frame
+                state.tracks = []
+                state.frames_since_detection = self.redetect_interval
+            self.frames += 1
+            state.frame_index += 1
+            state.image_size = (decoded.width, decoded.height)
+
+            gray, scale = self._tracking_image(decoded.pixels)
+            tracks = [self._follow(track, gray, scale) for track in state.tracks]
+            lost = any(track.confidence < self.min_confidence for track in tracks)
+
+            # With nobody in view, look for new faces more often than tracks are re-detected
+            interval = self.redetect_interval if tracks else max(1, self.redetect_interval // 3)
+            state.frames_since_detection += 1
+            if lost or state.frames_since_detection >= interval:
+                tracks = self._redetect(state, decoded, tracks, gray, scale)
+
+            state.tracks = tracks
+            state.updated_at = self._clock()
+            return list(tracks)
+        finally:
+            state.lock.release()
+
+    @staticmethod
+    def _tracking_image(pixels) -> Tuple[Any, float]:
+        height, width = pixels.shape[:2]
+        scale = min(1.0, TRACKING_DIMENSION / max(height, width))
+        small = cv2.resize(
+            pixels, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA
+        )
+        # A light blur keeps the correlation stable under sub-pixel motion
+        return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_RGB2GRAY), (5, 5), 0), scale
+
+    @staticmethod
+    def _scaled(box: Box, scale: float) -> Box:
+        return tuple(int(round(value * scale)) for value in box)
+
+    def _template(self, gray, box: Box, scale: float):
+        top, right, bottom, left = self._scaled(box, scale)
+        patch = gray[max(0, top):bottom, max(0, left):right]
+        return patch.copy() if patch.size else None
+
+    def _follow(self, track: FaceTrack, gray, scale: float) -> FaceTrack:
+        """Move a track to where its template correlates best near its last position."""
+        template = track.template
+        if template is None:
+            return FaceTrack(**{**vars(track), "confidence": 0.0})
+
+        top, right, bottom, left = self._scaled(track.box, scale)
+        margin_y = int((bottom - top) * SEARCH_MARGIN)
+        margin_x = int((right - left) * SEARCH_MARGIN)
+        y0, x0 = max(0, top - margin_y), max(0, left - margin_x)
+        window = gray[y0:min(gray.shape[0], bottom + margin_y), x0:min(gray.shape[1], right + margin_x)]
+
+        confidence, location = 0.0, (0, 0)
+        if window.shape[0] >= template.shape[0] and window.shape[1] >= template.shape[1]:
+            scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, best, _, location = cv2.minMaxLoc(scores)
+            confidence = float(best) if np.isfinite(best) else 0.0
+
+        new_left, new_top = (x0 + location[0]) / scale, (y0 + location[1]) / scale
+        height, width = track.box[2] - track.box[0], track.box[1] - track.box[3]
+        box = (int(new_top), int(new_left + width), int(new_top + height), int(new_left))
+        return FaceTrack(**{**vars(track), "box": box, "confidence": confidence, "frames": track.frames + 1})
+
+    def _redetect(
+        self,
+        state: _DeviceTracks,
+        decoded: DecodedImage,
+        tracks: List[FaceTrack],
+        gray,
+        scale: float
+    ) -> List[FaceTrack]:
+        """Detect faces, keep tracks that still match a detection and recognize the new ones."""
+        service = self.face_service
+        usable, _ = ImageProcessor.check_frame_quality(decoded, service.get_quality_gate(PROFILE_MULTI))
+        if not usable:
+            # Keep following what we have; try detecting again on the next frame
+            return [track for track in tracks if track.confidence >= self.min_confidence]
+
+        self.detections += 1
+        state.frames_since_detection = 0
+        locations = service.locate_faces(decoded.pixels, profile=PROFILE_MULTI)
+
+        # Greedy IoU association, best overlaps first
+        pairs = sorted(
+            ((box_iou(track.box, location), t, d)
+             for t, track in enumerate(tracks) for d, location in enumerate(locations)),
+            reverse=True
+        )
+        assigned: Dict[int, FaceTrack] = {}
+        used_tracks = set()
+        for iou, t, d in pairs:
+            if iou < self.iou_threshold or t in used_tracks or d in assigned:
+                continue
+            used_tracks.add(t)
+            assigned[d] = tracks[t]
+
+        result: List[FaceTrack] = []
+        for d, location in enumerate(locations):
+            previous = assigned.get(d)
+            if previous is None:
+                track = FaceTrack(track_id=state.next_id, box=tuple(location))
+                state.next_id += 1
+            else:
+                track = FaceTrack(**{**vars(previous), "box": tuple(location)})
+            track.template = self._template(gray, track.box, scale)
+            track.confidence = 1.0
+            result.append(track)
+
+        # Recognition happens once per track: only tracks without an identity are encoded
+        pending = [track for track in result if not track.recognized]
+        if pending:
+            self.recognitions += len(pending)
+            faces = service.identify_located_faces(decoded.pixels, [track.box for track in pending])
+            for track, face in zip(pending, faces):
+                track.match, track.error = face.match, face.error
+        return result
+
+    def describe(self) -> Dict[str, Any]:
+        """Tracking statistics: detections and recognitions run versus frames processed."""
+        with self._lock:
+            self._remove_idle()
+        return {
+            "devices": len(self._devices),
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "detections": self.detections,
+            "recognitions": self.recognitions,
+            "detection_ratio": round(self.detections / self.frames, 3) if self.frames else 0.0,
+        }
+
+
+# Singleton instance
+_face_tracker_instance: Optional[FaceTracker] = None
+
+
+def get_face_tracker() -> FaceTracker:
+    """
+    Get or create the face tracker singleton instance.
+    
+    Returns:
+        FaceTracker instance
+    """
+    global _face_tracker_instance
+    if _face_tracker_instance is None:
+        from services.face_service import get_face_service
+        _face_tracker_instance = FaceTracker(
+            get_face_service(),
+            redetect_interval=config.GLASS_TRACK_REDETECT_FRAMES,
+            min_confidence=config.GLASS_TRACK_MIN_CONFIDENCE,
+            max_idle_seconds=config.GLASS_TRACK_IDLE_SECONDS
+        )
+    return _face_tracker_instance
@@ -0,0 +1,101 @@
+"""
+Live MJPEG fan-out of smart glass frames to viewers.
+
+Viewers used to poll the latest-frame endpoint, paying a request per frame,
+getting the same bytes again when nothing changed and missing frames in
+between. A viewer now holds one multipart/x-mixed-replace response open and
+is woken whenever its device publishes a frame.
+
+All viewers of a device are served from the frame store's bytes for that
+frame. Nothing is decoded or re-encoded, and only a small part header is
+added per viewer. Viewers do not have queues: a viewer that wakes up sends
+the newest frame. If a viewer is slow to read, the frames that arrived in
+the meantime are skipped instead of piling up.
+"""
+
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+import asyncio
+
+from services.frame_store import Frame
+
+BOUNDARY = "frame"
+MEDIA_TYPE = f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+
+
+class FrameBroadcaster:
+    """Per-device wake-ups for MJPEG viewers. Used from the event loop only."""
+
+    def __init__(self, latest: Callable[[str], Optional[Frame]], idle_timeout: float = 5.0):
+        """
+        Args:
+            latest: Returns a device's newest frame (e.g. FrameStore.latest)
+            idle_timeout: Seconds a viewer waits for a frame before checking whether to stop
+        """
+        self._latest = latest
+        self.idle_timeout = idle_timeout
+        self._events: Dict[str, asyncio.Event] = {}
+        self._viewers: Dict[str, int] = {}
+        self.sent = 0
+
+    def publish(self, device_id: str) -> None:
+        """Wake the viewers of a device after it stored a new frame."""
+        event = self._events.pop(device_id, None)
+        if event is not None:
+            event.set()
+
+    def _next_event(self, device_id: str) -> asyncio.Event:
+        event = self._events.get(device_id)
+        if event is None:
+            event = self._events[device_id] = asyncio.Event()
+        return event
+
+    @staticmethod
+    def part_header(frame: Frame) -> bytes:
+        return (
+            f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {frame.size}\r\n\r\n"
+        ).encode("ascii")
+
+    async def stream(
+        self,
+        device_id: str,
+        is_disconnected: Optional[Callable[[], Any]] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield the multipart body of a device's live stream, starting with its current frame.
+
+        Args:
+            device_id: Device to stream
+            is_disconnected: Awaitable check for a gone viewer, tried when no frame arrives in time
+        """
+        self._viewers[device_id] = self._viewers.get(device_id, 0) + 1
+        last_seq = 0
+        try:
+            while True:
+                # Register for the next wake-up before reading, so no frame slips in between
+                event = self._next_event(device_id)
+                frame = self._latest(device_id)
+                if frame is not None and frame.seq != last_seq:
+                    last_seq = frame.seq
+                    self.sent += 1
+                    yield self.part_header(frame)
+                    yield frame.data
+                    yield b"\r\n"
+                    continue
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        return
+        finally:
+            self._viewers[device_id] -= 1
+            if not self._viewers[device_id]:
+                del self._viewers[device_id]
+                self._events.pop(device_id, None)
+
+    def describe(self) -> Dict[str, Any]:
+        """Fan-out statistics for health reporting."""
+        return {
+            "devices": len(self._viewers),
+            "viewers": sum(self._viewers.values()),
+            "frames_sent": self.sent,
+        }
@@ -0,0 +1,119 @@
+"""
+Frame-change detection for smart glass devices.
+
+Glass devices push a frame with every heartbeat, and the camera often sees
+the same scene for seconds. Each device remembers the perceptual hash of the
+last frame that went through recognition together with its result; a new
+frame whose hash is within a few bits of it has not changed materially and
+reuses that result instead of running the pipeline again. Results are reused
+for at most max_reuse_seconds, so gallery changes still show up on a static
+scene. Results are also only reused for the same viewer, since the
+recognition response includes a profile filtered by the viewer's role.
+
+A result older than max_reuse_seconds can never be reused, so its device is
+forgotten then: the cached results carry user profiles and device ids are
+client-chosen, so nothing is kept for devices that stopped sending frames.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+import threading
+import time
+
+from utils.image_processor import ImageProcessor
+
+
+@dataclass
+class _DeviceFrame:
+    frame_hash: int
+    result: Any
+    analysed_at: float
+    viewer: Optional[str] = None
+    analysed: int = 0
+    skipped: int = 0
+
+
+class FrameChangeDetector:
+    """Per-device cache of the last analysed frame's hash and recognition result."""
+
+    def __init__(
+        self,
+        threshold: int = 6,
+        max_reuse_seconds: float = 10.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.threshold = threshold
+        self.max_reuse_seconds = max_reuse_seconds
+        self._clock = clock
+        # Ordered by analysed_at, oldest first
+        self._devices: "OrderedDict[str, _DeviceFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.analysed = 0
+        self.skipped = 0
+
+    def lookup(self, device_id: str, frame_hash: int, viewer: Optional[str] = None) -> Optional[Any]:
+        """
+        Previous result for the device if the frame has not changed materially.
+
+        Returns:
+            The reused result, or None when the frame has to be analysed
+        """
+        with self._lock:
+            self._expire()
+            state = self._devices.get(device_id)
+            if (
+                state is None
+                or state.viewer != viewer
+                or self.threshold < 0
+                or ImageProcessor.hamming_distance(state.frame_hash, frame_hash) > self.threshold
+            ):
+                return None
+            state.skipped += 1
+            self.skipped += 1
+            return state.result
+
+    def record(self, device_id: str, frame_hash: int, result: Any, viewer: Optional[str] = None) -> None:
+        """Remember the result of analysing a frame."""
+        with self._lock:
+            state = self._devices.pop(device_id, None)
+            analysed = state.analysed if state else 0
+            skipped = state.skipped if state else 0
+            self._devices[device_id] = _DeviceFrame(
+                frame_hash, result, self._clock(), viewer=viewer, analysed=analysed + 1, skipped=skipped
+            )
+            self.analysed += 1
+            self._expire()
+
+    def _expire(self) -> None:
+        """Forget devices whose result is too old to be reused (they sit at the front)."""
+        now = self._clock()
+        while self._devices:
+            device_id, state = next(iter(self._devices.items()))
+            if now - state.analysed_at <= self.max_reuse_seconds:
+                break
+            del self._devices[device_id]
+
+    def forget(self, device_id: str) -> None:
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+    @staticmethod
+    def _ratio(skipped: int, analysed: int) -> float:
+        total = skipped + analysed
+        return round(skipped / total, 3) if total else 0.0
+
+    def describe(self, device_id: Optional[str] = None) -> Dict[str, Any]:
+        """Skip statistics, overall or for one device."""
+        with self._lock:
+            self._expire()
+        if device_id is not None:
+            state = self._devices.get(device_id)
+            analysed, skipped = (state.analysed, state.skipped) if state else (0, 0)
+            return {"analysed": analysed, "skipped": skipped, "skip_ratio": self._ratio(skipped, analysed)}
+        return {
+            "devices": len(self._devices),
+            "analysed": self.analysed,
+            "skipped": self.skipped,
+            "skip_ratio": self._ratio(self.skipped, self.analysed),
+        }
@@ -0,0 +1,213 @@
+"""
+Bounded in-memory store of the latest smart glass frames.
+
+Frames are kept in memory because the database is too slow for 10 fps
+streaming, but an unbounded dict keeps the last JPEG of every device ever
+seen. The store keeps a small ring of recent frames per device and bounds
+memory in four ways:
+
+- frames larger than max_frame_bytes are rejected;
+- frames older than ttl_seconds are dropped (a device that went away has
+  no "latest" frame any more);
+- the frames of all devices together stay within max_bytes: once the budget
+  is exceeded, the devices that sent a frame least recently are evicted;
+- each device keeps at most ring_size frames.
+
+Memory use is therefore at most max_bytes, however many devices connect.
+Per-device state kept elsewhere (recognition results, face tracks) is
+released through eviction listeners, which run whenever a device loses its
+frames.
+"""
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional
+import logging
+import threading
+import time
+
+from utils.config import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Frame:
+    """One JPEG frame received from a device."""
+    data: bytes
+    seq: int
+    received_at: float
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+class FrameStore:
+    """Per-device rings of recent frames under a global byte budget with LRU eviction."""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_frame_bytes: int = 2 * 1024 * 1024,
+        ttl_seconds: float = 30.0,
+        ring_size: int = 3,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_bytes = max_bytes
+        self.max_frame_bytes = max_frame_bytes
+        self.ttl_seconds = ttl_seconds
+        self.ring_size = ring_size
+        self._clock = clock
+        # Ordered by last frame received, least recent first
+        self._rings: "OrderedDict[str, Deque[Frame]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+        self._dropped: List[str] = []
+        self._seq = 0
+        self.total_bytes = 0
+        self.frames = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def put(self, device_id: str, data: bytes) -> Optional[Frame]:
+        """
+        Store a device's newest frame.
+
+        Returns:
+            The stored frame, or None if it was empty or larger than max_frame_bytes
+        """
+        if not data or len(data) > self.max_frame_bytes:
+            self.rejected += 1
+            return None
+
+        with self._lock:
+            now = self._clock()
+            self._seq += 1
+            frame = Frame(data=data, seq=self._seq, received_at=now)
+
+            ring = self._rings.pop(device_id, None)
+            if ring is None:
+                ring = deque()
+            ring.append(frame)
+            self.total_bytes += frame.size
+            while len(ring) > self.ring_size:
+                self.total_bytes -= ring.popleft().size
+            self._rings[device_id] = ring
+            self.frames += 1
+
+            self._expire(now)
+            self._enforce_budget(device_id)
+        self._notify_dropped()
+        return frame
+
+    def add_eviction_listener(self, listener: Callable[[str], None]) -> None:
+        """Call listener(device_id) whenever a device's frames are evicted, expire or are discarded."""
+        self._listeners.append(listener)
+
+    def _drop(self, device_id: str) -> None:
+        ring = self._rings.pop(device_id)
+        self.total_bytes -= sum(frame.size for frame in ring)
+        self._dropped.append(device_id)
+
+    def _notify_dropped(self) -> None:
+        """Run the eviction listeners outside the lock for devices that are still gone."""
+        if not self._dropped:
+            return
+        with self._lock:
+            dropped = [device_id for device_id in self._dropped if device_id not in self._rings]
+            self._dropped = []
+        for device_id in dict.fromkeys(dropped):
+            for listener in self._listeners:
+                try:
+                    listener(device_id)
+                except Exception as e:
+                    logger.warning(f"Frame store eviction listener failed for {device_id}: {e}")
+
+    def _expire(self, now: float) -> None:
+        """Drop devices whose newest frame is older than the TTL (they sit at the front)."""
+        if self.ttl_seconds <= 0:
+            return
+        while self._rings:
+            device_id, ring = next(iter(self._rings.items()))
+            if now - ring[-1].received_at <= self.ttl_seconds:
+                break
+            self._drop(device_id)
+            self.expired += 1
+
+    def _enforce_budget(self, current_device: str) -> None:
+        """Evict least recently updated devices, then older frames of the current one."""
+        while self.total_bytes > self.max_bytes and len(self._rings) > 1:
+            device_id = next(iter(self._rings))
+            if device_id == current_device:
+                break
+            self._drop(device_id)
+            self.evicted += 1
+        ring = self._rings.get(current_device)
+        while ring and self.total_bytes > self.max_bytes and len(ring) > 1:
+            self.total_bytes -= ring.popleft().size
+
+    def _live_ring(self, device_id: str) -> Optional[Deque[Frame]]:
+        ring = self._rings.get(device_id)
+        if ring and self.ttl_seconds > 0 and self._clock() - ring[-1].received_at > self.ttl_seconds:
+            self._drop(device_id)
+            self.expired += 1
+            return None
+        return ring
+
+    def latest(self, device_id: str) -> Optional[Frame]:
+        """A device's newest frame, or None if it has none younger than the TTL."""
+        with self._lock:
+            ring = self._live_ring(device_id)
+            frame = ring[-1] if ring else None
+        self._notify_dropped()
+        return frame
+
+    def recent(self, device_id: str) -> List[Frame]:
+        """A device's recent frames, newest first."""
+        with self._lock:
+            ring = self._live_ring(device_id)
+            frames = list(reversed(ring)) if ring else []
+        self._notify_dropped()
+        return frames
+
+    def discard(self, device_id: str) -> None:
+        with self._lock:
+            if device_id in self._rings:
+                self._drop(device_id)
+        self._notify_dropped()
+
+    def describe(self) -> Dict[str, Any]:
+        """Store statistics for health reporting."""
+        return {
+            "devices": len(self._rings),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "frames": self.frames,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
+
+
+# Singleton instance
+_frame_store: Optional[FrameStore] = None
+
+
+def get_frame_store() -> FrameStore:
+    """
+    Get or create the frame store singleton instance.
+
+    Returns:
+        FrameStore instance
+    """
+    global _frame_store
+    if _frame_store is None:
+        _frame_store = FrameStore(
+            max_bytes=int(config.GLASS_FRAME_BUDGET_MB * 1024 * 1024),
+            max_frame_bytes=int(config.GLASS_MAX_FRAME_KB * 1024),
+            ttl_seconds=config.GLASS_FRAME_TTL_SECONDS,
+            ring_size=config.GLASS_FRAME_RING_SIZE
+        )
+    return _frame_store
@@ -3,7 +3,7 @@ Profile picture service for Smart Glass AI system.
 Handles retrieval of front-facing face images for profile display.
 """
 
-from typing import Optional, TYPE_CHECKING
+from typing import Dict, List, Optional, TYPE_CHECKING
 from datetime import datetime
 import logging
 from services.face_service import get_face_service
@@ -56,6 +56,36 @@ def get_profile_picture_url(user_id: str, supabase_service: 'SupabaseService') -
         logger.error(f"Error getting profile picture for user {user_id}: {str(e)}")
         return None
 
+def get_profile_picture_urls(user_ids: List[str], supabase_service: 'SupabaseService') -> Dict[str, Optional[str]]:
+    """
+    Retrieve profile picture URLs for several users with a single metadata query.
+    Same precedence as get_profile_picture_url: 'avatar' first, then 'front'.
+    
+    Args:
+        user_ids: User identifiers
+        supabase_service: SupabaseService instance
+        
+    Returns:
+        Dict mapping user_id -> URL (None when the user has no picture or lookup failed)
+    """
+    urls: Dict[str, Optional[str]] = {user_id: None for user_id in user_ids}
+    try:
+        rows = supabase_service.get_face_images_metadata_batch(list(urls), ['avatar', 'front'])
+    except Exception as e:
+        logger.error(f"Error getting profile pictures for {len(urls)} users: {str(e)}")
+        return urls
+
+    # Rows are newest first, so the first row per (user, type) is the current one
+    latest: Dict[tuple, dict] = {}
+    for row in rows:
+        latest.setdefault((row['user_id'], row['image_type']), row)
+
+    for user_id in urls:
+        row = latest.get((user_id, 'avatar')) or latest.get((user_id, 'front'))
+        if row:
+            urls[user_id] = _construct_timestamped_url(supabase_service, row['image_url'], row['created_at'])
+    return urls
+
 def _construct_timestamped_url(supabase_service, image_path: str, created_at: str) -> str:
     """Helper to append timestamp to image URL for cache busting."""
     timestamp = 0
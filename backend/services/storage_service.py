@@ -4,7 +4,7 @@ Handles database operations and image storage.
 """
 
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 from datetime import datetime
 from supabase import create_client, Client
 import uuid
@@ -20,8 +20,17 @@ class SupabaseError(Exception):
     pass
 
 
+def _is_missing_unique_constraint(error: Exception) -> bool:
+    """True for Postgres 42P10: ON CONFLICT target without a matching unique constraint."""
+    message = str(error)
+    return '42P10' in message or 'no unique or exclusion constraint' in message
+
+
 class SupabaseService:
     """Service for Supabase database and storage operations."""
+
+    # Cleared when devices.device_id has no unique constraint to upsert on
+    _device_upsert_supported = True
     
     def __init__(self):
         """Initialize Supabase client with environment variables."""
@@ -307,17 +316,79 @@ class SupabaseService:
     def get_users_with_encodings(self) -> List[Dict[str, Any]]:
         """
         Retrieve all users that have face encodings.
+        Reads page by page so the server row limit cannot silently truncate the result.
         
         Returns:
             List of user records with encodings
         """
+        users: List[Dict[str, Any]] = []
+        for page in self.iter_users_with_encodings(
+            columns='id, name, email, face_encoding, face_updated_at, updated_at'
+        ):
+            users.extend(page)
+        return users
+
+    def iter_users_with_encodings(
+        self,
+        page_size: Optional[int] = None,
+        columns: str = 'id, face_encoding, face_updated_at, updated_at'
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream users that have face encodings in pages, using keyset pagination on id.
+        Each request asks for rows with id greater than the last one seen, so pages stay
+        cheap however deep the scan goes and rows are never skipped or repeated.
+        
+        Args:
+            page_size: Rows per request (defaults to FACE_GALLERY_PAGE_SIZE)
+            columns: Columns to select; must include 'id'
+            
+        Yields:
+            Lists of user records, one per page
+            
+        Raises:
+            SupabaseError: If a page request fails
+        """
+        page_size = page_size or config.FACE_GALLERY_PAGE_SIZE
+        last_id: Optional[str] = None
+        while True:
+            try:
+                query = self.client.table('users').select(columns) \
+                    .not_.is_('face_encoding', 'null') \
+                    .order('id') \
+                    .limit(page_size)
+                if last_id is not None:
+                    query = query.gt('id', last_id)
+                rows = query.execute().data or []
+            except Exception as e:
+                raise SupabaseError(f"Failed to retrieve user encodings: {str(e)}")
+
+            # Stop only on an empty page: the server may cap pages below page_size
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]['id']
+
+    def get_encoding_changes_since(self, since: str) -> List[Dict[str, Any]]:
+        """
+        Retrieve users whose row or face encoding changed at or after a watermark.
+        Rows with a NULL face_encoding are returned too so callers can treat them as tombstones.
+        
+        Args:
+            since: ISO-8601 timestamp watermark (inclusive)
+            
+        Returns:
+            List of user records with id, face_encoding and timestamps
+        """
         try:
+            # Quote the timestamp: '.' and ':' are reserved inside PostgREST or() filters
             response = self.client.table('users').select(
-                'id, name, email, face_encoding, face_updated_at'
-            ).not_.is_('face_encoding', 'null').execute()
+                'id, face_encoding, face_updated_at, updated_at'
+            ).or_(
+                f'updated_at.gte."{since}",face_updated_at.gte."{since}"'
+            ).order('updated_at').execute()
             return response.data or []
         except Exception as e:
-            raise SupabaseError(f"Failed to retrieve user encodings: {str(e)}")
+            raise SupabaseError(f"Failed to retrieve encoding changes: {str(e)}")
 
     def get_encoding_count(self) -> int:
         """
@@ -399,6 +470,58 @@ class SupabaseService:
         """
         return self._get_user_dict('id', user_id, "Failed to retrieve full profile")
     
+    def get_users_by_ids(self, user_ids: List[str], select: str = '*') -> List[Dict[str, Any]]:
+        """
+        Retrieve several user records in one query.
+        
+        Args:
+            user_ids: User identifiers to fetch
+            select: Columns to select (default: '*')
+            
+        Returns:
+            List of user records (order not guaranteed, missing ids omitted)
+        """
+        if not user_ids:
+            return []
+        try:
+            response = self.client.table('users').select(select).in_('id', list(user_ids)).execute()
+            return response.data or []
+        except Exception as e:
+            raise SupabaseError(f"Failed to retrieve users: {str(e)}")
+
+    def get_medical_info_batch(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Retrieve medical info for several users in one query.
+        
+        Returns:
+            Dict mapping user_id -> medical_info record
+        """
+        if not user_ids:
+            return {}
+        try:
+            response = self.client.table('medical_info').select('*').in_('user_id', list(user_ids)).execute()
+            return {row['user_id']: row for row in (response.data or [])}
+        except Exception as e:
+            raise SupabaseError(f"Failed to retrieve medical info: {str(e)}")
+
+    def get_face_images_metadata_batch(self, user_ids: List[str], image_types: List[str]) -> List[Dict[str, Any]]:
+        """
+        Get face image metadata of the given types for several users in one query.
+        Rows are returned newest first.
+        """
+        if not user_ids:
+            return []
+        try:
+            result = self.client.table('face_images') \
+                .select('user_id, image_url, image_type, created_at') \
+                .in_('user_id', list(user_ids)) \
+                .in_('image_type', list(image_types)) \
+                .order('created_at', desc=True) \
+                .execute()
+            return result.data or []
+        except Exception as e:
+            raise SupabaseError(f"Failed to get face image metadata: {str(e)}")
+
     def get_face_image_metadata(self, user_id: str, image_type: str) -> Optional[Dict[str, Any]]:
         """
         Get metadata for a specific face image type.
@@ -416,9 +539,21 @@ class SupabaseService:
         except Exception as e:
             raise SupabaseError(f"Failed to get face image metadata: {str(e)}")
 
-    def update_face_image_metadata(self, user_id: str, image_type: str, image_path: str) -> None:
+    def update_face_image_metadata(
+        self,
+        user_id: str,
+        image_type: str,
+        image_path: str,
+        face_encoding: Optional[str] = None
+    ) -> None:
         """
         Update face image metadata. Deletes old record and inserts new one.
+        
+        Args:
+            user_id: Owner of the image
+            image_type: Angle or 'avatar'
+            image_path: Storage path of the image
+            face_encoding: Optional serialized encoding of this angle (per-angle template)
         """
         try:
             # Delete old record
@@ -428,14 +563,112 @@ class SupabaseService:
                 .execute()
                 
             # Insert new record
-            self.client.table('face_images').insert({
+            record = {
                 "user_id": user_id,
                 "image_url": image_path,
                 "image_type": image_type
-            }).execute()
+            }
+            if face_encoding is not None:
+                record["face_encoding"] = face_encoding
+            self.client.table('face_images').insert(record).execute()
         except Exception as e:
             raise SupabaseError(f"Failed to update face image metadata: {str(e)}")
 
+    def iter_face_templates(self, page_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream per-angle face encodings (face_images rows with an encoding) in pages,
+        using keyset pagination on id like iter_users_with_encodings.
+        
+        Yields:
+            Lists of rows with id, user_id and face_encoding
+            
+        Raises:
+            SupabaseError: If a page request fails
+        """
+        page_size = page_size or config.FACE_GALLERY_PAGE_SIZE
+        last_id: Optional[str] = None
+        while True:
+            try:
+                query = self.client.table('face_images').select('id, user_id, face_encoding') \
+                    .not_.is_('face_encoding', 'null') \
+                    .order('id') \
+                    .limit(page_size)
+                if last_id is not None:
+                    query = query.gt('id', last_id)
+                rows = query.execute().data or []
+            except Exception as e:
+                raise SupabaseError(f"Failed to retrieve face templates: {str(e)}")
+
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]['id']
+
+    def get_face_templates(self, user_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Get the per-angle face encodings of several users in one query.
+        
+        Returns:
+            List of rows with user_id, image_type and face_encoding
+        """
+        if not user_ids:
+            return []
+        try:
+            result = self.client.table('face_images') \
+                .select('user_id, image_type, face_encoding') \
+                .in_('user_id', list(user_ids)) \
+                .not_.is_('face_encoding', 'null') \
+                .execute()
+            return result.data or []
+        except Exception as e:
+            raise SupabaseError(f"Failed to retrieve face templates: {str(e)}")
+
+    def clear_face_templates(self, user_id: str) -> None:
+        """Remove the per-angle face encodings of a user, keeping the images."""
+        try:
+            self.client.table('face_images').update({'face_encoding': None}) \
+                .eq('user_id', user_id) \
+                .execute()
+        except Exception as e:
+            raise SupabaseError(f"Failed to clear face templates: {str(e)}")
+
+    def upsert_device_states(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Insert or update the status of several devices in one request.
+        Rows are matched on device_id; columns not in the rows, such as the
+        paired user_id, are left unchanged. Databases without a unique
+        constraint on devices.device_id cannot take the upsert, so those
+        fall back to one select and insert/update per device.
+
+        Args:
+            rows: Dicts with device_id, status, battery_level and last_seen
+        """
+        if not rows:
+            return
+        if self._device_upsert_supported:
+            try:
+                self.client.table('devices').upsert(rows, on_conflict='device_id').execute()
+                return
+            except Exception as e:
+                logger.warning(f"Bulk device upsert failed, writing devices one by one: {e}")
+                if _is_missing_unique_constraint(e):
+                    # Stop retrying the upsert until the schema is migrated and the server restarted
+                    self._device_upsert_supported = False
+        try:
+            for row in rows:
+                self._save_device_state(row)
+        except Exception as e:
+            raise SupabaseError(f"Failed to update device states: {str(e)}")
+
+    def _save_device_state(self, row: Dict[str, Any]) -> None:
+        """Register a device on its first heartbeat or update its status."""
+        existing = self.client.table('devices').select('device_id').eq('device_id', row['device_id']).execute()
+        if existing.data:
+            updates = {key: value for key, value in row.items() if key != 'device_id'}
+            self.client.table('devices').update(updates).eq('device_id', row['device_id']).execute()
+        else:
+            self.client.table('devices').insert(row).execute()
+
     def upload_file(
         self, 
         bucket: str, 
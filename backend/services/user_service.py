@@ -1,14 +1,15 @@
 from typing import List, Dict, Any, Optional, Tuple
-import json
 from fastapi import UploadFile, HTTPException
 from fastapi.concurrency import run_in_threadpool
 from services.storage_service import get_supabase_service
 from services.face_service import get_face_service, FaceRecognitionError
 from utils.security import hash_password, verify_password
-from services.profile_picture_service import get_profile_picture_url, ProfilePictureError
+from services.profile_picture_service import get_profile_picture_url, get_profile_picture_urls, ProfilePictureError
 from utils.validation import validate_password, ValidationError
 from services.connection_service import ConnectionService
 from models.user import RegistrationRequest, UserCreate
+from utils.config import config
+from utils.encoding_codec import encode_face_encoding
 import logging
 
 logger = logging.getLogger(__name__)
@@ -65,15 +66,19 @@ def _validate_registration(supabase, request: RegistrationRequest):
 async def _process_face_data(
     face_service, 
     face_images_dict: Dict[str, UploadFile]
-) -> Tuple[List[float], Dict[str, bytes]]:
-    """Collect images, generate encoding, and check for face duplicates."""
+) -> Tuple[List[float], Dict[str, bytes], Dict[str, Any]]:
+    """
+    Collect images, generate per-angle and average encodings, and check for face duplicates.
+    Returns the per-angle analyses too, so the upload stage can crop without detecting again.
+    """
     try:
         face_images = await face_service.collect_face_images(face_images_dict)
         
         if not face_images:
             raise HTTPException(status_code=400, detail="At least one face image is required")
         
-        avg_encoding = await run_in_threadpool(face_service.process_face_images, face_images)
+        analyses = await face_service.analyze_face_images_async(face_images)
+        avg_encoding = face_service.average_encodings(face_service.encodings_from_analyses(analyses))
         
         match_result = await run_in_threadpool(face_service.find_match, avg_encoding)
         if match_result.matched:
@@ -82,7 +87,7 @@ async def _process_face_data(
                 status_code=409, 
                 detail="This face is already registered to another user."
             )
-        return avg_encoding, face_images
+        return avg_encoding, face_images, analyses
         
     except FaceRecognitionError as e:
         logger.error(f"Face recognition error: {e}")
@@ -94,13 +99,13 @@ async def _process_face_data(
 async def _persist_user_registration(
     supabase, 
     request: RegistrationRequest, 
-    face_data: Tuple[List[float], Dict[str, bytes]]
+    face_data: Tuple[List[float], Dict[str, bytes], Dict[str, Any]]
 ) -> Dict[str, Any]:
     """Create user record and upload face images."""
-    avg_encoding, face_images = face_data
+    avg_encoding, face_images, analyses = face_data
     try:
         password_hash = hash_password(request.password)
-        face_encoding_json = json.dumps(avg_encoding)
+        face_encoding_value = encode_face_encoding(avg_encoding, config.FACE_ENCODING_STORAGE_FORMAT)
         
         # Prepare data for storage service
         user_create = UserCreate(
@@ -118,7 +123,7 @@ async def _persist_user_registration(
                 gender=request.gender,
                 nationality=request.nationality,
                 id_number=request.id_number,
-                face_encoding=face_encoding_json
+                face_encoding=face_encoding_value
             )
         except Exception as e:
             logger.error(f"Database save failed: {e}")
@@ -128,10 +133,13 @@ async def _persist_user_registration(
         user_id = user_response.id
         logger.info(f"User created in DB: {user_id}")
 
+        face_service = get_face_service()
+
         try:
-            face_service = get_face_service() # Ensure we get the service
             logger.info(f"Uploading face images for {user_id}...")
-            await run_in_threadpool(face_service.upload_face_images, supabase, user_id, face_images)
+            await run_in_threadpool(
+                face_service.upload_face_images, supabase, user_id, face_images, analyses
+            )
             logger.info(f"Face images uploaded for {user_id}")
 
             avatar_url = get_profile_picture_url(user_id, supabase)
@@ -164,6 +172,17 @@ async def _persist_user_registration(
                 detail=f"Failed to upload face images: {str(e)}"
             )
 
+        # Re-save the encoding now that the per-angle templates exist: this patches the
+        # resident gallery and moves face_updated_at so other workers' delta sync picks them up
+        try:
+            await run_in_threadpool(
+                face_service.save_encoding, str(user_id), avg_encoding, {}, supabase,
+                face_service.encodings_from_analyses(analyses)
+            )
+        except FaceRecognitionError as e:
+            logger.warning(f"Failed to refresh face templates for {user_id}: {e}")
+            face_service.gallery.upsert(str(user_id), avg_encoding)
+
         # Return dictionary representation of the created user
         response_dict = user_response.model_dump()
         if avatar_url:
@@ -274,6 +293,48 @@ async def get_complete_user_profile(
 
     return response_payload
 
+# Columns never returned in batched profiles
+_PRIVATE_USER_COLUMNS = ('password_hash', 'face_encoding')
+
+async def get_user_profiles_batch(
+    user_ids: List[str],
+    current_user_id: Optional[str],
+    role: str
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Get profiles for several users with a fixed number of queries (users, pictures, medical info).
+    Applies the same privacy rules as get_complete_user_profile. Emergency contacts are not
+    included; fetch the single profile for those.
+    
+    Returns:
+        Dict mapping user_id -> profile payload (unknown ids are omitted)
+    """
+    unique_ids = list(dict.fromkeys(uid for uid in user_ids if uid))
+    if not unique_ids:
+        return {}
+
+    supabase = get_supabase_service()
+    users = supabase.get_users_by_ids(unique_ids)
+    picture_urls = get_profile_picture_urls([u['id'] for u in users], supabase)
+
+    can_view_full = {
+        u['id']: current_user_id == u['id'] or role in ["doctor", "admin"]
+        for u in users
+    }
+    medical = supabase.get_medical_info_batch([uid for uid, full in can_view_full.items() if full])
+
+    profiles: Dict[str, Dict[str, Any]] = {}
+    for user in users:
+        user_id = user['id']
+        user['profile_picture_url'] = picture_urls.get(user_id)
+        if can_view_full[user_id]:
+            payload = {k: v for k, v in user.items() if k not in _PRIVATE_USER_COLUMNS}
+            payload["medical_info"] = medical.get(user_id, {})
+        else:
+            payload = apply_privacy_settings(user, role)
+        profiles[user_id] = payload
+    return profiles
+
 async def update_user_privacy(user_id: str, update_data: Dict[str, Any]) -> Dict[str, Any]:
     """Update user's privacy settings."""
     if not update_data:
@@ -351,12 +412,17 @@ async def update_user_face_enrollment(
 
     # Extra safety: verify that the new face still matches this user's existing enrollment
     try:
-        sample_image = next(iter(face_images.values()))
+        sample_angle = next(iter(face_images))
     except StopIteration:
         raise HTTPException(status_code=400, detail="At least one face image is required")
 
+    # Every image is decoded and detected once; the same analyses feed the check and the enrollment
     try:
-        match_result = face_service.identify_user(sample_image)
+        analyses = await face_service.analyze_face_images_async(face_images)
+        sample = analyses[sample_angle].result
+        if not sample.success or sample.encoding is None:
+            raise FaceRecognitionError(sample.error or "No face detected in image")
+        match_result = await run_in_threadpool(face_service.find_match, sample.encoding)
     except FaceRecognitionError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -374,7 +440,7 @@ async def update_user_face_enrollment(
 
     # Delegate enrollment to service
     try:
-        await face_service.enroll_user(user_id, face_images, supabase)
+        await face_service.enroll_user(user_id, face_images, supabase, analyses)
     except FaceRecognitionError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
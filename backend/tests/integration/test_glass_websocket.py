@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from routers import glass_relay
+
+
+def test_device_streams_frames_and_receives_commands(client):
+    with client.websocket_connect("/api/glass/ws/ws-glass") as websocket:
+        websocket.send_text('{"battery": 77}')
+        websocket.send_bytes(b"\xff\xd8frame-1\xff\xd9")
+
+        # Commands are pushed over the open channel instead of waiting for a sync
+        response = client.post("/api/glass/command/ws-glass", json={"type": "SHOW_TEXT", "text": "hi"})
+        command_id = response.json()["id"]
+        message = websocket.receive_json()
+        assert message == {"type": "commands", "commands": [{"type": "SHOW_TEXT", "text": "hi", "id": command_id}]}
+        websocket.send_text(f'{{"ack": {command_id}}}')
+
+        # Device messages are handled on the server's own loop
+        for _ in range(50):
+            frame = client.get("/api/glass/frame/ws-glass")
+            if frame.status_code == 200:
+                break
+            time.sleep(0.01)
+        assert frame.status_code == 200
+        assert frame.content == b"\xff\xd8frame-1\xff\xd9"
+
+    # Without a channel, commands queue for the HTTP sync fallback
+    response = client.post("/api/glass/command/ws-glass", json={"type": "CLEAR"})
+    assert response.json()["status"] == "queued"
+    sync = client.post("/api/glass/sync", data={"device_id": "ws-glass", "battery": "76"})
+    assert [command["type"] for command in sync.json()["commands"]] == ["CLEAR"]
+
+
+def test_failed_command_sender_closes_the_channel(client, caplog):
+    async def broken_wait(*args, **kwargs):
+        raise RuntimeError("queue broke")
+
+    with patch.object(glass_relay.command_queue, "wait", broken_wait):
+        with client.websocket_connect("/api/glass/ws/broken-glass") as websocket:
+            # The device is disconnected instead of staying up without commands
+            with pytest.raises(WebSocketDisconnect):
+                websocket.receive_json()
+
+    for _ in range(50):
+        if "broken-glass" not in glass_relay.device_sockets:
+            break
+        time.sleep(0.01)
+    assert "broken-glass" not in glass_relay.device_sockets
+    assert "Glass channel broken-glass failed to send: RuntimeError('queue broke')" in caplog.text
+
+
+def test_long_poll_redelivers_until_acknowledged(client):
+    empty = client.get("/api/glass/commands/poll-glass", params={"timeout": 0})
+    assert empty.json()["commands"] == []
+
+    first = client.post("/api/glass/command/poll-glass", json={"type": "A"}).json()["id"]
+    second = client.post("/api/glass/command/poll-glass", json={"type": "B"}).json()["id"]
+
+    delivered = client.get("/api/glass/commands/poll-glass", params={"timeout": 1}).json()["commands"]
+    assert [command["id"] for command in delivered] == [first, second]
+
+    # The response was 'lost': without an ack the next poll delivers the same commands
+    again = client.get("/api/glass/commands/poll-glass", params={"ack": first, "timeout": 1}).json()["commands"]
+    assert [command["id"] for command in again] == [second]
+
+    done = client.get("/api/glass/commands/poll-glass", params={"ack": second, "timeout": 0}).json()["commands"]
+    assert done == []
+
+
+def test_streamed_frames_keep_one_tracking_job_per_device(caplog):
+    release = threading.Event()
+    calls = []
+
+    class BlockingTracker:
+        def process(self, device_id, content):
+            calls.append(content)
+            release.wait(5)
+            raise RuntimeError("tracker exploded")
+
+    async def scenario():
+        for n in range(3):
+            glass_relay._track_frame("track-glass", bytes([n]))
+        job = glass_relay.tracking_jobs["track-glass"]
+        release.set()
+        await asyncio.gather(job, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    with patch("routers.glass_relay.get_face_tracker", return_value=BlockingTracker()):
+        asyncio.run(scenario())
+
+    # Frames arriving while the first is tracked are skipped, and failures are logged
+    assert calls == [b"\x00"]
+    assert "track-glass" not in glass_relay.tracking_jobs
+    assert "Face tracking failed for track-glass: tracker exploded" in caplog.text
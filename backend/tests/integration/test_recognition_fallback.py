@@ -9,7 +9,7 @@ Validates the "Hybrid Architecture" for recognition:
 import sys
 import os
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi import UploadFile, HTTPException
 
 # Add backend to path
@@ -37,7 +37,7 @@ async def test_recognition_fail_fast_invalid_format():
 
         # Expect HTTPException(400)
         with pytest.raises(HTTPException) as excinfo:
-            await recognize_face(mock_image, {"sub": "user1", "role": "user"})
+            await recognize_face(mock_image, {"sub": "user1", "role": "user"}, top_k=None)
         
         assert excinfo.value.status_code == 400
         assert "Invalid image format" in excinfo.value.detail
@@ -87,7 +87,7 @@ async def test_recognition_fallback_on_timeout():
         mock_get_profile.return_value = {"id": "found_user_id", "name": "John Doe"}
 
         # Execute
-        result = await recognize_face(mock_image, {"sub": "user1", "role": "user"})
+        result = await recognize_face(mock_image, {"sub": "user1", "role": "user"}, top_k=None)
 
         # Assertions
         mock_task.delay.assert_called_once()  # Celery attempted
@@ -123,20 +123,60 @@ async def test_recognition_direct_execution():
         mock_match_result.matched = True
         mock_match_result.user_id = "found_user_id"
         mock_match_result.confidence = 0.99
-        mock_face_service.identify_user.return_value = mock_match_result
+        mock_face_service.identify_user_async = AsyncMock(return_value=mock_match_result)
         mock_get_service.return_value = mock_face_service
         
         # Setup Profile Mock
         mock_get_profile.return_value = {"id": "found_user_id", "name": "Jane Doe"}
 
         # Execute
-        result = await recognize_face(mock_image, {"sub": "user1", "role": "user"})
+        result = await recognize_face(mock_image, {"sub": "user1", "role": "user"}, top_k=None)
 
-        # Assertions
-        mock_face_service.identify_user.assert_called_once()
-        mock_face_service.identify_user.assert_called_with(b"fake_image_bytes")
+        # Assertions: the raw bytes go to the face engine, which decodes them in a worker
+        mock_face_service.identify_user_async.assert_awaited_once_with(b"fake_image_bytes")
+        mock_processor.decode_image.assert_not_called()
         
         assert result["success"] is True
         assert result["match"] is True
         assert result["name"] == "Jane Doe"
 
+
+@pytest.mark.asyncio
+async def test_recognition_top_k_returns_candidates_and_margin():
+    """Test that top_k adds the decision margin, and ranked candidates for privileged roles only."""
+    from models.face_encoding import FaceCandidate, FaceTopKResult
+
+    with patch('routers.recognition.ImageProcessor') as mock_processor, \
+         patch('routers.recognition.get_face_service') as mock_get_service, \
+         patch('routers.recognition.get_complete_user_profile') as mock_get_profile:
+
+        async def mock_read_func():
+            return b"fake_image_bytes"
+        mock_image = MagicMock(spec=UploadFile)
+        mock_image.read = mock_read_func
+
+        mock_face_service = MagicMock()
+        mock_face_service.identify_candidates_async = AsyncMock(return_value=FaceTopKResult(
+            matched=True,
+            candidates=[
+                FaceCandidate(user_id="best", distance=0.30, confidence=0.70),
+                FaceCandidate(user_id="runner_up", distance=0.45, confidence=0.55),
+            ],
+            margin=0.15
+        ))
+        mock_get_service.return_value = mock_face_service
+        mock_get_profile.return_value = {"id": "best", "name": "Jane Doe"}
+
+        result = await recognize_face(mock_image, {"sub": "doctor1", "role": "doctor"}, top_k=2)
+
+        mock_face_service.identify_candidates_async.assert_awaited_once_with(b"fake_image_bytes", 2)
+        mock_face_service.identify_user_async.assert_not_called()
+        assert result["match"] is True
+        assert result["margin"] == 0.15
+        assert [c["user_id"] for c in result["candidates"]] == ["best", "runner_up"]
+        assert result["name"] == "Jane Doe"
+
+        # Regular users must not learn which other users are enrolled
+        result = await recognize_face(mock_image, {"sub": "user1", "role": "user"}, top_k=2)
+        assert result["margin"] == 0.15
+        assert "candidates" not in result
@@ -0,0 +1,99 @@
+"""
+Shared fixtures for the face recognition unit tests.
+
+face_recognition (dlib) is not needed: fake_fr stands in for the module with
+fixed detections and encodings and records how it was called.
+"""
+
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from utils.image_processor import DecodedImage
+
+
+def _vector(seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=128) * 0.1).tolist()
+
+
+class FakeFaceRecognition:
+    """
+    Stand-in for the face_recognition module.
+
+    Attributes:
+        locations: Boxes every detection returns, as (top, right, bottom, left)
+        encodings: Vectors every encoding call returns; by default the seed-1 vector per box
+        on_detect: Optional hook run inside each detection (e.g. to block or to fail)
+        detect_shapes: Shape of every image detection ran on
+        encode_calls: (image shape, boxes) of every encoding call
+    """
+
+    def __init__(self):
+        self.locations = [(50, 200, 200, 50)]
+        self.encodings = None
+        self.on_detect = None
+        self.detect_shapes = []
+        self.encode_calls = []
+
+    @property
+    def detect_calls(self) -> int:
+        return len(self.detect_shapes)
+
+    def face_locations(self, img, **kwargs):
+        self.detect_shapes.append(img.shape)
+        if self.on_detect is not None:
+            self.on_detect(img)
+        return list(self.locations)
+
+    def face_encodings(self, img, locations, **kwargs):
+        locations = list(locations)
+        self.encode_calls.append((img.shape, locations))
+        if self.encodings is not None:
+            return [np.asarray(vector) for vector in self.encodings]
+        return [np.asarray(_vector(1)) for _ in locations]
+
+
+@pytest.fixture
+def face_vector():
+    """Deterministic 128-d encoding for a seed."""
+    return _vector
+
+
+@pytest.fixture
+def gallery_rows():
+    """Gallery loader rows for users seeded by number; template=True makes extra templates of one user."""
+    def rows(*seeds, user=None, template=False):
+        return [
+            {
+                "id": f"user-{user if user is not None else seed}",
+                "face_encoding": json.dumps(_vector(seed)),
+                **({"template": True} if template else {}),
+            }
+            for seed in seeds
+        ]
+    return rows
+
+
+@pytest.fixture
+def decoded_image():
+    """Wrap RGB pixels as an already decoded, unresized image."""
+    def decoded(image) -> DecodedImage:
+        height, width = image.shape[:2]
+        return DecodedImage(pixels=image, format="JPEG", original_width=width, original_height=height, byte_size=0)
+    return decoded
+
+
+@pytest.fixture
+def fake_fr():
+    """A FakeFaceRecognition patched in as services.face_service.fr."""
+    fake = FakeFaceRecognition()
+    with patch("services.face_service.fr", fake):
+        yield fake
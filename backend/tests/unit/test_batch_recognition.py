@@ -0,0 +1,27 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from models.face_encoding import FaceExtractionResult
+from services.face_gallery import FaceGallery
+from services.face_service import FaceRecognitionService
+
+
+def test_identify_users_matches_batch_in_order(gallery_rows, face_vector):
+    service = FaceRecognitionService()
+    service.gallery = FaceGallery(lambda: [gallery_rows(1, 2, 3)])
+    extractions = {
+        b"img-3": FaceExtractionResult(success=True, encoding=face_vector(3), face_count=1),
+        b"blank": FaceExtractionResult(success=False, error="No face detected in image"),
+        b"img-1": FaceExtractionResult(success=True, encoding=face_vector(1), face_count=1),
+    }
+    service.extract_encoding = lambda image_bytes: extractions[image_bytes]
+
+    items = service.identify_users([b"img-3", b"blank", b"img-1"])
+
+    assert [item.index for item in items] == [0, 1, 2]
+    assert items[0].match.user_id == "user-3" and items[0].match.matched
+    assert items[1].match is None and items[1].error == "No face detected in image"
+    assert items[2].match.user_id == "user-1" and items[2].match.matched
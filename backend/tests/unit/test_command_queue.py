@@ -0,0 +1,38 @@
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.command_queue import CommandQueue
+
+
+def test_waiting_poller_wakes_when_a_command_is_queued():
+    async def scenario():
+        queue = CommandQueue()
+        poll = asyncio.ensure_future(queue.wait("glass", timeout=5))
+        await asyncio.sleep(0)
+        assert not poll.done()
+
+        queued = queue.enqueue("glass", {"type": "SHOW_TEXT"})
+        commands = await asyncio.wait_for(poll, timeout=1)
+        assert commands == [queued]
+
+        # Delivered but not acknowledged: still pending
+        assert queue.pending("glass") == [queued]
+        assert queue.ack("glass", queued["id"]) == 1
+        assert await queue.wait("glass", timeout=0.01) == []
+
+    asyncio.run(scenario())
+
+
+def test_ids_increase_and_full_queue_drops_oldest():
+    queue = CommandQueue(max_pending=2)
+    ids = [queue.enqueue("glass", {"n": n})["id"] for n in range(3)]
+
+    assert ids == sorted(set(ids))
+    assert [command["n"] for command in queue.pending("glass")] == [1, 2]
+    assert queue.describe()["dropped"] == 1
+    assert [command["n"] for command in queue.take("glass")] == [1, 2]
+    assert queue.pending("glass") == []
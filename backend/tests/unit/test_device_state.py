@@ -0,0 +1,78 @@
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.device_state import DeviceStateStore
+from services.storage_service import SupabaseService
+
+
+def test_heartbeats_are_flushed_in_one_bulk_upsert():
+    batches = []
+    store = DeviceStateStore(batches.append, flush_interval=3)
+
+    for battery in (90, 89, 88):
+        store.heartbeat("glass-1", battery)
+    store.heartbeat("glass-2", 50)
+
+    assert batches == []
+    assert store.get("glass-1")["battery_level"] == 88
+
+    assert store.flush() == 2
+    assert len(batches) == 1
+    rows = {row["device_id"]: row for row in batches[0]}
+    assert rows["glass-1"]["battery_level"] == 88
+    assert rows["glass-2"]["status"] == "online"
+
+    # Nothing changed since the last flush
+    assert store.flush() == 0
+    assert len(batches) == 1
+
+
+def test_failed_flush_keeps_devices_pending():
+    calls = []
+
+    def upsert(rows):
+        calls.append(rows)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+
+    store = DeviceStateStore(upsert)
+    store.heartbeat("glass-1", 70)
+
+    assert store.flush() == 0
+    assert store.describe()["pending"] == 1
+    assert store.describe()["failures"] == 1
+
+    assert store.flush() == 1
+    assert calls[1][0]["device_id"] == "glass-1"
+    assert store.describe()["pending"] == 0
+
+
+def test_upsert_falls_back_to_per_device_writes_without_unique_constraint():
+    client = MagicMock()
+    devices = client.table.return_value
+    devices.upsert.return_value.execute.side_effect = Exception(
+        "{'code': '42P10', 'message': 'there is no unique or exclusion constraint matching the ON CONFLICT specification'}"
+    )
+    # glass-1 is already registered, glass-2 is new
+    devices.select.return_value.eq.side_effect = lambda column, value: MagicMock(
+        execute=MagicMock(return_value=MagicMock(data=[{"device_id": value}] if value == "glass-1" else []))
+    )
+    service = SupabaseService.__new__(SupabaseService)
+    service.client = client
+
+    rows = [
+        {"device_id": "glass-1", "status": "online", "battery_level": 80, "last_seen": "2026-01-01T10:00:00"},
+        {"device_id": "glass-2", "status": "online", "battery_level": 60, "last_seen": "2026-01-01T10:00:00"},
+    ]
+    service.upsert_device_states(rows)
+
+    devices.update.assert_called_once_with({"status": "online", "battery_level": 80, "last_seen": "2026-01-01T10:00:00"})
+    devices.insert.assert_called_once_with(rows[1])
+
+    # The missing constraint is remembered: later flushes skip the upsert
+    service.upsert_device_states(rows[:1])
+    assert devices.upsert.call_count == 1
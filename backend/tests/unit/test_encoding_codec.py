@@ -0,0 +1,39 @@
+import sys
+import os
+import json
+
+import numpy as np
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from utils.encoding_codec import (
+    EncodingFormatError,
+    decode_face_encoding,
+    encode_face_encoding,
+    is_binary_encoding,
+)
+
+
+def test_binary_round_trip_is_compact():
+    encoding = np.random.default_rng(0).normal(size=128).tolist()
+
+    binary = encode_face_encoding(encoding)
+    legacy = encode_face_encoding(encoding, "json")
+
+    assert is_binary_encoding(binary)
+    assert not is_binary_encoding(legacy)
+    assert len(binary) * 3 < len(legacy)
+    np.testing.assert_allclose(decode_face_encoding(binary), encoding, rtol=1e-6)
+
+
+def test_decode_accepts_legacy_json():
+    encoding = [0.01 * i for i in range(128)]
+    assert decode_face_encoding(json.dumps(encoding)) == encoding
+
+
+@pytest.mark.parametrize("raw", ["v2:not-base64!", "v2:AAAA", "[1, 2, 3]", "garbage"])
+def test_decode_rejects_malformed_values(raw):
+    with pytest.raises(EncodingFormatError):
+        decode_face_encoding(raw)
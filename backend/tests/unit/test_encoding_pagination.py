@@ -0,0 +1,64 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.storage_service import SupabaseService
+
+
+class FakeUsersQuery:
+    """Minimal stand-in for a PostgREST query over a users table sorted by id."""
+
+    def __init__(self, rows, server_cap):
+        self.rows = rows
+        self.server_cap = server_cap
+        self.after = None
+        self.page_size = None
+        self.requests = 0
+
+    def select(self, *args, **kwargs):
+        return self
+
+    @property
+    def not_(self):
+        return self
+
+    def is_(self, *args):
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, n):
+        self.page_size = n
+        self.after = None
+        return self
+
+    def gt(self, column, value):
+        self.after = value
+        return self
+
+    def execute(self):
+        self.requests += 1
+        remaining = [r for r in self.rows if self.after is None or r["id"] > self.after]
+        data = remaining[:min(self.page_size, self.server_cap)]
+        return type("Response", (), {"data": data})()
+
+
+def _service(query):
+    service = SupabaseService.__new__(SupabaseService)
+    service.client = type("Client", (), {"table": lambda self, name: query})()
+    return service
+
+
+def test_keyset_pagination_returns_every_row_despite_server_cap():
+    rows = [{"id": f"{i:04d}", "face_encoding": "x"} for i in range(25)]
+    query = FakeUsersQuery(rows, server_cap=7)
+    service = _service(query)
+
+    pages = list(service.iter_users_with_encodings(page_size=10))
+
+    assert [len(p) for p in pages] == [7, 7, 7, 4]
+    assert [r["id"] for p in pages for r in p] == [r["id"] for r in rows]
+    assert len(service.get_users_with_encodings()) == 25
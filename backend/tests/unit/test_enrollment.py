@@ -0,0 +1,51 @@
+import sys
+import os
+import threading
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.face_service import FaceRecognitionService
+
+
+def test_enrollment_detects_each_image_once(decoded_image, fake_fr):
+    service = FaceRecognitionService()
+    image = np.random.default_rng(0).integers(0, 255, size=(300, 300, 3), dtype=np.uint8)
+
+    supabase = MagicMock()
+    with patch("services.face_service.ImageProcessor.decode_image", return_value=decoded_image(image)) as decode, \
+         patch.object(service, "validate_face_quality", return_value=(True, "ok")):
+        analyses = service.analyze_face_images({"front": b"front", "left": b"left"})
+        service.upload_face_images(supabase, "user-1", {"front": b"front", "left": b"left"}, analyses)
+
+    assert fake_fr.detect_calls == 2
+    assert decode.call_count == 2
+    assert supabase.upload_file.call_count == 2
+    # Uploads are the cropped faces, and each angle keeps its encoding as a template
+    uploaded = supabase.upload_file.call_args_list[0].kwargs["file_data"]
+    assert uploaded[:3] == b"\xff\xd8\xff"
+    for call in supabase.update_face_image_metadata.call_args_list:
+        assert call.kwargs["face_encoding"].startswith("v2:")
+
+
+def test_enrollment_angles_are_analyzed_in_parallel(decoded_image, fake_fr):
+    service = FaceRecognitionService()
+    image = np.random.default_rng(0).integers(0, 255, size=(300, 300, 3), dtype=np.uint8)
+    # Every angle has to be in detection at the same time to get past the barrier
+    barrier = threading.Barrier(3, timeout=5)
+    fake_fr.on_detect = lambda img: barrier.wait()
+
+    images = {"front": b"front", "left": b"left", "right": b"right"}
+    with patch("services.face_service.config.FACE_PARALLEL_WORKERS", 3), \
+         patch("services.face_service.ImageProcessor.decode_image", return_value=decoded_image(image)), \
+         patch.object(service, "validate_face_quality", side_effect=[(True, "ok"), (True, "ok"), (False, "too dark")]):
+        analyses = service.analyze_face_images(images)
+
+    assert list(analyses) == ["front", "left", "right"]
+    assert sum(a.result.success for a in analyses.values()) == 2
+    # Per-angle errors survive aggregation
+    encodings = service.encodings_from_analyses(analyses)
+    assert len(encodings) == 2
@@ -0,0 +1,73 @@
+import sys
+import os
+from unittest.mock import patch
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.face_cache import FaceResultCache
+from services.face_service import FaceRecognitionService
+
+
+def test_cache_evicts_least_recently_used_and_expired_entries():
+    now = [0.0]
+    cache = FaceResultCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    a, b, c = (cache.key(data, "hog:1") for data in (b"a", b"b", b"c"))
+    assert cache.key(b"a", "hog:1") == a and cache.key(b"a", "cnn:0") != a
+
+    cache.put(a, "result-a", (1, 2, 3, 4))
+    cache.put(b, "result-b")
+    assert cache.get(a) == ("result-a", (1, 2, 3, 4))  # a is now most recently used
+    cache.put(c, "result-c")
+    assert cache.get(b) is None
+    assert cache.get(a) is not None and cache.get(c) is not None
+
+    now[0] = 11.0
+    assert cache.get(a) is None
+    assert len(cache) == 1
+    assert cache.hits == 3 and cache.misses == 2
+
+    disabled = FaceResultCache(max_entries=0)
+    disabled.put(a, "result-a")
+    assert disabled.get(a) is None and len(disabled) == 0
+
+
+def test_repeated_image_bytes_are_served_from_result_cache(decoded_image, fake_fr):
+    service = FaceRecognitionService()
+    image = np.random.default_rng(0).integers(0, 255, size=(300, 300, 3), dtype=np.uint8)
+
+    with patch("services.face_service.ImageProcessor.decode_image", return_value=decoded_image(image)) as decode, \
+         patch.object(service, "validate_face_quality", return_value=(True, "ok")):
+        first = service.extract_encoding(b"same-bytes")
+        second = service.extract_encoding(b"same-bytes")
+        # The profile picture crop reuses the cached face location
+        cropped = service.crop_face(b"same-bytes")
+
+    assert first.success and second.success
+    assert second.encoding == first.encoding
+    assert fake_fr.detect_calls == 1
+    assert decode.call_count == 2
+    assert cropped[:3] == b"\xff\xd8\xff"
+    stats = service.result_cache.describe()
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+
+def test_cached_result_is_not_reused_under_a_stricter_quality_gate(decoded_image, fake_fr):
+    service = FaceRecognitionService()
+    image = np.random.default_rng(0).integers(0, 255, size=(300, 300, 3), dtype=np.uint8)
+
+    with patch("services.face_service.config.FACE_QUALITY_GATE_ENROLLMENT", "min_size=400"), \
+         patch("services.face_service.ImageProcessor.decode_image", return_value=decoded_image(image)), \
+         patch.object(service, "validate_face_quality", return_value=(True, "ok")):
+        recognized = service.extract_encoding(b"small-image")
+        enrolled = service.analyze_image(b"small-image", "enrollment")
+        service.crop_face(b"small-image")
+
+    assert recognized.success
+    # The 300px image passed the recognition gate but must still fail the enrollment one
+    assert not enrolled.result.success
+    assert enrolled.result.error.startswith("Quality check failed")
+    # Neither the enrollment analysis nor the profile crop reused the recognition entry
+    assert service.result_cache.describe()["hits"] == 0
@@ -0,0 +1,76 @@
+import sys
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.face_detectors import DlibDetector, FaceDetectorError, HaarDetector, parse_detector_spec
+from services.face_service import FaceRecognitionService
+from utils.config import Config
+
+
+def test_detection_runs_on_small_copy_and_encodes_full_resolution(fake_fr):
+    service = FaceRecognitionService()
+    image = np.random.default_rng(0).integers(0, 255, size=(600, 800, 3), dtype=np.uint8)
+    fake_fr.locations = [(60, 250, 210, 100)]
+
+    with patch("services.face_service.config.FACE_DETECTION_MAX_DIMENSION", 400), \
+         patch.object(service, "validate_face_quality", return_value=(True, "ok")):
+        result = service._detect_and_encode(image, fake_fr)
+
+    assert result.success
+    assert fake_fr.detect_shapes == [(300, 400, 3)]
+    # Boxes are scaled back up and encoding sees the full-resolution image
+    assert fake_fr.encode_calls == [((600, 800, 3), [(120, 500, 420, 200)])]
+    assert result.detect_ms is not None and result.encode_ms is not None
+
+
+def test_small_face_is_found_at_the_default_detection_size(fake_fr):
+    service = FaceRecognitionService()
+    image = np.random.default_rng(0).integers(0, 255, size=(1200, 1600, 3), dtype=np.uint8)
+    face = (500, 880, 580, 800)
+
+    # Like HOG, the fake only finds the 80px face when it is not shrunk below detectable size
+    def detect(img):
+        fake_fr.locations = [face] if img.shape == image.shape else []
+    fake_fr.on_detect = detect
+
+    with patch.object(service, "validate_face_quality", return_value=(True, "ok")):
+        result = service._detect_and_encode(image, fake_fr)
+        with patch("services.face_service.config.FACE_DETECTION_MAX_DIMENSION", 400):
+            capped = service._detect_and_encode(image, fake_fr)
+
+    assert result.success
+    assert fake_fr.encode_calls[0] == ((1200, 1600, 3), [face])
+    # An opt-in cap of 400 would shrink the face to 20px and lose it
+    assert not capped.success and capped.error == "No face detected in image"
+
+
+def test_detector_is_selected_per_endpoint_profile():
+    assert parse_detector_spec("hog") == ("hog", 1)
+    assert parse_detector_spec("CNN:2") == ("cnn", 2)
+    with pytest.raises(FaceDetectorError):
+        parse_detector_spec("yolo")
+    # Config validation rejects the same specs the detectors would fail on
+    for spec in ("hog:-1", "hog:x", "yolo"):
+        with patch.object(Config, "FACE_DETECTOR_MULTI", spec):
+            assert not Config._valid_detectors()
+    with patch.object(Config, "FACE_DETECTOR_MULTI", "cnn:2"):
+        assert Config._valid_detectors()
+
+    service = FaceRecognitionService()
+    with patch("services.face_service.config.FACE_DETECTOR", "hog:0"), \
+         patch("services.face_service.config.FACE_DETECTOR_MULTI", "haar"):
+        recognition = service.get_detector("recognition")
+        multi = service.get_detector("multi")
+
+    assert isinstance(recognition, DlibDetector) and recognition.upsample == 0
+    assert isinstance(multi, HaarDetector)
+    assert service.get_detector("recognition") is recognition
+    # Haar runs on CPU through OpenCV and returns (top, right, bottom, left) boxes
+    blank = np.zeros((200, 200, 3), dtype=np.uint8)
+    assert multi.detect(blank) == []
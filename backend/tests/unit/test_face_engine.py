@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import sys
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock
+
+import cv2
+import numpy as np
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from models.face_encoding import FaceExtractionResult
+from services.face_engine import FaceEngine
+from services.face_gallery import FaceGallery
+from services.face_service import FaceAnalysis, FaceRecognitionService
+from utils.image_processor import ImageProcessingError
+
+
+def _jpeg() -> bytes:
+    image = np.random.default_rng(0).integers(0, 255, size=(120, 160, 3), dtype=np.uint8)
+    ok, buffer = cv2.imencode(".jpg", image)
+    assert ok
+    return buffer.tobytes()
+
+
+def test_engine_extracts_in_worker_processes_and_drops_a_broken_pool():
+    engine = FaceEngine(1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(engine.extract(_jpeg(), "recognition"))
+
+    engine.start()
+    try:
+        assert engine.describe() == {"workers": 1, "running": True}
+
+        # The worker decodes and analyzes; the result comes back as a plain extraction result
+        result = asyncio.run(engine.extract(_jpeg(), "recognition"))
+        assert isinstance(result, FaceExtractionResult)
+        assert result.success is False and result.encoding is None
+        # Decode errors raised in the worker reach the caller unchanged
+        with pytest.raises(ImageProcessingError):
+            asyncio.run(engine.extract(b"corrupt", "recognition"))
+
+        # A dead worker breaks the pool; the engine discards it so it can be started again
+        for process in list(engine._pool._processes.values()):
+            process.kill()
+            process.join()
+        with pytest.raises(BrokenProcessPool):
+            asyncio.run(engine.extract(_jpeg(), "recognition"))
+        assert not engine.is_running
+    finally:
+        engine.stop()
+
+
+def test_identify_users_async_falls_back_to_threads_without_engine(gallery_rows, face_vector):
+    service = FaceRecognitionService()
+    service.gallery = FaceGallery(lambda: [gallery_rows(1, 2)])
+    assert service.engine is None
+
+    def decode_and_analyze(image_bytes, profile):
+        if image_bytes == b"corrupt":
+            raise ImageProcessingError("Failed to decode image")
+        return FaceAnalysis(FaceExtractionResult(success=True, encoding=face_vector(2), face_count=1))
+    service._decode_and_analyze = decode_and_analyze
+
+    items = asyncio.run(service.identify_users_async([b"img-2", b"corrupt"]))
+
+    assert items[0].match.user_id == "user-2" and items[0].match.matched
+    assert items[1].match is None and items[1].error == "Failed to decode image"
+    with pytest.raises(ImageProcessingError):
+        asyncio.run(service.identify_user_async(b"corrupt"))
+
+
+def test_broken_engine_is_restarted_once_and_failures_are_logged(caplog):
+    service = FaceRecognitionService()
+    release = threading.Event()
+
+    def start():
+        release.wait(5)
+        raise RuntimeError("worker failed to load models")
+    service.engine = MagicMock(spec=FaceEngine)
+    service.engine.start.side_effect = start
+
+    # Several requests see the broken pool at once; only one restart runs
+    with caplog.at_level(logging.ERROR, logger="services.face_service"):
+        for _ in range(3):
+            service._restart_engine_in_background()
+        release.set()
+        for _ in range(100):
+            if not service._engine_restarting:
+                break
+            time.sleep(0.01)
+
+    assert service.engine.start.call_count == 1
+    service.engine.stop.assert_called_once()
+    assert "Failed to restart face engine" in caplog.text
+    assert not service._engine_restarting
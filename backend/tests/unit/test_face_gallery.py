@@ -0,0 +1,219 @@
+import sys
+import os
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.face_gallery import FaceGallery
+from services.face_service import FaceRecognitionService
+
+
+def test_gallery_loads_once_and_matches_in_memory(gallery_rows, face_vector):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return [gallery_rows(1, 2), gallery_rows(3) + [{"id": "broken", "face_encoding": "not-json"}]]
+
+    gallery = FaceGallery(loader)
+    snapshot = gallery.snapshot()
+    gallery.snapshot()
+
+    assert len(calls) == 1
+    assert list(snapshot.ids) == ["user-1", "user-2", "user-3"]
+    assert snapshot.matrix.shape == (3, 128)
+    assert snapshot.matrix.flags["C_CONTIGUOUS"]
+
+    distances = snapshot.distances(face_vector(2))
+    expected = np.linalg.norm(snapshot.matrix - np.asarray(face_vector(2), dtype=np.float32), axis=1)
+    assert int(np.argmin(distances)) == 1
+    np.testing.assert_allclose(distances, expected, atol=1e-4)
+
+
+def test_gallery_upsert_and_remove_patch_without_reload(gallery_rows, face_vector):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return [gallery_rows(1, 2)]
+
+    gallery = FaceGallery(loader)
+    first = gallery.snapshot()
+
+    gallery.upsert("user-3", face_vector(3))
+    gallery.upsert("user-1", face_vector(9))
+    gallery.remove("user-2")
+    snapshot = gallery.snapshot()
+
+    assert len(calls) == 1
+    assert sorted(snapshot.ids) == ["user-1", "user-3"]
+    assert snapshot.version > first.version
+    row = list(snapshot.ids).index("user-1")
+    np.testing.assert_allclose(snapshot.matrix[row], np.asarray(face_vector(9), dtype=np.float32))
+
+
+def test_find_match_uses_resident_gallery(gallery_rows, face_vector):
+    service = FaceRecognitionService()
+    service.gallery = FaceGallery(lambda: [gallery_rows(1, 2, 3)])
+
+    with patch("services.face_service.get_supabase_service") as mock_get_supabase:
+        match = service.find_match(face_vector(3))
+        unknown = service.find_match((np.asarray(face_vector(3)) + 1.0).tolist())
+
+    mock_get_supabase.assert_not_called()
+    assert match.matched is True
+    assert match.user_id == "user-3"
+    assert match.distance < 1e-3
+    assert unknown.matched is False
+
+
+def test_gallery_delta_sync_patches_changed_rows_and_tombstones(gallery_rows, face_vector):
+    full_loads = []
+    deltas = []
+
+    def loader():
+        full_loads.append(1)
+        rows = gallery_rows(1, 2)
+        for row in rows:
+            row["updated_at"] = "2026-01-01T10:00:00+00:00"
+        return [rows]
+
+    def delta_loader(since):
+        deltas.append(since)
+        return [
+            {"id": "user-2", "face_encoding": None, "updated_at": "2026-01-01T10:05:00+00:00"},
+            {"id": "user-4", "face_encoding": json.dumps(face_vector(4)), "updated_at": "2026-01-01T10:06:00+00:00"},
+        ]
+
+    gallery = FaceGallery(loader, refresh_seconds=30, delta_loader=delta_loader, full_resync_seconds=3600)
+    gallery.snapshot()
+    gallery.sync()
+    snapshot = gallery.snapshot()
+
+    assert len(full_loads) == 1
+    assert len(deltas) == 1
+    # The delta query re-reads a small overlap before the watermark
+    assert deltas[0].startswith("2026-01-01T09:59:55")
+    assert sorted(snapshot.ids) == ["user-1", "user-4"]
+    assert gallery.watermark.isoformat() == "2026-01-01T10:06:00+00:00"
+
+    # Replaying the same delta must not rebuild the matrix
+    version = snapshot.version
+    gallery.sync()
+    assert gallery.snapshot().version == version
+
+
+def test_failed_refresh_keeps_serving_loaded_gallery(gallery_rows):
+    deltas = []
+
+    def delta_loader(since):
+        deltas.append(since)
+        raise RuntimeError("supabase down")
+
+    gallery = FaceGallery(lambda: [gallery_rows(1, 2)], refresh_seconds=0.05, delta_loader=delta_loader)
+    loaded = gallery.snapshot()
+    time.sleep(0.06)
+
+    # The due sync runs in the background; the caller gets the loaded gallery at once
+    assert gallery.snapshot() is loaded
+    for _ in range(100):
+        if not gallery._refreshing:
+            break
+        time.sleep(0.01)
+    assert len(deltas) == 1
+
+    # The failure backs off instead of retrying on every request
+    assert gallery.snapshot() is loaded
+    assert not gallery._refreshing
+    assert len(deltas) == 1
+
+
+def test_upsert_does_not_wait_for_background_delta_query(gallery_rows, face_vector):
+    started = threading.Event()
+    release = threading.Event()
+
+    def delta_loader(since):
+        started.set()
+        release.wait(5)
+        return [{"id": "user-4", "face_encoding": json.dumps(face_vector(4)), "updated_at": "2026-01-01T10:06:00+00:00"}]
+
+    gallery = FaceGallery(lambda: [gallery_rows(1, 2)], refresh_seconds=0.05, delta_loader=delta_loader)
+    gallery.snapshot()
+    time.sleep(0.06)
+    gallery.snapshot()
+    assert started.wait(5)
+
+    # The delta query is still in flight; writers patch the gallery without waiting for it
+    writer = threading.Thread(target=gallery.upsert, args=("user-3", face_vector(3)))
+    writer.start()
+    writer.join(1)
+    assert not writer.is_alive()
+    assert "user-3" in gallery.snapshot().ids
+
+    release.set()
+    for _ in range(100):
+        if not gallery._refreshing:
+            break
+        time.sleep(0.01)
+    assert sorted(set(gallery.snapshot().ids)) == ["user-1", "user-2", "user-3", "user-4"]
+
+
+def test_multi_template_gallery_matches_on_closest_template(gallery_rows, face_vector):
+    # user-1 has an off-angle template (seed 11); user-2's templates belong to no primary row
+    gallery = FaceGallery(lambda: [
+        gallery_rows(1, 2, 3),
+        gallery_rows(11, 12, user=1, template=True) + gallery_rows(70, user=7, template=True),
+    ])
+    snapshot = gallery.snapshot()
+
+    assert len(snapshot) == 5
+    assert snapshot.user_count == 3
+    assert list(snapshot.ids[:3]) == ["user-1"] * 3
+    assert list(snapshot.user_ids) == ["user-1", "user-2", "user-3"]
+
+    per_user = snapshot.user_distances(snapshot.distances(face_vector(11)))
+    assert per_user.shape == (3,)
+    assert int(np.argmin(per_user)) == 0 and per_user[0] < 1e-3
+
+    service = FaceRecognitionService()
+    service.gallery = gallery
+    result = service.find_top_k(face_vector(11), k=3)
+    assert [c.user_id for c in result.candidates] == ["user-1"] + [
+        c.user_id for c in result.candidates[1:]
+    ]
+    assert len({c.user_id for c in result.candidates}) == 3
+
+    matches = service.find_matches([face_vector(12), face_vector(3)])
+    assert [m.user_id for m in matches] == ["user-1", "user-3"]
+    assert all(m.matched for m in matches)
+
+    # Replacing a user's templates drops the old ones
+    gallery.upsert("user-1", [face_vector(1)])
+    assert gallery.snapshot().user_count == 3 and len(gallery.snapshot()) == 3
+
+
+def test_delta_sync_replaces_user_templates(gallery_rows, face_vector):
+    def loader():
+        return [gallery_rows(1, 2), gallery_rows(11, user=1, template=True)]
+
+    def delta_loader(since):
+        return [
+            {"id": "user-2", "face_encoding": json.dumps(face_vector(2)), "updated_at": "2026-01-01T10:05:00+00:00"},
+            *gallery_rows(21, 22, user=2, template=True),
+        ]
+
+    gallery = FaceGallery(loader, refresh_seconds=30, delta_loader=delta_loader)
+    gallery.snapshot()
+    gallery.sync()
+    snapshot = gallery.snapshot()
+
+    assert list(snapshot.ids) == ["user-1", "user-1", "user-2", "user-2", "user-2"]
+    version = snapshot.version
+    gallery.sync()
+    assert gallery.snapshot().version == version
@@ -0,0 +1,84 @@
+import sys
+import os
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.face_gallery import GallerySnapshot
+from services.face_index import BruteForceIndex, GalleryIndex, IVFIndex
+
+
+def _snapshot(n: int, version: int = 1, seed: int = 0) -> GallerySnapshot:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(50, 128)).astype(np.float32) * 0.1
+    matrix = centers[rng.integers(0, 50, n)] + rng.normal(size=(n, 128)).astype(np.float32) * 0.03
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    ids = np.array([f"user-{i}" for i in range(n)], dtype=object)
+    return GallerySnapshot(ids, matrix, np.einsum('ij,ij->i', matrix, matrix), version)
+
+
+def test_ivf_matches_brute_force_nearest_neighbours():
+    snapshot = _snapshot(3000)
+    ivf = IVFIndex(nlist=30, nprobe=4, projection_dim=16, rerank=8)
+    ivf.build(snapshot)
+    brute = BruteForceIndex()
+
+    rng = np.random.default_rng(1)
+    for row in rng.integers(0, len(snapshot), 25):
+        query = snapshot.matrix[row] + rng.normal(size=128).astype(np.float32) * 0.01
+        ivf_rows, ivf_dist = ivf.search(snapshot, query, k=3)
+        brute_rows, brute_dist = brute.search(snapshot, query, k=3)
+        assert ivf_rows[0] == brute_rows[0]
+        np.testing.assert_allclose(ivf_dist, brute_dist, atol=1e-5)
+
+
+def test_gallery_index_switches_to_ivf_and_rebuilds_on_change():
+    index = GalleryIndex(
+        index_type="auto",
+        ivf_min_size=1000,
+        ivf_params={"nlist": 10, "nprobe": 3},
+        background_rebuild=False
+    )
+
+    small = _snapshot(200)
+    rows, _ = index.search(small, small.matrix[5], k=1)
+    assert rows[0] == 5
+    assert index.describe()["ivf_built"] is False
+
+    large = _snapshot(2000, version=2)
+    rows, distances = index.search(large, large.matrix[42], k=1)
+    assert rows[0] == 42 and distances[0] < 1e-3
+    assert index.describe()["ivf_lists"] == 10
+
+    # A new gallery version reuses the trained centroids and only reassigns rows
+    centroids = index._ivf.centroids
+    changed = _snapshot(2100, version=3)
+    index.search(changed, changed.matrix[7], k=1)
+    assert index._ivf.version == 3
+    assert index._ivf.centroids is centroids
+
+
+def test_indexes_return_distinct_users_for_multi_template_gallery():
+    base = _snapshot(3000)
+    # Three templates per user: rows 3i..3i+2 belong to user-i
+    ids = np.array([f"user-{i // 3}" for i in range(len(base))], dtype=object)
+    starts = np.arange(0, len(base), 3, dtype=np.int64)
+    snapshot = GallerySnapshot(ids, base.matrix, base.sq_norms, 1, ids[starts], starts)
+
+    ivf = IVFIndex(nlist=30, nprobe=30, projection_dim=16, rerank=8)
+    ivf.build(snapshot)
+    brute = BruteForceIndex()
+
+    query = snapshot.matrix[301]
+    for index in (brute, ivf):
+        rows, distances = index.search(snapshot, query, k=5)
+        owners = [snapshot.ids[row] for row in rows]
+        assert owners[0] == "user-100" and rows[0] == 301
+        assert len(set(owners)) == 5
+        assert list(distances) == sorted(distances)
+
+    brute_rows, brute_dist = brute.search(snapshot, query, k=5)
+    ivf_rows, ivf_dist = ivf.search(snapshot, query, k=5)
+    np.testing.assert_allclose(ivf_dist, brute_dist, atol=1e-3)
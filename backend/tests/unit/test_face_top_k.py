@@ -0,0 +1,30 @@
+import sys
+import os
+
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.face_gallery import FaceGallery
+from services.face_service import FaceRecognitionService
+
+
+def test_find_top_k_returns_ranked_candidates_and_margin(gallery_rows, face_vector):
+    service = FaceRecognitionService()
+    service.gallery = FaceGallery(lambda: [gallery_rows(1, 2, 3, 4)])
+
+    result = service.find_top_k(face_vector(2), k=3)
+
+    assert result.matched is True
+    assert [c.user_id for c in result.candidates][0] == "user-2"
+    assert len(result.candidates) == 3
+    distances = [c.distance for c in result.candidates]
+    assert distances == sorted(distances)
+    assert result.margin == pytest.approx(distances[1] - distances[0])
+    assert result.best_match().user_id == "user-2"
+
+    # k=1 still reports the margin to the runner-up
+    single = service.find_top_k(face_vector(2), k=1)
+    assert len(single.candidates) == 1
+    assert single.margin == pytest.approx(result.margin)
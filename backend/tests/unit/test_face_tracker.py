@@ -0,0 +1,89 @@
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from models.face_encoding import DetectedFace, FaceBox, FaceMatch
+from services.face_tracker import FaceTracker, box_iou
+from utils.image_processor import DecodedImage, QualityGate
+
+
+class FakeFaceService:
+    def __init__(self):
+        self.face_box = None
+        self.detect_calls = 0
+        self.recognized = []
+
+    def get_quality_gate(self, profile):
+        return QualityGate()
+
+    def locate_faces(self, image, profile=None):
+        self.detect_calls += 1
+        return [self.face_box]
+
+    def identify_located_faces(self, image, locations):
+        self.recognized.extend(locations)
+        return [
+            DetectedFace(box=FaceBox(top=t, right=r, bottom=b, left=l),
+                         match=FaceMatch(matched=True, user_id="user-1", confidence=0.8))
+            for t, r, b, l in locations
+        ]
+
+
+def _frame(face, top: int, left: int) -> DecodedImage:
+    rng = np.random.default_rng(1)
+    pixels = cv2.resize(rng.integers(0, 255, size=(24, 32, 3), dtype=np.uint8), (640, 480))
+    pixels[top:top + face.shape[0], left:left + face.shape[1]] = face
+    return DecodedImage(pixels, "JPEG", 640, 480, 0)
+
+
+def test_tracker_follows_face_and_recognizes_once_per_track():
+    service = FakeFaceService()
+    tracker = FaceTracker(service, redetect_interval=10, min_confidence=0.5)
+    face = cv2.resize(np.random.default_rng(0).integers(0, 255, size=(30, 30, 3), dtype=np.uint8), (120, 120))
+
+    for i in range(20):
+        top, left = 100 + 3 * i, 150 + 4 * i
+        service.face_box = (top, left + 120, top + 120, left)
+        tracks = tracker.process("glass-1", _frame(face, top, left))
+        assert len(tracks) == 1 and tracks[0].track_id == 1
+        assert box_iou(tracks[0].box, service.face_box) > 0.8
+
+    # Detection on frames 1 and 11 only; the identity was recognized once
+    assert service.detect_calls == 2
+    assert len(service.recognized) == 1
+    assert tracks[0].match.user_id == "user-1"
+    assert tracker.primary_track("glass-1").track_id == 1
+
+    # A jump beyond the search window loses the track and forces a detection right away
+    service.face_box = (300, 620, 420, 500)
+    tracks = tracker.process("glass-1", _frame(face, 300, 500))
+    assert service.detect_calls == 3
+    assert [track.track_id for track in tracks] == [2]
+
+    stats = tracker.describe()
+    assert stats["frames"] == 21 and stats["detections"] == 3 and stats["recognitions"] == 2
+
+
+def test_idle_devices_are_removed_not_just_hidden():
+    service = FakeFaceService()
+    now = [0.0]
+    tracker = FaceTracker(service, max_idle_seconds=5, clock=lambda: now[0])
+    face = cv2.resize(np.random.default_rng(0).integers(0, 255, size=(30, 30, 3), dtype=np.uint8), (120, 120))
+    service.face_box = (100, 270, 220, 150)
+
+    for i in range(50):
+        tracker.process(f"glass-{i}", _frame(face, 100, 150))
+    assert tracker.describe()["devices"] == 50
+
+    now[0] = 6.0
+    tracker.process("glass-new", _frame(face, 100, 150))
+    assert tracker.describe()["devices"] == 1
+    assert tracker.tracks("glass-0") is None
+
+    tracker.reset("glass-new")
+    assert tracker.describe()["devices"] == 0
@@ -0,0 +1,53 @@
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.frame_broadcast import FrameBroadcaster
+from services.frame_store import FrameStore
+
+
+async def _next_frame(stream) -> bytes:
+    header = await stream.__anext__()
+    data = await stream.__anext__()
+    assert await stream.__anext__() == b"\r\n"
+    assert header.endswith(f"Content-Length: {len(data)}\r\n\r\n".encode())
+    return data
+
+
+def test_viewers_share_frames_and_slow_viewers_skip_to_newest():
+    async def scenario():
+        store = FrameStore(ttl_seconds=0)
+        broadcaster = FrameBroadcaster(store.latest, idle_timeout=1.0)
+
+        def publish(data):
+            store.put("glass", data)
+            broadcaster.publish("glass")
+
+        publish(b"frame-1")
+        fast = broadcaster.stream("glass")
+        slow = broadcaster.stream("glass")
+        assert await _next_frame(fast) == b"frame-1"
+        assert await _next_frame(slow) == b"frame-1"
+        assert broadcaster.describe()["viewers"] == 2
+
+        # The fast viewer is waiting when the next frame arrives
+        waiting = asyncio.ensure_future(_next_frame(fast))
+        await asyncio.sleep(0)
+        publish(b"frame-2")
+        assert await waiting == b"frame-2"
+
+        # The slow viewer was not reading: it gets the newest frame, not a backlog
+        publish(b"frame-3")
+        second = await _next_frame(slow)
+        assert second == b"frame-3"
+        # Same bytes object as stored: no per-viewer copies
+        assert second is store.latest("glass").data
+
+        await fast.aclose()
+        await slow.aclose()
+        assert broadcaster.describe()["viewers"] == 0
+
+    asyncio.run(scenario())
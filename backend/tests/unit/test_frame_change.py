@@ -0,0 +1,62 @@
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.frame_change import FrameChangeDetector
+from utils.image_processor import ImageProcessor
+
+
+def _jpeg(pixels, quality: int = 90) -> bytes:
+    return cv2.imencode(".jpg", pixels, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def test_static_frames_reuse_result_until_scene_changes():
+    rng = np.random.default_rng(0)
+    scene = cv2.resize(rng.integers(0, 255, size=(12, 16, 3), dtype=np.uint8), (640, 480))
+    other = cv2.resize(rng.integers(0, 255, size=(12, 16, 3), dtype=np.uint8), (640, 480))
+
+    first = ImageProcessor.difference_hash(_jpeg(scene))
+    # Sensor noise and recompression barely move the hash; a new scene moves it a lot
+    noisy = np.clip(scene.astype(int) + rng.integers(-4, 5, size=scene.shape), 0, 255).astype(np.uint8)
+    assert ImageProcessor.hamming_distance(first, ImageProcessor.difference_hash(_jpeg(noisy, 70))) <= 6
+    changed = ImageProcessor.difference_hash(_jpeg(other))
+    assert ImageProcessor.hamming_distance(first, changed) > 6
+
+    now = [0.0]
+    detector = FrameChangeDetector(threshold=6, max_reuse_seconds=10, clock=lambda: now[0])
+    assert detector.lookup("glass-1", first, "viewer") is None
+    detector.record("glass-1", first, {"match": False}, "viewer")
+
+    assert detector.lookup("glass-1", first, "viewer") == {"match": False}
+    assert detector.lookup("glass-1", changed, "viewer") is None
+    # Responses carry role-filtered profiles, so another viewer never gets a reused one
+    assert detector.lookup("glass-1", first, "someone-else") is None
+    now[0] = 11.0
+    assert detector.lookup("glass-1", first, "viewer") is None
+
+    stats = detector.describe()
+    assert stats["analysed"] == 1 and stats["skipped"] == 1
+    assert stats["skip_ratio"] == 0.5
+
+
+def test_devices_are_forgotten_once_their_result_cannot_be_reused():
+    now = [0.0]
+    detector = FrameChangeDetector(threshold=6, max_reuse_seconds=10, clock=lambda: now[0])
+
+    # Device ids are client-chosen; results of devices that went quiet must not pile up
+    for i in range(100):
+        detector.record(f"glass-{i}", i, {"match": True, "profile": "..."}, "viewer")
+    assert detector.describe()["devices"] == 100
+
+    now[0] = 11.0
+    detector.record("glass-new", 1, {"match": False}, "viewer")
+    assert detector.describe()["devices"] == 1
+    assert detector.describe("glass-0")["analysed"] == 0
+
+    detector.forget("glass-new")
+    assert detector.describe()["devices"] == 0
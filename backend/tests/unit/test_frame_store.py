@@ -0,0 +1,67 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.frame_store import FrameStore
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_budget_evicts_least_recently_active_devices():
+    clock = _Clock()
+    store = FrameStore(max_bytes=1000, max_frame_bytes=400, ttl_seconds=0, ring_size=2, clock=clock)
+
+    for device in ("a", "b", "c"):
+        store.put(device, b"x" * 300)
+    store.put("a", b"y" * 300)  # 'a' is now the most recently active device
+    store.put("d", b"z" * 300)
+
+    assert store.total_bytes <= 1000
+    assert store.latest("b") is None
+    assert store.latest("a").data == b"y" * 300
+    assert store.latest("d") is not None
+    assert store.describe()["evicted"] >= 1
+
+    # Oversized frames are rejected outright
+    assert store.put("a", b"x" * 401) is None
+    assert store.latest("a").data == b"y" * 300
+
+
+def test_ring_keeps_recent_frames_and_expires_stale_devices():
+    clock = _Clock()
+    store = FrameStore(max_bytes=10_000, max_frame_bytes=100, ttl_seconds=30, ring_size=3, clock=clock)
+
+    for i in range(5):
+        store.put("glass", bytes([i]) * 10)
+    assert [frame.data[0] for frame in store.recent("glass")] == [4, 3, 2]
+
+    clock.now = 31.0
+    assert store.latest("glass") is None
+    assert store.total_bytes == 0
+
+
+def test_eviction_listeners_hear_about_devices_that_lost_their_frames():
+    clock = _Clock()
+    store = FrameStore(max_bytes=600, max_frame_bytes=400, ttl_seconds=30, ring_size=1, clock=clock)
+    dropped = []
+    store.add_eviction_listener(dropped.append)
+
+    store.put("a", b"x" * 300)
+    store.put("b", b"x" * 300)
+    store.put("c", b"x" * 300)  # over budget: 'a' is evicted
+    assert dropped == ["a"]
+
+    clock.now = 31.0
+    store.put("b", b"y" * 300)  # 'c' expired; 'b' is active again and is not reported
+    assert dropped == ["a", "c"]
+
+    store.discard("b")
+    assert dropped == ["a", "c", "b"]
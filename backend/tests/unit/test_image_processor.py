@@ -0,0 +1,96 @@
+import sys
+import os
+import io
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from utils.image_processor import DecodedImage, ImageProcessingError, ImageProcessor, QualityGate
+
+
+def _encode(width: int, height: int, fmt: str = "JPEG") -> bytes:
+    # Smooth content keeps large test images well under the upload size limit
+    noise = np.random.default_rng(0).integers(0, 255, size=(30, 40, 3), dtype=np.uint8)
+    pixels = cv2.resize(noise, (width, height))
+    output = io.BytesIO()
+    Image.fromarray(pixels).save(output, format=fmt)
+    return output.getvalue()
+
+
+def test_decode_image_decodes_once_and_keeps_original_size():
+    image_bytes = _encode(1600, 1200)
+
+    with patch("utils.image_processor.cv2.imdecode", wraps=cv2.imdecode) as imdecode:
+        decoded = ImageProcessor.decode_image(image_bytes)
+        # Passing the decoded image on must not decode again
+        assert ImageProcessor.decode_image(decoded) is decoded
+        assert ImageProcessor.preprocess_image(decoded) is decoded.pixels
+
+    assert imdecode.call_count == 1
+    assert isinstance(decoded, DecodedImage)
+    assert decoded.format == "JPEG"
+    assert (decoded.original_width, decoded.original_height) == (1600, 1200)
+    assert (decoded.width, decoded.height) == (800, 600)
+    assert decoded.byte_size == len(image_bytes)
+
+
+def test_format_check_uses_file_signature():
+    assert ImageProcessor.sniff_image_format(_encode(10, 10, "PNG")) == "PNG"
+    assert ImageProcessor.sniff_image_format(_encode(10, 10, "WEBP")) == "WEBP"
+
+    with pytest.raises(ImageProcessingError, match="Invalid image format"):
+        ImageProcessor.decode_image(_encode(10, 10, "GIF"))
+    with pytest.raises(ImageProcessingError):
+        ImageProcessor.decode_image(b"\xff\xd8\xff" + b"\x00" * 64)
+
+
+def test_large_jpeg_is_decoded_at_reduced_scale():
+    assert ImageProcessor.reduced_decode_factor(4000, 3000, 800) == 4
+    assert ImageProcessor.reduced_decode_factor(6400, 4800, 800) == 8
+    assert ImageProcessor.reduced_decode_factor(1000, 700, 800) == 1
+
+    image_bytes = _encode(4000, 3000)
+    with patch("utils.image_processor.cv2.imdecode", wraps=cv2.imdecode) as imdecode:
+        decoded = ImageProcessor.decode_image(image_bytes)
+
+    assert imdecode.call_args[0][1] == cv2.IMREAD_REDUCED_COLOR_4
+    assert (decoded.original_width, decoded.original_height) == (4000, 3000)
+    assert (decoded.width, decoded.height) == (800, 600)
+
+    # PNG has no scaled decode, so it is decoded in full and resized as before
+    with patch("utils.image_processor.cv2.imdecode", wraps=cv2.imdecode) as imdecode:
+        decoded = ImageProcessor.decode_image(_encode(1700, 900, "PNG"))
+    assert imdecode.call_args[0][1] == cv2.IMREAD_COLOR
+    assert decoded.width == 800
+
+
+def test_frame_quality_gate_rejects_unusable_frames():
+    gate = QualityGate.from_spec("min_size=120,blur=15,min_brightness=30,max_brightness=230")
+    sharp = np.random.default_rng(0).integers(40, 220, size=(600, 800, 3), dtype=np.uint8)
+
+    def frame(pixels, width=800, height=600):
+        return DecodedImage(pixels, "JPEG", width, height, 0)
+
+    assert ImageProcessor.check_frame_quality(frame(sharp), gate)[0] is True
+
+    blurred = cv2.GaussianBlur(sharp, (0, 0), 12)
+    usable, reason = ImageProcessor.check_frame_quality(frame(blurred), gate)
+    assert usable is False and "blurry" in reason
+    assert ImageProcessor.check_frame_quality(frame(sharp // 8), gate) == (
+        False, "Image too dark (brightness 16). Please improve lighting."
+    )
+    assert "resolution" in ImageProcessor.check_frame_quality(frame(sharp[:100, :100], 100, 100), gate)[1]
+
+    # Per-endpoint settings override only the keys they name
+    relaxed = QualityGate.from_spec("blur=0", base=gate)
+    assert relaxed.blur_threshold == 0 and relaxed.min_dimension == 120
+    assert ImageProcessor.check_frame_quality(frame(blurred), relaxed)[0] is True
+    assert QualityGate.from_spec("off", base=gate).enabled is False
+    with pytest.raises(ValueError):
+        QualityGate.from_spec("sharpness=3")
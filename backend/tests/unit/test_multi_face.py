@@ -0,0 +1,32 @@
+import sys
+import os
+from unittest.mock import patch
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.face_gallery import FaceGallery
+from services.face_service import FaceRecognitionService
+
+
+def test_identify_faces_encodes_and_matches_all_faces_at_once(gallery_rows, face_vector, decoded_image, fake_fr):
+    service = FaceRecognitionService()
+    service.gallery = FaceGallery(lambda: [gallery_rows(1, 2)])
+    image = np.random.default_rng(0).integers(0, 255, size=(400, 600, 3), dtype=np.uint8)
+    # Two usable faces and one too small for the quality check
+    fake_fr.locations = [(10, 110, 110, 10), (50, 400, 150, 300), (0, 530, 20, 510)]
+    fake_fr.encodings = [face_vector(2), face_vector(9)]
+
+    with patch("services.face_service.config.FACE_DETECTION_MAX_DIMENSION", 0), \
+         patch("services.face_service.ImageProcessor.decode_image", return_value=decoded_image(image)):
+        result = service.identify_faces(b"frame")
+
+    assert result.face_count == 3
+    assert len(fake_fr.encode_calls) == 1
+    first, second, small = result.faces
+    assert first.match.matched and first.match.user_id == "user-2"
+    assert second.match is not None and not second.match.matched
+    assert small.match is None and "too small" in small.error
+    assert (first.box.top, first.box.left) == (10, 10)
@@ -0,0 +1,40 @@
+import sys
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.face_service import FaceRecognitionError, FaceRecognitionService
+
+
+def test_quality_gate_rejects_glass_frame_before_detection(decoded_image, fake_fr):
+    service = FaceRecognitionService()
+    blurred = np.full((300, 300, 3), 128, dtype=np.uint8)
+
+    def fail(img):
+        raise AssertionError("detection must not run on a rejected frame")
+    fake_fr.on_detect = fail
+
+    with patch("services.face_service.ImageProcessor.decode_image", return_value=decoded_image(blurred)), \
+         pytest.raises(FaceRecognitionError, match="Quality check failed: Image too blurry"):
+        service.identify_faces(b"blurred-frame")
+
+    assert fake_fr.detect_calls == 0
+
+
+def test_single_image_login_is_not_gated_by_default(decoded_image, fake_fr):
+    service = FaceRecognitionService()
+    blurred = np.full((300, 300, 3), 128, dtype=np.uint8)
+
+    with patch("services.face_service.ImageProcessor.decode_image", return_value=decoded_image(blurred)), \
+         patch.object(service, "validate_face_quality", return_value=(True, "ok")):
+        result = service.extract_encoding(b"blurred-upload")
+
+    # The same frame reaches detection on the login/recognition path, as before the gate existed
+    assert result.success
+    assert fake_fr.detect_calls == 1
+    assert not service.get_quality_gate("enrollment").enabled
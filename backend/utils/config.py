@@ -22,6 +22,91 @@ class Config:
     # Face Recognition Configuration
     FACE_RECOGNITION_TOLERANCE: float = float(os.getenv("FACE_RECOGNITION_TOLERANCE", "0.6"))
     MAX_IMAGE_SIZE_MB: int = int(os.getenv("MAX_IMAGE_SIZE_MB", "5"))
+    # Decode large JPEGs directly at 1/2, 1/4 or 1/8 scale instead of decoding full size and shrinking
+    IMAGE_REDUCED_DECODE: bool = os.getenv("IMAGE_REDUCED_DECODE", "True").lower() in ("true", "1", "yes")
+    # Run face detection on a copy no larger than this (pixels, longest side); encoding and
+    # quality checks still use the full image. 0 (default) detects on the full processing
+    # image. A cap shrinks faces with it: keep it high enough that the smallest expected
+    # face stays above ~40px, which HOG at 1x upsampling finds reliably.
+    FACE_DETECTION_MAX_DIMENSION: int = int(os.getenv("FACE_DETECTION_MAX_DIMENSION", "0"))
+    # Face detector as 'model[:upsample]': 'hog' (dlib, CPU), 'cnn' (dlib, GPU) or 'haar' (OpenCV, CPU).
+    # Each upsample doubles the image before detection (smaller faces, ~4x cost); 'hog:1' is the
+    # face_recognition default. Per-endpoint overrides fall back to FACE_DETECTOR when empty.
+    FACE_DETECTOR: str = os.getenv("FACE_DETECTOR", "hog:1")
+    FACE_DETECTOR_RECOGNITION: str = os.getenv("FACE_DETECTOR_RECOGNITION", "")
+    FACE_DETECTOR_ENROLLMENT: str = os.getenv("FACE_DETECTOR_ENROLLMENT", "")
+    FACE_DETECTOR_MULTI: str = os.getenv("FACE_DETECTOR_MULTI", "")
+    # Frame quality gate run on a small grayscale thumbnail before any face detection, as
+    # 'key=value,...' with keys min_size (shorter side of the original, px), blur (Laplacian
+    # variance of the 160px thumbnail), min_brightness and max_brightness (mean gray, 0-255).
+    # A 0 value or 'off' disables checks. Per-endpoint settings are applied on top. By default
+    # only streamed glass frames (multi) are gated; single-image login and enrollment are not.
+    FACE_QUALITY_GATE: str = os.getenv("FACE_QUALITY_GATE", "")
+    FACE_QUALITY_GATE_RECOGNITION: str = os.getenv("FACE_QUALITY_GATE_RECOGNITION", "")
+    FACE_QUALITY_GATE_ENROLLMENT: str = os.getenv("FACE_QUALITY_GATE_ENROLLMENT", "")
+    FACE_QUALITY_GATE_MULTI: str = os.getenv("FACE_QUALITY_GATE_MULTI", "min_size=120,blur=15,min_brightness=30,max_brightness=230")
+    # Landmark model used for encoding: 'small' (5-point, faster) or 'large' (68-point)
+    FACE_LANDMARK_MODEL: str = os.getenv("FACE_LANDMARK_MODEL", "small").lower()
+    # Worker threads for parallel image decode/encode (batch recognition)
+    FACE_PARALLEL_WORKERS: int = int(os.getenv("FACE_PARALLEL_WORKERS", str(min(8, os.cpu_count() or 1))))
+    # Worker processes for face extraction; dlib holds the GIL, so processes are what use
+    # multiple cores. Each worker loads the dlib models (~100 MB). 0 runs extraction on threads.
+    FACE_PROCESS_WORKERS: int = int(os.getenv("FACE_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+    # Cache of extraction results keyed by a hash of the image bytes, so repeated uploads
+    # skip decode and dlib. Entries are LRU-evicted beyond FACE_CACHE_SIZE (0 disables the
+    # cache) and expire after FACE_CACHE_TTL_SECONDS (0 = never).
+    FACE_CACHE_SIZE: int = int(os.getenv("FACE_CACHE_SIZE", "256"))
+    FACE_CACHE_TTL_SECONDS: float = float(os.getenv("FACE_CACHE_TTL_SECONDS", "300"))
+    # Maximum number of images accepted by /api/recognize/batch
+    RECOGNITION_BATCH_MAX_IMAGES: int = int(os.getenv("RECOGNITION_BATCH_MAX_IMAGES", "16"))
+    # Seconds between incremental (watermark) syncs of the in-memory face gallery (0 = never)
+    FACE_GALLERY_REFRESH_SECONDS: float = float(os.getenv("FACE_GALLERY_REFRESH_SECONDS", "10"))
+    # Seconds between full gallery reloads, which also drop hard-deleted users (0 = never)
+    FACE_GALLERY_FULL_RESYNC_SECONDS: float = float(os.getenv("FACE_GALLERY_FULL_RESYNC_SECONDS", "3600"))
+    # Rows fetched per request when streaming encodings into the gallery
+    FACE_GALLERY_PAGE_SIZE: int = int(os.getenv("FACE_GALLERY_PAGE_SIZE", "1000"))
+    # Keep each enrolled angle's encoding (face_images.face_encoding) as an extra matching template
+    FACE_GALLERY_ANGLE_TEMPLATES: bool = os.getenv("FACE_GALLERY_ANGLE_TEMPLATES", "True").lower() in ("true", "1", "yes")
+    # Gallery search index: 'auto' (brute force below FACE_INDEX_IVF_MIN_SIZE, IVF above), 'brute' or 'ivf'
+    FACE_INDEX_TYPE: str = os.getenv("FACE_INDEX_TYPE", "auto").lower()
+    FACE_INDEX_IVF_MIN_SIZE: int = int(os.getenv("FACE_INDEX_IVF_MIN_SIZE", "20000"))
+    # IVF build/search parameters (FACE_INDEX_NLIST=0 uses sqrt(gallery size) lists)
+    FACE_INDEX_NLIST: int = int(os.getenv("FACE_INDEX_NLIST", "0"))
+    FACE_INDEX_NPROBE: int = int(os.getenv("FACE_INDEX_NPROBE", "8"))
+    FACE_INDEX_PROJECTION_DIM: int = int(os.getenv("FACE_INDEX_PROJECTION_DIM", "32"))
+    FACE_INDEX_RERANK: int = int(os.getenv("FACE_INDEX_RERANK", "32"))
+    # Rebuild trigger: the index is rebuilt on every gallery change, but k-means is only
+    # retrained once the gallery has grown by this factor since the last training
+    FACE_INDEX_RETRAIN_GROWTH: float = float(os.getenv("FACE_INDEX_RETRAIN_GROWTH", "2.0"))
+    FACE_INDEX_BACKGROUND_REBUILD: bool = os.getenv("FACE_INDEX_BACKGROUND_REBUILD", "True").lower() in ("true", "1", "yes")
+    # Storage format for users.face_encoding: 'binary' (base64 float32, tagged 'v2:') or legacy 'json'
+    FACE_ENCODING_STORAGE_FORMAT: str = os.getenv("FACE_ENCODING_STORAGE_FORMAT", "binary").lower()
+    
+    # Smart glass frame-change detection: a frame whose perceptual hash is within this many
+    # bits (of 64) of the last analysed frame reuses its recognition result (-1 disables reuse)
+    GLASS_FRAME_CHANGE_THRESHOLD: int = int(os.getenv("GLASS_FRAME_CHANGE_THRESHOLD", "6"))
+    # Re-run recognition at least this often on an unchanged scene (seconds)
+    GLASS_FRAME_REUSE_MAX_SECONDS: float = float(os.getenv("GLASS_FRAME_REUSE_MAX_SECONDS", "10"))
+    # Face tracking while a device is scanning: detect every N frames and follow the faces in
+    # between; a track whose correlation drops below the minimum confidence forces re-detection.
+    # Tracks are dropped after GLASS_TRACK_IDLE_SECONDS without frames.
+    GLASS_TRACK_REDETECT_FRAMES: int = int(os.getenv("GLASS_TRACK_REDETECT_FRAMES", "10"))
+    GLASS_TRACK_MIN_CONFIDENCE: float = float(os.getenv("GLASS_TRACK_MIN_CONFIDENCE", "0.5"))
+    GLASS_TRACK_IDLE_SECONDS: float = float(os.getenv("GLASS_TRACK_IDLE_SECONDS", "5"))
+    # Device heartbeats are kept in memory and written to the devices table in one bulk
+    # upsert every GLASS_HEARTBEAT_FLUSH_SECONDS
+    GLASS_HEARTBEAT_FLUSH_SECONDS: float = float(os.getenv("GLASS_HEARTBEAT_FLUSH_SECONDS", "3"))
+    # Latest frames kept in memory: total budget for all devices (least recently active devices
+    # are evicted beyond it), largest accepted frame, age after which a frame is dropped
+    # (0 keeps frames until evicted) and number of recent frames kept per device
+    GLASS_FRAME_BUDGET_MB: float = float(os.getenv("GLASS_FRAME_BUDGET_MB", "64"))
+    GLASS_MAX_FRAME_KB: int = int(os.getenv("GLASS_MAX_FRAME_KB", "1024"))
+    GLASS_FRAME_TTL_SECONDS: float = float(os.getenv("GLASS_FRAME_TTL_SECONDS", "30"))
+    GLASS_FRAME_RING_SIZE: int = int(os.getenv("GLASS_FRAME_RING_SIZE", "3"))
+    # Command delivery: how long a long poll waits for a command, and how many unacknowledged
+    # commands a device keeps (the oldest are dropped beyond that)
+    GLASS_COMMAND_POLL_SECONDS: float = float(os.getenv("GLASS_COMMAND_POLL_SECONDS", "25"))
+    GLASS_MAX_PENDING_COMMANDS: int = int(os.getenv("GLASS_MAX_PENDING_COMMANDS", "100"))
     
     # CORS Configuration
     CORS_ORIGINS: List[str] = [
@@ -68,6 +153,37 @@ class Config:
         constraints = [
             (0.0 <= cls.FACE_RECOGNITION_TOLERANCE <= 1.0, "FACE_RECOGNITION_TOLERANCE must be between 0.0 and 1.0"),
             (cls.MAX_IMAGE_SIZE_MB > 0, "MAX_IMAGE_SIZE_MB must be greater than 0"),
+            (cls.FACE_PARALLEL_WORKERS > 0, "FACE_PARALLEL_WORKERS must be greater than 0"),
+            (cls.FACE_PROCESS_WORKERS >= 0, "FACE_PROCESS_WORKERS must be 0 or greater"),
+            (cls.FACE_CACHE_SIZE >= 0, "FACE_CACHE_SIZE must be 0 or greater"),
+            (cls.FACE_CACHE_TTL_SECONDS >= 0, "FACE_CACHE_TTL_SECONDS must be 0 or greater"),
+            (cls.RECOGNITION_BATCH_MAX_IMAGES > 0, "RECOGNITION_BATCH_MAX_IMAGES must be greater than 0"),
+            (cls.FACE_DETECTION_MAX_DIMENSION >= 0, "FACE_DETECTION_MAX_DIMENSION must be 0 or greater"),
+            (cls._valid_detectors(), "FACE_DETECTOR settings must be 'hog', 'cnn' or 'haar', "
+                                     "optionally with ':<upsample>' (0 or greater)"),
+            (cls._valid_quality_gates(), "FACE_QUALITY_GATE settings must be 'off' or 'key=value,...' "
+                                         "with keys min_size, blur, min_brightness, max_brightness"),
+            (cls.FACE_LANDMARK_MODEL in ("small", "large"), "FACE_LANDMARK_MODEL must be 'small' or 'large'"),
+            (cls.FACE_GALLERY_REFRESH_SECONDS >= 0, "FACE_GALLERY_REFRESH_SECONDS must be 0 or greater"),
+            (cls.FACE_GALLERY_FULL_RESYNC_SECONDS >= 0, "FACE_GALLERY_FULL_RESYNC_SECONDS must be 0 or greater"),
+            (cls.FACE_GALLERY_PAGE_SIZE > 0, "FACE_GALLERY_PAGE_SIZE must be greater than 0"),
+            (cls.FACE_INDEX_TYPE in ("auto", "brute", "ivf"), "FACE_INDEX_TYPE must be 'auto', 'brute' or 'ivf'"),
+            (cls.FACE_INDEX_NPROBE > 0, "FACE_INDEX_NPROBE must be greater than 0"),
+            (cls.FACE_INDEX_RERANK > 0, "FACE_INDEX_RERANK must be greater than 0"),
+            (cls.FACE_INDEX_RETRAIN_GROWTH > 1.0, "FACE_INDEX_RETRAIN_GROWTH must be greater than 1.0"),
+            (cls.FACE_ENCODING_STORAGE_FORMAT in ("binary", "json"), "FACE_ENCODING_STORAGE_FORMAT must be 'binary' or 'json'"),
+            (cls.GLASS_FRAME_CHANGE_THRESHOLD <= 64, "GLASS_FRAME_CHANGE_THRESHOLD must be at most 64"),
+            (cls.GLASS_FRAME_REUSE_MAX_SECONDS >= 0, "GLASS_FRAME_REUSE_MAX_SECONDS must be 0 or greater"),
+            (cls.GLASS_TRACK_REDETECT_FRAMES > 0, "GLASS_TRACK_REDETECT_FRAMES must be greater than 0"),
+            (0.0 <= cls.GLASS_TRACK_MIN_CONFIDENCE <= 1.0, "GLASS_TRACK_MIN_CONFIDENCE must be between 0.0 and 1.0"),
+            (cls.GLASS_TRACK_IDLE_SECONDS > 0, "GLASS_TRACK_IDLE_SECONDS must be greater than 0"),
+            (cls.GLASS_HEARTBEAT_FLUSH_SECONDS > 0, "GLASS_HEARTBEAT_FLUSH_SECONDS must be greater than 0"),
+            (cls.GLASS_MAX_FRAME_KB > 0, "GLASS_MAX_FRAME_KB must be greater than 0"),
+            (cls.GLASS_FRAME_BUDGET_MB * 1024 >= cls.GLASS_MAX_FRAME_KB, "GLASS_FRAME_BUDGET_MB must fit at least one frame of GLASS_MAX_FRAME_KB"),
+            (cls.GLASS_FRAME_TTL_SECONDS >= 0, "GLASS_FRAME_TTL_SECONDS must be 0 or greater"),
+            (cls.GLASS_FRAME_RING_SIZE > 0, "GLASS_FRAME_RING_SIZE must be greater than 0"),
+            (0 < cls.GLASS_COMMAND_POLL_SECONDS <= 60, "GLASS_COMMAND_POLL_SECONDS must be between 0 and 60"),
+            (cls.GLASS_MAX_PENDING_COMMANDS > 0, "GLASS_MAX_PENDING_COMMANDS must be greater than 0"),
             (1 <= cls.PORT <= 65535, "PORT must be between 1 and 65535")
         ]
         
@@ -80,6 +196,29 @@ class Config:
                 "Configuration validation failed:\n" + "\n".join(f"  - {error}" for error in errors)
             )
     
+    @classmethod
+    def _valid_detectors(cls) -> bool:
+        from services.face_detectors import FaceDetectorError, parse_detector_spec
+        try:
+            for spec in (cls.FACE_DETECTOR, cls.FACE_DETECTOR_RECOGNITION,
+                         cls.FACE_DETECTOR_ENROLLMENT, cls.FACE_DETECTOR_MULTI):
+                if spec:
+                    parse_detector_spec(spec)
+        except FaceDetectorError:
+            return False
+        return True
+
+    @classmethod
+    def _valid_quality_gates(cls) -> bool:
+        from utils.image_processor import QualityGate
+        try:
+            for spec in (cls.FACE_QUALITY_GATE, cls.FACE_QUALITY_GATE_RECOGNITION,
+                         cls.FACE_QUALITY_GATE_ENROLLMENT, cls.FACE_QUALITY_GATE_MULTI):
+                QualityGate.from_spec(spec)
+        except ValueError:
+            return False
+        return True
+
     @classmethod
     def get_max_image_size_bytes(cls) -> int:
         """Get maximum image size in bytes."""
@@ -101,6 +240,10 @@ Smart Glass AI Backend Configuration:
 =====================================
 Supabase URL: {cls.SUPABASE_URL[:30]}... (hidden)
 Face Recognition Tolerance: {cls.FACE_RECOGNITION_TOLERANCE}
+Face Index: {cls.FACE_INDEX_TYPE} (IVF from {cls.FACE_INDEX_IVF_MIN_SIZE} encodings, nprobe={cls.FACE_INDEX_NPROBE})
+Face Detector: {cls.FACE_DETECTOR}, detection size {cls.FACE_DETECTION_MAX_DIMENSION or 'full'}, landmarks {cls.FACE_LANDMARK_MODEL}
+Face Quality Gate: {cls.FACE_QUALITY_GATE or 'off'} (glass frames: {cls.FACE_QUALITY_GATE_MULTI or 'same'})
+Face Process Workers: {cls.FACE_PROCESS_WORKERS or 'disabled (threads)'}
 Max Image Size: {cls.MAX_IMAGE_SIZE_MB} MB
 CORS Origins: {', '.join(cls.CORS_ORIGINS)}
 Host: {cls.HOST}
@@ -0,0 +1,98 @@
+"""
+Face encoding serialization for Smart Glass AI backend.
+Encodings are stored in the users.face_encoding TEXT column in one of two formats:
+
+- legacy JSON: "[0.0123, -0.0456, ...]" (128 float64 values, ~2.5 KB)
+- binary v2:   "v2:" + base64(128 little-endian float32 values) (~690 bytes)
+
+Readers accept both so existing rows keep working until they are migrated
+with scripts/migrate_encodings.py.
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, List, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ENCODING_DIMENSION = 128
+BINARY_FORMAT_PREFIX = "v2:"
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+
+
+class EncodingFormatError(ValueError):
+    """Raised when a stored face encoding cannot be decoded."""
+    pass
+
+
+def is_binary_encoding(raw: Any) -> bool:
+    """Check whether a stored value uses the binary v2 format."""
+    return isinstance(raw, str) and raw.startswith(BINARY_FORMAT_PREFIX)
+
+
+def encode_face_encoding(encoding: Sequence[float], storage_format: str = FORMAT_BINARY) -> str:
+    """
+    Serialize a face encoding for storage.
+
+    Args:
+        encoding: 128-dimensional face encoding (list or numpy array)
+        storage_format: 'binary' (v2 float32) or 'json' (legacy)
+
+    Returns:
+        Serialized encoding string
+    """
+    if storage_format == FORMAT_JSON:
+        return json.dumps([float(x) for x in encoding])
+
+    if np is None:
+        raise EncodingFormatError("Binary encoding format requires numpy")
+
+    vector = np.asarray(encoding, dtype='<f4').reshape(-1)
+    if vector.shape[0] != ENCODING_DIMENSION:
+        raise EncodingFormatError(
+            f"Expected {ENCODING_DIMENSION} values, got {vector.shape[0]}"
+        )
+    return BINARY_FORMAT_PREFIX + base64.b64encode(vector.tobytes()).decode('ascii')
+
+
+def decode_face_encoding(raw: Union[str, List[float]]) -> Any:
+    """
+    Deserialize a stored face encoding in either format.
+
+    Args:
+        raw: Stored value (v2 string, JSON string, or an already-parsed list)
+
+    Returns:
+        numpy float32 array for binary values (when numpy is available), list of floats otherwise
+
+    Raises:
+        EncodingFormatError: If the value is malformed or has the wrong length
+    """
+    if is_binary_encoding(raw):
+        try:
+            payload = base64.b64decode(raw[len(BINARY_FORMAT_PREFIX):], validate=True)
+        except (binascii.Error, ValueError) as e:
+            raise EncodingFormatError(f"Invalid binary encoding: {e}")
+        if len(payload) != ENCODING_DIMENSION * 4:
+            raise EncodingFormatError(
+                f"Expected {ENCODING_DIMENSION * 4} bytes, got {len(payload)}"
+            )
+        if np is not None:
+            return np.frombuffer(payload, dtype='<f4')
+        import struct
+        return list(struct.unpack(f'<{ENCODING_DIMENSION}f', payload))
+
+    try:
+        vector = json.loads(raw) if isinstance(raw, str) else raw
+        length = len(vector)
+    except (json.JSONDecodeError, TypeError) as e:
+        raise EncodingFormatError(f"Invalid JSON encoding: {e}")
+    if length != ENCODING_DIMENSION:
+        raise EncodingFormatError(f"Expected {ENCODING_DIMENSION} values, got {length}")
+    return vector
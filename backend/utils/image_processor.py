@@ -1,10 +1,17 @@
 """
 Image processing utilities for Smart Glass AI system.
 Handles image loading, validation, and preprocessing.
+
+Uploads go through one pipeline: cheap checks on the byte length and the
+file signature, then exactly one full decode into a DecodedImage that every
+later stage (detection, quality checks, cropping) reuses. A frame quality
+gate on a small grayscale thumbnail can reject unusable frames before any
+face detection runs.
 """
 
 import io
-from typing import Tuple, Optional, Any
+from dataclasses import dataclass
+from typing import Tuple, Optional, Any, Union
 from PIL import Image
 from .config import config
 
@@ -21,16 +28,117 @@ class ImageProcessingError(Exception):
     pass
 
 
+@dataclass
+class DecodedImage:
+    """
+    An upload decoded once, ready for detection.
+    
+    Attributes:
+        pixels: RGB numpy array, already resized to the processing size
+        format: Source format detected from the file signature ('JPEG', 'PNG', 'WEBP')
+        original_width: Width of the encoded image
+        original_height: Height of the encoded image
+        byte_size: Length of the encoded image in bytes
+    """
+    pixels: Any
+    format: str
+    original_width: int
+    original_height: int
+    byte_size: int
+
+    @property
+    def width(self) -> int:
+        return int(self.pixels.shape[1])
+
+    @property
+    def height(self) -> int:
+        return int(self.pixels.shape[0])
+
+
+@dataclass
+class QualityGate:
+    """
+    Thresholds for ImageProcessor.check_frame_quality; 0 disables a check.
+    
+    Attributes:
+        min_dimension: Minimum shorter side of the original image in pixels
+        blur_threshold: Minimum Laplacian variance of the thumbnail
+        min_brightness: Minimum mean gray level of the thumbnail (0-255)
+        max_brightness: Maximum mean gray level of the thumbnail (0-255)
+    """
+    min_dimension: int = 0
+    blur_threshold: float = 0.0
+    min_brightness: float = 0.0
+    max_brightness: float = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return any((self.min_dimension, self.blur_threshold, self.min_brightness, self.max_brightness))
+
+    @classmethod
+    def from_spec(cls, spec: str, base: Optional['QualityGate'] = None) -> 'QualityGate':
+        """
+        Parse a 'key=value,...' spec (keys: min_size, blur, min_brightness, max_brightness).
+        Keys not in the spec keep base's value; 'off' disables every check.
+        
+        Raises:
+            ValueError: If a key or value is invalid
+        """
+        fields = {
+            "min_size": ("min_dimension", int),
+            "blur": ("blur_threshold", float),
+            "min_brightness": ("min_brightness", float),
+            "max_brightness": ("max_brightness", float),
+        }
+        spec = (spec or "").strip().lower()
+        if spec == "off":
+            return cls()
+        values = dict(vars(base)) if base is not None else {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            key, _, value = item.partition("=")
+            if key.strip() not in fields:
+                raise ValueError(f"Unknown quality gate setting '{key.strip()}'")
+            name, cast = fields[key.strip()]
+            values[name] = cast(value)
+            if values[name] < 0:
+                raise ValueError(f"Quality gate setting '{key.strip()}' must be 0 or greater")
+        return cls(**values)
+
+
 class ImageProcessor:
     """Handles image processing operations for face recognition."""
     
     SUPPORTED_FORMATS = {'JPEG', 'PNG', 'JPG', 'WEBP'}
     MAX_DIMENSION = 800  # Maximum width or height in pixels
+    # libjpeg can decode directly at 1/2, 1/4 or 1/8 scale (DCT scaling)
+    REDUCED_DECODE_FACTORS = (8, 4, 2)
+    # Longest side of the grayscale thumbnail used by the frame quality gate
+    QUALITY_THUMBNAIL_DIMENSION = 160
     
+    @staticmethod
+    def sniff_image_format(image_bytes: bytes) -> Optional[str]:
+        """
+        Identify the image format from its file signature without decoding anything.
+        
+        Args:
+            image_bytes: Raw image bytes
+            
+        Returns:
+            'JPEG', 'PNG' or 'WEBP', or None for anything else
+        """
+        if image_bytes[:3] == b'\xff\xd8\xff':
+            return 'JPEG'
+        if image_bytes[:8] == b'\x89PNG\r\n\x1a\n':
+            return 'PNG'
+        if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+            return 'WEBP'
+        return None
+
     @staticmethod
     def validate_image_format(image_bytes: bytes) -> bool:
         """
-        Validate that the image is in a supported format (JPEG or PNG).
+        Validate that the image is in a supported format (JPEG, PNG or WEBP).
+        Only the file signature is inspected; corrupt pixel data is caught by the decode.
         
         Args:
             image_bytes: Raw image bytes
@@ -41,21 +149,17 @@ class ImageProcessor:
         Raises:
             ImageProcessingError: If format is invalid
         """
-        try:
-            image = Image.open(io.BytesIO(image_bytes))
-            format_name = image.format.upper() if image.format else None
-            
-            if format_name not in ImageProcessor.SUPPORTED_FORMATS:
-                raise ImageProcessingError(
-                    f"Invalid image format: {format_name}. "
-                    f"Supported formats: {', '.join(ImageProcessor.SUPPORTED_FORMATS)}"
-                )
-            
-            return True
-        except Exception as e:
-            if isinstance(e, ImageProcessingError):
-                raise
-            raise ImageProcessingError(f"Failed to validate image format: {str(e)}")
+        if not image_bytes:
+            raise ImageProcessingError("Failed to validate image format: empty image")
+
+        format_name = ImageProcessor.sniff_image_format(image_bytes)
+        if format_name not in ImageProcessor.SUPPORTED_FORMATS:
+            raise ImageProcessingError(
+                f"Invalid image format: {format_name or 'unknown'}. "
+                f"Supported formats: {', '.join(sorted(ImageProcessor.SUPPORTED_FORMATS))}"
+            )
+        
+        return True
     
     @staticmethod
     def validate_image_size(image_bytes: bytes) -> bool:
@@ -99,6 +203,8 @@ class ImageProcessor:
         try:
             # Load with PIL (faster than CV2 for simple resize/save)
             img = Image.open(io.BytesIO(image_bytes))
+            # For JPEGs, let the decoder scale down by up to 8x while it decodes
+            img.draft('RGB', (max_size, max_size))
             
             # Convert to RGB if needed (e.g. RGBA pngs)
             if img.mode in ('RGBA', 'P'):
@@ -118,12 +224,50 @@ class ImageProcessor:
             return image_bytes
 
     @staticmethod
-    def load_image_from_bytes(image_bytes: bytes):
+    def read_image_size(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+        """
+        Read (width, height) from the image header without decoding pixel data.
+        
+        Returns:
+            Tuple of (width, height), or None if the header cannot be parsed
+        """
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as image:
+                return image.size
+        except Exception:
+            return None
+
+    @staticmethod
+    def reduced_decode_factor(width: int, height: int, max_dimension: int = MAX_DIMENSION) -> int:
+        """
+        Largest decode-time scale factor that still leaves the image at least max_dimension.
+        
+        Returns:
+            8, 4, 2, or 1 when the image is already too small to reduce
+        """
+        longest = max(width, height)
+        for factor in ImageProcessor.REDUCED_DECODE_FACTORS:
+            if longest // factor >= max_dimension:
+                return factor
+        return 1
+
+    @staticmethod
+    def load_image_from_bytes(
+        image_bytes: bytes,
+        max_dimension: Optional[int] = None,
+        image_size: Optional[Tuple[int, int]] = None
+    ):
         """
         Load image from bytes and convert to numpy array (RGB format).
+        With max_dimension, JPEGs much larger than needed are decoded directly at
+        a reduced scale (cv2.IMREAD_REDUCED_COLOR_2/4/8) instead of at full size;
+        the result is never smaller than max_dimension, so resize_image still
+        produces the same output size.
         
         Args:
             image_bytes: Raw image bytes
+            max_dimension: Optional target size enabling the reduced decode
+            image_size: Optional (width, height) already read from the header
             
         Returns:
             numpy array in RGB format
@@ -134,9 +278,20 @@ class ImageProcessor:
         if np is None or cv2 is None:
             raise ImageProcessingError("Image decoding requires numpy and opencv")
 
+        flags = cv2.IMREAD_COLOR
+        if (
+            max_dimension
+            and config.IMAGE_REDUCED_DECODE
+            and ImageProcessor.sniff_image_format(image_bytes) == 'JPEG'
+        ):
+            size = image_size or ImageProcessor.read_image_size(image_bytes)
+            factor = ImageProcessor.reduced_decode_factor(*size, max_dimension) if size else 1
+            if factor > 1:
+                flags = getattr(cv2, f'IMREAD_REDUCED_COLOR_{factor}')
+
         try:
             nparr = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            image = cv2.imdecode(nparr, flags)
             if image is None:
                 raise ImageProcessingError("Failed to decode image")
             image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
@@ -183,32 +338,57 @@ class ImageProcessor:
         return resized
     
     @staticmethod
-    def preprocess_image(image_bytes: bytes):
+    def decode_image(image: Union[bytes, DecodedImage]) -> DecodedImage:
         """
-        Complete preprocessing pipeline: validate, load, and resize image.
+        Complete preprocessing pipeline: header checks, one decode, and resize.
+        Already-decoded images are returned unchanged, so stages can accept either.
         
         Args:
-            image_bytes: Raw image bytes
+            image: Raw image bytes or a DecodedImage
             
         Returns:
-            Preprocessed numpy array in RGB format
+            DecodedImage with RGB pixels at processing size
             
         Raises:
             ImageProcessingError: If any preprocessing step fails
         """
-        # Validate format
-        ImageProcessor.validate_image_format(image_bytes)
-        
-        # Validate size
-        ImageProcessor.validate_image_size(image_bytes)
+        if isinstance(image, DecodedImage):
+            return image
+
+        # Cheap checks first: byte length and file signature
+        ImageProcessor.validate_image_size(image)
+        ImageProcessor.validate_image_format(image)
         
-        # Load image
-        image = ImageProcessor.load_image_from_bytes(image_bytes)
+        # The only full decode, at reduced scale when the JPEG is far larger than needed
+        image_size = ImageProcessor.read_image_size(image)
+        pixels = ImageProcessor.load_image_from_bytes(
+            image, max_dimension=ImageProcessor.MAX_DIMENSION, image_size=image_size
+        )
+        original_width, original_height = image_size or (pixels.shape[1], pixels.shape[0])
         
-        # Resize if needed
-        image = ImageProcessor.resize_image(image)
+        return DecodedImage(
+            pixels=ImageProcessor.resize_image(pixels),
+            format=ImageProcessor.sniff_image_format(image),
+            original_width=original_width,
+            original_height=original_height,
+            byte_size=len(image)
+        )
+
+    @staticmethod
+    def preprocess_image(image: Union[bytes, DecodedImage]):
+        """
+        Complete preprocessing pipeline: validate, load, and resize image.
         
-        return image
+        Args:
+            image: Raw image bytes or a DecodedImage
+            
+        Returns:
+            Preprocessed numpy array in RGB format
+            
+        Raises:
+            ImageProcessingError: If any preprocessing step fails
+        """
+        return ImageProcessor.decode_image(image).pixels
     
     @staticmethod
     def get_image_dimensions(image) -> Tuple[int, int]:
@@ -245,6 +425,89 @@ class ImageProcessor:
         variance = cv2.Laplacian(gray, cv2.CV_64F).var()
         return variance < threshold, variance
 
+    @staticmethod
+    def check_frame_quality(image: DecodedImage, gate: QualityGate) -> Tuple[bool, str]:
+        """
+        Reject obviously unusable frames before face detection.
+        Resolution is checked on the original size; blur and exposure on a
+        small grayscale thumbnail, which costs well under a millisecond.
+        Blur thresholds therefore refer to the thumbnail, where a frame looks
+        sharper than at full size.
+        
+        Args:
+            image: Decoded frame
+            gate: Thresholds to apply
+            
+        Returns:
+            Tuple of (is_usable, reason)
+        """
+        if gate.min_dimension and min(image.original_width, image.original_height) < gate.min_dimension:
+            return False, (
+                f"Image resolution too low ({image.original_width}x{image.original_height}px). "
+                f"Minimum {gate.min_dimension}px on the shorter side."
+            )
+        if cv2 is None or not (gate.blur_threshold or gate.min_brightness or gate.max_brightness):
+            return True, "Frame quality checks passed"
+
+        height, width = image.pixels.shape[:2]
+        scale = min(1.0, ImageProcessor.QUALITY_THUMBNAIL_DIMENSION / max(width, height))
+        thumbnail = cv2.resize(
+            image.pixels,
+            (max(1, int(width * scale)), max(1, int(height * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+        gray = cv2.cvtColor(thumbnail, cv2.COLOR_RGB2GRAY)
+
+        brightness = float(gray.mean())
+        if gate.min_brightness and brightness < gate.min_brightness:
+            return False, f"Image too dark (brightness {brightness:.0f}). Please improve lighting."
+        if gate.max_brightness and brightness > gate.max_brightness:
+            return False, f"Image overexposed (brightness {brightness:.0f}). Please reduce glare."
+
+        if gate.blur_threshold:
+            variance = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+            if variance < gate.blur_threshold:
+                return False, f"Image too blurry (Score: {variance:.1f}). Please hold steady."
+
+        return True, "Frame quality checks passed"
+
+    @staticmethod
+    def difference_hash(image_bytes: bytes, hash_size: int = 8) -> int:
+        """
+        Perceptual difference hash (dHash) of an image, for cheap change detection.
+        JPEGs are decoded in grayscale at 1/8 scale, so hashing a frame costs a
+        small fraction of a full decode. Similar images give hashes a small
+        Hamming distance apart (see hamming_distance).
+        
+        Args:
+            image_bytes: Raw image bytes
+            hash_size: Hash is hash_size * hash_size bits
+            
+        Returns:
+            Hash as an integer
+            
+        Raises:
+            ImageProcessingError: If the image cannot be decoded
+        """
+        if cv2 is None or np is None:
+            raise ImageProcessingError("OpenCV not available")
+
+        flag = cv2.IMREAD_GRAYSCALE
+        if ImageProcessor.sniff_image_format(image_bytes) == 'JPEG':
+            flag = cv2.IMREAD_REDUCED_GRAYSCALE_8
+        gray = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), flag)
+        if gray is None:
+            raise ImageProcessingError("Failed to decode image")
+
+        small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+    @staticmethod
+    def hamming_distance(hash_a: int, hash_b: int) -> int:
+        """Number of differing bits between two image hashes."""
+        return (hash_a ^ hash_b).bit_count()
+
 
 # Convenience functions for direct use
 def validate_and_load_image(image_bytes: bytes) -> Any:
@@ -46,6 +46,7 @@ class MigrationManager:
             "users_last_login_column": False,
             "users_is_active_column": False,
             "users_is_critical_column": False,
+            "devices_table": False,
             "migrations_needed": False
         }
         
@@ -65,6 +66,9 @@ class MigrationManager:
             status["users_is_active_column"] = self._check_column_exists("users", "is_active")
             status["users_is_critical_column"] = self._check_column_exists("users", "is_critical")
         
+        # Check if the smart glass devices table exists
+        status["devices_table"] = self._check_table_exists("devices")
+
         # Determine if migrations are needed
         status["migrations_needed"] = not (
             status["user_connections_table"]
@@ -72,6 +76,7 @@ class MigrationManager:
             and status["users_last_login_column"]
             and status["users_is_active_column"]
             and status["users_is_critical_column"]
+            and status["devices_table"]
         )
         
         return status
@@ -104,6 +109,7 @@ WHAT'S MISSING:
 ✓ 'last_login' column in 'users' table
 ✓ 'is_active' column in 'users' table
 ✓ UNIQUE constraint on face_images(user_id, image_type)
+✓ 'devices' table with a UNIQUE device_id (smart glass heartbeats are bulk-upserted on it)
 ✓ Performance indexes
 ✓ Row Level Security policies
 
@@ -122,10 +128,29 @@ ALTER TABLE users ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE;
 -- Add 'is_critical' column if missing (critical patient flag, controlled by doctors/admins only):
 ALTER TABLE users ADD COLUMN IF NOT EXISTS is_critical BOOLEAN DEFAULT FALSE;
 
+-- Index used by the incremental face gallery sync (updated_at watermark):
+CREATE INDEX IF NOT EXISTS idx_users_updated_at ON users(updated_at);
+
 -- Add this SQL to ensure data integrity:
 ALTER TABLE face_images 
 ADD CONSTRAINT unique_user_image_type UNIQUE (user_id, image_type);
 
+-- Smart glass devices table if missing:
+CREATE TABLE IF NOT EXISTS devices (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    device_id VARCHAR(100) NOT NULL,
+    user_id UUID REFERENCES users(id) ON DELETE SET NULL,
+    name VARCHAR(255),
+    status VARCHAR(20) DEFAULT 'offline',
+    battery_level INTEGER DEFAULT 0,
+    last_seen TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Smart glass heartbeats are written with one upsert on device_id, which needs it unique:
+CREATE UNIQUE INDEX IF NOT EXISTS unique_device_id ON devices(device_id);
+
 -- Backfill privacy settings for existing users (defaults):
 UPDATE users SET is_name_public = true WHERE is_name_public IS NULL;
 UPDATE users SET is_id_number_public = false WHERE is_id_number_public IS NULL;
@@ -163,6 +188,9 @@ UPDATE users SET is_nationality_public = true WHERE is_nationality_public IS NUL
 
         if not status["users_is_active_column"]:
             logger.warning("✗ Missing column: users.is_active")
+
+        if not status["devices_table"]:
+            logger.warning("✗ Missing table: devices")
         
         # Print instructions
         print(self.get_migration_instructions())
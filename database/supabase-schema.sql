@@ -14,7 +14,7 @@ CREATE TABLE users (
     gender VARCHAR(20),
     nationality VARCHAR(100),
     id_number VARCHAR(100),
-    face_encoding TEXT, -- Store face encoding as JSON string
+    face_encoding TEXT, -- Face encoding: 'v2:' + base64 float32 (legacy rows: JSON array)
     face_updated_at TIMESTAMP WITH TIME ZONE, -- Timestamp when face ID was last updated
     role VARCHAR(20) NOT NULL DEFAULT 'user', -- User role: 'user', 'doctor', 'admin'
     is_active BOOLEAN DEFAULT TRUE, -- Account status
@@ -93,13 +93,28 @@ CREATE TABLE face_images (
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
     image_url TEXT NOT NULL,
     image_type VARCHAR(50) NOT NULL, -- 'front', 'left', 'right', 'up', 'down'
-    face_encoding TEXT, -- Store individual encoding for this angle
+    face_encoding TEXT, -- Per-angle encoding (same format as users.face_encoding), used as a matching template
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Smart glass devices (registered by their first heartbeat, paired to a user)
+CREATE TABLE devices (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    device_id VARCHAR(100) NOT NULL,
+    user_id UUID REFERENCES users(id) ON DELETE SET NULL,
+    name VARCHAR(255),
+    status VARCHAR(20) DEFAULT 'offline',
+    battery_level INTEGER DEFAULT 0,
+    last_seen TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    CONSTRAINT unique_device_id UNIQUE(device_id) -- Heartbeats are bulk-upserted on device_id
+);
+
 -- Indexes for better performance
 CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_users_name ON users(name); -- For user search functionality
+CREATE INDEX idx_users_updated_at ON users(updated_at); -- For incremental face gallery sync
 CREATE INDEX idx_medical_info_user_id ON medical_info(user_id);
 CREATE INDEX idx_relatives_user_id ON relatives(user_id);
 CREATE INDEX idx_face_images_user_id ON face_images(user_id);
@@ -109,6 +124,7 @@ CREATE INDEX idx_user_connections_relationship ON user_connections(relationship)
 CREATE INDEX idx_connection_requests_sender_id ON connection_requests(sender_id);
 CREATE INDEX idx_connection_requests_receiver_id ON connection_requests(receiver_id);
 CREATE INDEX idx_connection_requests_status ON connection_requests(status);
+CREATE INDEX idx_devices_user_id ON devices(user_id);
 
 -- Row Level Security (RLS) Policies
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
@@ -117,6 +133,7 @@ ALTER TABLE relatives ENABLE ROW LEVEL SECURITY;
 ALTER TABLE face_images ENABLE ROW LEVEL SECURITY;
 ALTER TABLE user_connections ENABLE ROW LEVEL SECURITY;
 ALTER TABLE connection_requests ENABLE ROW LEVEL SECURITY;
+ALTER TABLE devices ENABLE ROW LEVEL SECURITY;
 
 -- Users can only read their own data
 CREATE POLICY "Users can view own data" ON users
@@ -166,6 +183,10 @@ CREATE POLICY "Users can update own connection requests" ON connection_requests
 CREATE POLICY "Users can delete own connection requests" ON connection_requests
     FOR DELETE USING (auth.uid() = sender_id OR auth.uid() = receiver_id);
 
+-- Devices policies
+CREATE POLICY "Users can view own devices" ON devices
+    FOR SELECT USING (auth.uid() = user_id);
+
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -190,3 +211,6 @@ CREATE TRIGGER update_user_connections_updated_at BEFORE UPDATE ON user_connecti
 
 CREATE TRIGGER update_connection_requests_updated_at BEFORE UPDATE ON connection_requests
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+CREATE TRIGGER update_devices_updated_at BEFORE UPDATE ON devices
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -9,7 +9,7 @@ import {
   useMemo,
 } from 'react';
 import apiClient from '../services/axios';
-import { recognizeFace } from '../services/api';
+import { recognizeFace, recognizeGlassFrame } from '../services/api';
 import { useNotifications } from '../hooks/useNotifications';
 import { useNavigate, useLocation } from 'react-router-dom';
 import { getCurrentUser } from '../services/auth';
@@ -124,6 +124,12 @@ export const SmartGlassProvider = ({ children }) => {
     [glassIp]
   );
 
+  // Live MJPEG stream pushed by the relay (no per-frame polling)
+  const getCloudStreamUrl = useCallback(
+    () => `${import.meta.env.VITE_API_URL}/api/glass/stream/${glassIp}`,
+    [glassIp]
+  );
+
   // Update Glass Display
   const updateDisplay = useCallback(
     async (line1, line2, alert = false, info = '') => {
@@ -165,6 +171,32 @@ export const SmartGlassProvider = ({ children }) => {
     }, 2000);
   }, [clearReadyTimeout, updateDisplay]);
 
+  const forceDisconnect = useCallback(() => {
+    if (scanIntervalRef.current) {
+      clearInterval(scanIntervalRef.current);
+      scanIntervalRef.current = null;
+    }
+    if (scanningSyncRef.current) {
+      clearInterval(scanningSyncRef.current);
+      scanningSyncRef.current = null;
+    }
+    setIsScanning(false);
+    setIsConnected(false);
+    setBatteryLevel(null);
+  }, []);
+
+  const recordConnectionFailure = useCallback(() => {
+    setConnectionFailures((prev) => {
+      const newCount = prev + 1;
+      // mark as disconnected after 3 consecutive failures (≈30s)
+      if (newCount >= 3) {
+        if (isConnected) console.log('[SmartGlass] 🔌 Marking as disconnected after 3 failures');
+        forceDisconnect();
+      }
+      return newCount;
+    });
+  }, [isConnected, forceDisconnect]);
+
   const performScan = useCallback(async () => {
     if (isScanningRef.current) {
       console.log('[SmartGlass] Previous scan still in progress, skipping...');
@@ -175,25 +207,37 @@ export const SmartGlassProvider = ({ children }) => {
     console.log('[SmartGlass] Starting scan cycle...');
 
     try {
-      console.log('[SmartGlass] Requesting capture from Glass...');
-      const response = isCloud
-        ? await apiClient.get(getCloudFrameUrl(), {
-            responseType: 'blob',
-            timeout: 8000,
-          })
-        : await glassClient.current.get(getGlassUrl('capture'), {
-            responseType: 'blob',
-            timeout: 8000,
-          });
-      console.log('[SmartGlass] ✅ Capture received, size:', response.data.size);
-      setConnectionFailures(0);
-      setIsConnected(true);
+      let result;
+      if (isCloud) {
+        // The relay already holds the latest frame; recognize it server-side
+        console.log('[SmartGlass] Recognizing latest relayed frame...');
+        result = await recognizeGlassFrame(glassIp);
+        const { status } = result;
+        // Any 4xx other than 404 (no frame yet) still proves the relay answered
+        const relayReachable = result.success || (status >= 400 && status < 500 && status !== 404);
+        if (relayReachable) {
+          setConnectionFailures(0);
+          setIsConnected(true);
+        } else if (status === undefined || status >= 500) {
+          // Network error, timeout or relay failure
+          recordConnectionFailure();
+        }
+      } else {
+        console.log('[SmartGlass] Requesting capture from Glass...');
+        const response = await glassClient.current.get(getGlassUrl('capture'), {
+          responseType: 'blob',
+          timeout: 8000,
+        });
+        console.log('[SmartGlass] ✅ Capture received, size:', response.data.size);
+        setConnectionFailures(0);
+        setIsConnected(true);
 
-      console.log('[SmartGlass] Sending image to recognition API...');
-      const formData = new FormData();
-      formData.append('image', response.data, 'glass_capture.jpg');
+        console.log('[SmartGlass] Sending image to recognition API...');
+        const formData = new FormData();
+        formData.append('image', response.data, 'glass_capture.jpg');
 
-      const result = await recognizeFace(formData);
+        result = await recognizeFace(formData);
+      }
       console.log('[SmartGlass] Recognition result:', result);
 
       if (result.success && result.data.match) {
@@ -239,29 +283,16 @@ export const SmartGlassProvider = ({ children }) => {
     }
   }, [
     isCloud,
-    getCloudFrameUrl,
+    glassIp,
     getGlassUrl,
     buildGlassSummary,
     notify,
     updateDisplay,
     location.pathname,
     navigate,
+    recordConnectionFailure,
   ]);
 
-  const forceDisconnect = useCallback(() => {
-    if (scanIntervalRef.current) {
-      clearInterval(scanIntervalRef.current);
-      scanIntervalRef.current = null;
-    }
-    if (scanningSyncRef.current) {
-      clearInterval(scanningSyncRef.current);
-      scanningSyncRef.current = null;
-    }
-    setIsScanning(false);
-    setIsConnected(false);
-    setBatteryLevel(null);
-  }, []);
-
   // Check Connection
   const checkConnection = useCallback(async () => {
     try {
@@ -394,15 +425,7 @@ export const SmartGlassProvider = ({ children }) => {
         }
       }
 
-      setConnectionFailures((prev) => {
-        const newCount = prev + 1;
-        // mark as disconnected after 3 consecutive failures (≈30s)
-        if (newCount >= 3) {
-          if (isConnected) console.log('[SmartGlass] 🔌 Marking as disconnected after 3 failures');
-          forceDisconnect();
-        }
-        return newCount;
-      });
+      recordConnectionFailure();
       return false;
     }
     return false;
@@ -413,6 +436,7 @@ export const SmartGlassProvider = ({ children }) => {
     notify,
     isCloud,
     forceDisconnect,
+    recordConnectionFailure,
     performScan,
     clearReadyTimeout,
     scheduleReadyMessage,
@@ -495,7 +519,7 @@ export const SmartGlassProvider = ({ children }) => {
     setHasManuallyDisconnected(true);
   };
 
-  const getGlassStreamUrl = () => (isCloud ? getCloudFrameUrl() : getGlassUrl('stream'));
+  const getGlassStreamUrl = () => (isCloud ? getCloudStreamUrl() : getGlassUrl('stream'));
 
   const getGlassSnapshotUrl = () => (isCloud ? getCloudFrameUrl() : getGlassUrl('capture'));
 
@@ -306,6 +306,24 @@ export const recognizeFace = async (formData) => {
   }
 };
 
+/**
+ * Recognize the person in a cloud-relayed glass device's latest frame.
+ * Unchanged frames reuse the previous result on the server ('reused' flag).
+ * @param {string} deviceId - Glass device ID
+ * @returns {Promise} API response
+ */
+export const recognizeGlassFrame = async (deviceId) => {
+  try {
+    const response = await apiClient.post(`/api/glass/recognize/${deviceId}`);
+    return {
+      success: true,
+      data: response.data,
+    };
+  } catch (error) {
+    return handleApiError(error, 'Recognition failed');
+  }
+};
+
 /**
  * Health check endpoint
  * @returns {Promise} API response